@@ -121,6 +121,27 @@ class TelaConsinco(TelaBase):
         )
         self.bnt_txt.pack(pady=10)
         
+        self.var_forcar_atualizacao = ctk.BooleanVar(value=False)
+        ctk.CTkCheckBox(
+            self, 
+            text="Forçar atualização do banco", 
+            variable=self.var_forcar_atualizacao
+        ).pack(pady=5)
+        
+        self.var_diferencas = ctk.BooleanVar(value=False)
+        ctk.CTkCheckBox(
+            self, 
+            text="Somente alterações desde a última execução", 
+            variable=self.var_diferencas
+        ).pack(pady=5)
+        
+        self.var_pacote = ctk.BooleanVar(value=False)
+        ctk.CTkCheckBox(
+            self, 
+            text="Entregar em um único arquivo .zip", 
+            variable=self.var_pacote
+        ).pack(pady=5)
+        
         self.bnt_processar = ctk.CTkButton(
             self, 
             text="Processar", 
@@ -157,7 +178,10 @@ class TelaConsinco(TelaBase):
                 numero_cotacao,
                 "consinco",
                 self.caminho_txt,
-                pasta_saida
+                pasta_saida,
+                forcar_atualizacao=self.var_forcar_atualizacao.get(),
+                pacote="zip" if self.var_pacote.get() else None,
+                diferencas=self.var_diferencas.get()
             )
             self.after(0, lambda: messagebox.showinfo("Sucesso", "Cotação processada (Layout Consinco)"))
         except Exception as e:
@@ -174,6 +198,41 @@ class TelaCotefacil(TelaBase):
         )
         self.entry_cotacao.pack(pady=20)
         
+        self.var_parquet = ctk.BooleanVar(value=False)
+        ctk.CTkCheckBox(
+            self, 
+            text="Gerar também Parquet (por loja)", 
+            variable=self.var_parquet
+        ).pack(pady=5)
+        
+        self.var_xlsx = ctk.BooleanVar(value=False)
+        ctk.CTkCheckBox(
+            self, 
+            text="Gerar também XLSX único (uma aba por loja)", 
+            variable=self.var_xlsx
+        ).pack(pady=5)
+        
+        self.var_streaming = ctk.BooleanVar(value=False)
+        ctk.CTkCheckBox(
+            self, 
+            text="Gravar lojas conforme chegam do banco (cotações grandes)", 
+            variable=self.var_streaming
+        ).pack(pady=5)
+        
+        self.var_por_loja = ctk.BooleanVar(value=False)
+        ctk.CTkCheckBox(
+            self, 
+            text="Consultar as lojas em paralelo (muitas lojas)", 
+            variable=self.var_por_loja
+        ).pack(pady=5)
+        
+        self.var_pacote = ctk.BooleanVar(value=False)
+        ctk.CTkCheckBox(
+            self, 
+            text="Entregar em um único arquivo .zip", 
+            variable=self.var_pacote
+        ).pack(pady=5)
+        
         self.bnt_processar = ctk.CTkButton(
             self, 
             text="Gerar CSV Cotefácil", 
@@ -195,11 +254,21 @@ class TelaCotefacil(TelaBase):
         self._configurar_processamento(numero, pasta)
     
     def _executar_processamento(self, numero_cotacao, pasta_saida):
+        formatos_extras = []
+        if self.var_parquet.get():
+            formatos_extras.append("parquet")
+        if self.var_xlsx.get():
+            formatos_extras.append("xlsx")
+        
         try:
             self.controller.processar_cotacao(
                 numero_cotacao,
                 "cotefacil",
-                pasta_saida=pasta_saida
+                pasta_saida=pasta_saida,
+                formatos_extras=tuple(formatos_extras),
+                streaming=self.var_streaming.get(),
+                pacote="zip" if self.var_pacote.get() else None,
+                por_loja=self.var_por_loja.get()
             )
             self.after(0, lambda: messagebox.showinfo("Sucesso", "CSV Cotefácil gerado com sucesso"))
         except Exception as e:
@@ -0,0 +1,57 @@
+# benchmark_parsers.py - compara a vazão (MB/s) dos leitores de TXT
+# Uso: python benchmark_parsers.py [tamanho_em_MB]
+import os
+import sys
+import tempfile
+import time
+
+from data_frame import TxtCotacaoParser
+from cotefacil_v_0_5 import ProcessadorArquivoCotefacil
+
+def gerar_arquivo(caminho: str, tamanho_mb: int):
+    """Gera um PEDIDO sintético no layout NeoGrid com vários blocos de fornecedor"""
+    limite = tamanho_mb * 1024 * 1024
+    escritos = 0
+    fornecedor = 0
+
+    with open(caminho, "w", encoding="utf-8") as arquivo:
+        arquivo.write("1;05327241001054;05327241001054;13808028\n")
+        while escritos < limite:
+            fornecedor += 1
+            linhas = [f"2;{fornecedor:014d};FORNECEDOR {fornecedor};18294;{60000000 + fornecedor};30\n"]
+            for item in range(2000):
+                ean = f"789{fornecedor % 1000:04d}{item:06d}"
+                linhas.append(f"3;{ean};{ean};{item % 50 + 1};{item % 97}.{item % 100:02d};0.00;0.00\n")
+            linhas.append(f"4;{len(linhas) - 1}\n")
+            bloco = "".join(linhas)
+            arquivo.write(bloco)
+            escritos += len(bloco)
+        arquivo.write("5;fim\n")
+
+def medir(nome: str, funcao, tamanho_bytes: int):
+    inicio = time.perf_counter()
+    funcao()
+    decorrido = time.perf_counter() - inicio
+    print(f"{nome:<55} {decorrido:8.2f} s  {tamanho_bytes / 1024 / 1024 / decorrido:8.1f} MB/s")
+
+if __name__ == "__main__":
+    tamanho_mb = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+
+    with tempfile.TemporaryDirectory() as pasta:
+        caminho = os.path.join(pasta, "PEDIDO_benchmark.txt")
+        gerar_arquivo(caminho, tamanho_mb)
+        tamanho = os.path.getsize(caminho)
+        print(f"Arquivo sintético: {tamanho / 1024 / 1024:.1f} MB\n")
+
+        parser = TxtCotacaoParser(caminho)
+        # extrair_precos escolhe o modo pelo tamanho do arquivo: cada modo é medido direto
+        medir("Consinco - extrair_precos_texto (texto)", parser.extrair_precos_texto, tamanho)
+        medir("Consinco - extrair_precos_centavos (mmap)", parser.extrair_precos_centavos, tamanho)
+
+        processador = ProcessadorArquivoCotefacil()
+        medir("NeoGrid - processar_arquivo_completo (texto)",
+              lambda: processador.processar_arquivo_completo(caminho), tamanho)
+        medir("NeoGrid - processar_arquivo_mmap (mmap)",
+              lambda: processador.processar_arquivo_mmap(caminho), tamanho)
+        medir(f"NeoGrid - processar_arquivo_paralelo ({os.cpu_count()} processos)",
+              lambda: processador.processar_arquivo_paralelo(caminho), tamanho)
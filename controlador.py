@@ -1,12 +1,41 @@
 # controlador.py - CONTROLLER
 from pathlib import Path
-from data_frame import CotacaoRepository, ProcessadorFactory
+from data_frame import (
+    CotacaoRepositoryComSnapshot, ProcessadorFactory, ManifestoExportacao, SnapshotCotacao,
+    PoolConexoes, TRABALHADORES_POR_LOJA
+)
+from fila_jobs import RegistroJobs, impressao_arquivo
+from historico import HistoricoPrecos
+from memoria import MedidorMemoria
+from pacote import empacotar
 import re
+import tempfile
+
+# Jobs sem TXT (Cotefácil) dependem só do banco, que muda sem alterar a impressão:
+# depois deste tempo parado, o job recomeça em vez de retomar (segundos)
+VALIDADE_RETOMADA_SEM_TXT = 3600
 
 class CotacaoController:
 
-    def __init__(self, conexao):
+    def __init__(self, conexao, snapshot: SnapshotCotacao = None, registro_jobs: RegistroJobs = None,
+                 pool_lojas: PoolConexoes = None, historico: HistoricoPrecos = None):
         self.conexao = conexao
+        self.snapshot = snapshot or SnapshotCotacao()
+        # Com registro, cada arquivo gravado vira um checkpoint para retomar após falhas
+        self.registro_jobs = registro_jobs
+        self.chave_job = None
+        # Conexões das consultas por loja; sem pool externo, abre um próprio no primeiro uso
+        self.pool_lojas = pool_lojas
+        self._pool_proprio = None
+        # Preços de cada cotação Consinco ficam no histórico para as próximas
+        self.historico = historico or HistoricoPrecos()
+        # None = ORCAMENTO_PADRAO_MB (variável COTACAO_MEMORIA_MB)
+        self.orcamento_memoria_mb = None
+
+    def fechar(self):
+        if self._pool_proprio:
+            self._pool_proprio.fechar()
+            self._pool_proprio = None
 
     def nome_arquivo_seguro(self, texto: str) -> str:
         texto = re.sub(r"[\r\n\t]", " ", texto)
@@ -20,8 +49,17 @@ class CotacaoController:
         numero_cotacao: int,
         tipo_layout: str,  # "consinco" ou "cotefacil"
         caminho_txt: Path = None,
-        pasta_saida: Path = None
-    ):
+        pasta_saida: Path = None,
+        formatos_extras: tuple = (),  # cotefacil: "parquet" e/ou "xlsx"
+        incremental: bool = True,  # consinco: pula arquivos cujas entradas não mudaram
+        forcar_atualizacao: bool = False,  # ignora o snapshot local e consulta o banco
+        streaming: bool = False,  # cotefacil: grava cada loja conforme os lotes chegam do banco
+        pacote: str = None,  # "zip" ou "tar.zst": entrega tudo em um único arquivo compactado
+        por_loja: bool = False,  # cotefacil: uma consulta por loja, em paralelo, gravando cada loja ao chegar
+        diferencas: bool = False,  # consinco: relatório do que mudou e só os CSVs dos fornecedores alterados
+        caminho_txt_anterior: Path = None  # consinco: base das diferenças; sem ele, a última execução
+    ) -> list:
+        # Retorna a lista de arquivos da cotação na pasta de saída
         # Validações básicas
         if tipo_layout == "consinco" and not caminho_txt:
             raise ValueError("Layout Consinco requer arquivo TXT")
@@ -32,36 +70,157 @@ class CotacaoController:
         pasta_saida = Path(pasta_saida).resolve()
         pasta_saida.mkdir(parents=True, exist_ok=True)
 
-        # Cria repositório
-        repositorio = CotacaoRepository(numero_cotacao, self.conexao)
+        if pacote:
+            return self._processar_em_pacote(
+                numero_cotacao, tipo_layout, caminho_txt, pasta_saida,
+                formatos_extras, forcar_atualizacao, streaming, pacote, por_loja,
+                diferencas=diferencas, caminho_txt_anterior=caminho_txt_anterior
+            )
+
+        retomado = False
+        self.chave_job = None
+        if self.registro_jobs:
+            self.chave_job = f"{tipo_layout}:{numero_cotacao}:{pasta_saida}"
+            retomado = self.registro_jobs.iniciar(
+                self.chave_job,
+                tipo_layout,
+                {"numero_cotacao": numero_cotacao, "caminho_txt": caminho_txt, "pasta_saida": pasta_saida},
+                impressao_arquivo(caminho_txt),
+                validade=None if caminho_txt else VALIDADE_RETOMADA_SEM_TXT,
+                descartar=forcar_atualizacao
+            )
+            if retomado:
+                print(f"Retomando job interrompido na etapa '{self.registro_jobs.etapa(self.chave_job)}'")
+
+        try:
+            arquivos = self._executar_cotacao(
+                numero_cotacao, tipo_layout, caminho_txt, pasta_saida,
+                formatos_extras, incremental, forcar_atualizacao, streaming, retomado, por_loja,
+                diferencas=diferencas, caminho_txt_anterior=caminho_txt_anterior
+            )
+        except Exception as e:
+            if self.chave_job:
+                self.registro_jobs.falhar(self.chave_job, str(e))
+            raise
+
+        if self.chave_job:
+            self.registro_jobs.concluir(self.chave_job)
+        return arquivos
+
+    def _processar_em_pacote(self, numero_cotacao, tipo_layout, caminho_txt, pasta_saida,
+                             formatos_extras, forcar_atualizacao, streaming, formato, por_loja,
+                             **opcoes_consinco) -> list:
+        # Gera tudo numa pasta local e manda um único arquivo para a pasta de saída.
+        # O pacote é sempre completo: sem exportação incremental nem checkpoints
+        self.chave_job = None
+        with tempfile.TemporaryDirectory(prefix=f"cotacao{numero_cotacao}_") as pasta_temporaria:
+            arquivos = self._executar_cotacao(
+                numero_cotacao, tipo_layout, caminho_txt, Path(pasta_temporaria),
+                formatos_extras, False, forcar_atualizacao, streaming, False, por_loja,
+                **opcoes_consinco
+            )
+            caminho_pacote = empacotar(
+                arquivos,
+                pasta_saida / f"Cotacao{numero_cotacao}_{tipo_layout}.{formato}",
+                formato,
+                {"numero_cotacao": numero_cotacao, "layout": tipo_layout}
+            )
+        return [caminho_pacote]
+
+    def _executar_cotacao(self, numero_cotacao, tipo_layout, caminho_txt, pasta_saida,
+                          formatos_extras, incremental, forcar_atualizacao, streaming, retomado,
+                          por_loja=False, diferencas=False, caminho_txt_anterior=None) -> list:
+        # A conexão pode ainda estar sendo aberta em segundo plano
+        if hasattr(self.conexao, "aguardar"):
+            self.conexao.aguardar()
+
+        # Cria repositório; ao retomar, reaproveita o snapshot gravado pela
+        # execução interrompida mesmo que já tenha expirado
+        repositorio = CotacaoRepositoryComSnapshot(
+            numero_cotacao,
+            self.conexao,
+            self.snapshot,
+            forcar_atualizacao,
+            aceitar_expirado=retomado
+        )
         
         # Factory para criar o processador correto
         processador = ProcessadorFactory.criar_processador(tipo_layout)
         
         # Processa de acordo com a estratégia
         if tipo_layout == "consinco":
-            dados_processados = processador.processar(
-                repositorio, 
-                caminho_txt=caminho_txt
+            with MedidorMemoria() as medidor:
+                dados_processados = processador.processar(
+                    repositorio, 
+                    caminho_txt=caminho_txt,
+                    historico=self.historico,
+                    snapshot=self.snapshot,
+                    diferencas=diferencas,
+                    caminho_txt_anterior=caminho_txt_anterior,
+                    orcamento_memoria_mb=self.orcamento_memoria_mb
+                )
+                resultados = dados_processados['resultados']
+                try:
+                    self._marcar_etapa("processado")
+                    arquivos = self._exportar_layout_consinco(
+                        dados_processados, 
+                        numero_cotacao, 
+                        pasta_saida,
+                        incremental
+                    )
+                finally:
+                    # Apaga os DataFrames despejados em disco
+                    resultados.fechar()
+            # Só depois de exportar: um job retomado ainda compara com a execução anterior
+            self.snapshot.salvar(numero_cotacao, "precos", dados_processados['tabela_precos'])
+            print(
+                f"Resumo: {len(arquivos)} arquivo(s), {resultados.despejados} fornecedor(es) "
+                f"processado(s) em disco, pico de memória da execução {medidor.pico_mb} MB"
             )
-            self._exportar_layout_consinco(
-                dados_processados, 
-                numero_cotacao, 
+            return arquivos
+        elif por_loja and not formatos_extras:
+            return self._exportar_cotefacil_por_loja(
+                processador,
+                repositorio,
+                numero_cotacao,
+                pasta_saida
+            )
+        elif streaming and not formatos_extras:
+            return self._exportar_cotefacil_streaming(
+                processador.processar_em_lotes(repositorio),
+                numero_cotacao,
                 pasta_saida
             )
         else:  # cotefacil
+            if streaming or por_loja:
+                print("Parquet/XLSX precisam da cotação inteira: streaming/consulta por loja desativados")
             dados_processados = processador.processar(repositorio)
-            self._exportar_layout_cotefacil(
+            self._marcar_etapa("processado")
+            return self._exportar_layout_cotefacil(
                 dados_processados, 
                 numero_cotacao, 
-                pasta_saida
+                pasta_saida,
+                formatos_extras
             )
 
-    def _exportar_layout_consinco(self, dados, numero_cotacao: int, pasta_saida: Path):
+    def _exportar_layout_consinco(self, dados, numero_cotacao: int, pasta_saida: Path, incremental: bool = True) -> list:
         resultados = dados['resultados']
         df_atacadistas = dados['df_atacadistas']
         
-        dfs_xlsx = {}
+        manifesto = ManifestoExportacao(pasta_saida, numero_cotacao)
+        if not incremental:
+            manifesto.entradas = {}
+        
+        nomes_xlsx = []
+        hashes_xlsx = []
+        arquivos = []
+        
+        # Modo diferenças: relatório das mudanças e CSV só de quem mudou de preço
+        diferencas = dados.get('diferencas')
+        alterados = None
+        if diferencas is not None:
+            alterados = set(diferencas["cnpj"])
+            arquivos.append(self._exportar_diferencas(diferencas, numero_cotacao, pasta_saida))
         
         for _, atac in df_atacadistas.iterrows():
             nome_razao = atac["nomerazao"]
@@ -73,6 +232,16 @@ class CotacaoController:
             nome_razao_limpo = self.nome_arquivo_seguro(nome_razao)
             caminho_csv = pasta_saida / f"Cotação{numero_cotacao}_{nome_razao_limpo}.csv"
             
+            nomes_xlsx.append(nome_razao)
+            # O XLSX também mostra o último preço do histórico
+            hashes_xlsx.append((nome_razao, info['hash'], info.get('hash_historico')))
+            if alterados is not None and info['cnpj'] not in alterados:
+                continue
+            arquivos.append(caminho_csv)
+            
+            if self._pular_arquivo(manifesto, caminho_csv, info['hash']):
+                continue
+            
             # Exporta CSV
             exporter_csv = ProcessadorFactory.criar_exporter("consinco_csv")
             exporter_csv.exportar(
@@ -80,31 +249,203 @@ class CotacaoController:
                 caminho_csv, 
                 numero_cotacao=numero_cotacao
             )
+            manifesto.registrar(caminho_csv.name, info['hash'])
+            self._checkpoint_arquivo(caminho_csv, info['hash'])
+        
+        # O comparativo junta todos os fornecedores, então muda junto com o XLSX
+        comparativo = dados.get('comparativo')
+        hash_xlsx = ManifestoExportacao.calcular_hash(hashes_xlsx)
+        if alterados is not None and not alterados:
+            # Nenhum preço mudou: comparativo e XLSX continuam valendo
+            nomes_xlsx = []
+        if comparativo is not None and nomes_xlsx:
+            caminho_comparativo = pasta_saida / f"Cotação{numero_cotacao}_Comparativo.csv"
+            arquivos.append(caminho_comparativo)
             
-            dfs_xlsx[nome_razao] = info['df']
+            if not self._pular_arquivo(manifesto, caminho_comparativo, hash_xlsx):
+                exporter_comparativo = ProcessadorFactory.criar_exporter("consinco_comparativo_csv")
+                exporter_comparativo.exportar(
+                    {'comparativo': comparativo},
+                    caminho_comparativo,
+                    numero_cotacao=numero_cotacao
+                )
+                manifesto.registrar(caminho_comparativo.name, hash_xlsx)
+                self._checkpoint_arquivo(caminho_comparativo, hash_xlsx)
         
-        # Exporta XLSX
-        if dfs_xlsx:
+        # Exporta XLSX (o arquivo é regravado inteiro se qualquer aba mudou)
+        if nomes_xlsx:
             caminho_xlsx = pasta_saida / f"Cotacao{numero_cotacao}.xlsx"
-            exporter_xlsx = ProcessadorFactory.criar_exporter("consinco_xlsx")
-            exporter_xlsx.exportar(
-                {'resultados': {k: {'df': v} for k, v in dfs_xlsx.items()}}, 
-                caminho_xlsx
-            )
+            arquivos.append(caminho_xlsx)
+            
+            if not self._pular_arquivo(manifesto, caminho_xlsx, hash_xlsx):
+                exporter_xlsx = ProcessadorFactory.criar_exporter("consinco_xlsx")
+                exporter_xlsx.exportar(
+                    {
+                        # Cada aba lê o seu fornecedor do armazém na hora de ser escrita
+                        'resultados': resultados.visao(nomes_xlsx),
+                        'comparativo': comparativo
+                    }, 
+                    caminho_xlsx
+                )
+                manifesto.registrar(caminho_xlsx.name, hash_xlsx)
+                self._checkpoint_arquivo(caminho_xlsx, hash_xlsx)
+        
+        manifesto.salvar()
+        return arquivos
 
-    def _exportar_layout_cotefacil(self, dados, numero_cotacao: int, pasta_saida: Path):
+    def _exportar_diferencas(self, diferencas, numero_cotacao: int, pasta_saida: Path) -> Path:
+        caminho = pasta_saida / f"Cotação{numero_cotacao}_Alteracoes.csv"
+        ProcessadorFactory.criar_exporter("consinco_diferencas_csv").exportar(
+            {'diferencas': diferencas},
+            caminho,
+            numero_cotacao=numero_cotacao
+        )
+        contagem = diferencas["situacao"].value_counts()
+        print(
+            f"Alterações: {contagem.get('alterado', 0)} preço(s) alterado(s), "
+            f"{contagem.get('incluido', 0)} incluído(s), {contagem.get('removido', 0)} removido(s) "
+            f"em {diferencas['cnpj'].nunique()} fornecedor(es) - {caminho}"
+        )
+        return caminho
+
+    def _exportar_layout_cotefacil(self, dados, numero_cotacao: int, pasta_saida: Path, formatos_extras: tuple = ()) -> list:
 
         resultados = dados["resultados"]
+        arquivos = []
 
         exporter = ProcessadorFactory.criar_exporter("cotefacil_csv")
 
         for nroempresa, df_filial in resultados.items():
 
             caminho_csv = pasta_saida / f"Cotacao{numero_cotacao}_Loja{nroempresa}.csv"
+            arquivos.append(caminho_csv)
+
+            # Com o hash dos dados, um arquivo de uma execução anterior só é
+            # mantido se o banco ainda devolve o mesmo conteúdo para a loja
+            hash_loja = ManifestoExportacao.hash_dataframe(df_filial)
+            if self._ja_gravado(caminho_csv, hash_loja):
+                continue
 
             exporter.exportar(
                 {"df_cotacao": df_filial},
                 caminho_csv
             )
+            self._checkpoint_arquivo(caminho_csv, hash_loja)
+
+            print(f"Arquivo gerado: {caminho_csv}")
+
+        # Exportações consolidadas (uma escrita para a cotação inteira)
+        hash_cotacao = ManifestoExportacao.hash_dataframe(dados["df"]) if formatos_extras else None
+        if "parquet" in formatos_extras:
+            caminho_parquet = pasta_saida / f"Cotacao{numero_cotacao}_parquet"
+            exporter_parquet = ProcessadorFactory.criar_exporter("cotefacil_parquet")
+            arquivos.append(caminho_parquet)
+            if not self._ja_gravado(caminho_parquet, hash_cotacao):
+                exporter_parquet.exportar({"df": dados["df"]}, caminho_parquet)
+                self._checkpoint_arquivo(caminho_parquet, hash_cotacao)
+
+        if "xlsx" in formatos_extras:
+            caminho_xlsx = pasta_saida / f"Cotacao{numero_cotacao}_Lojas.xlsx"
+            exporter_xlsx = ProcessadorFactory.criar_exporter("cotefacil_xlsx")
+            arquivos.append(caminho_xlsx)
+            if not self._ja_gravado(caminho_xlsx, hash_cotacao):
+                exporter_xlsx.exportar({"resultados": resultados}, caminho_xlsx)
+                self._checkpoint_arquivo(caminho_xlsx, hash_cotacao)
+
+        return arquivos
+
+    def _exportar_cotefacil_streaming(self, fatias, numero_cotacao: int, pasta_saida: Path) -> list:
+        # As fatias chegam ordenadas por loja; troca de arquivo quando a loja muda
+        exporter = None
+        loja_atual = None
+        caminho_csv = None
+        arquivos = []
+
+        try:
+            for nroempresa, fatia in fatias:
+                if nroempresa != loja_atual:
+                    if exporter:
+                        exporter.fechar()
+                        exporter = None
+                        self._checkpoint_arquivo(caminho_csv)
+                        print(f"Arquivo gerado: {caminho_csv}")
+
+                    loja_atual = nroempresa
+                    caminho_csv = pasta_saida / f"Cotacao{numero_cotacao}_Loja{nroempresa}.csv"
+                    arquivos.append(caminho_csv)
+                    if self._ja_gravado(caminho_csv):
+                        # Loja concluída antes da interrupção: só consome as fatias dela
+                        continue
+                    novo_exporter = ProcessadorFactory.criar_exporter_streaming("cotefacil_csv")
+                    novo_exporter.abrir(caminho_csv)
+                    exporter = novo_exporter
+
+                if exporter:
+                    exporter.escrever_lote(fatia)
+            
+            if exporter:
+                exporter.fechar()
+                exporter = None
+                self._checkpoint_arquivo(caminho_csv)
+                print(f"Arquivo gerado: {caminho_csv}")
+        finally:
+            if exporter:
+                exporter.fechar()
+
+        if loja_atual is None:
+            raise ValueError("Nenhum dado encontrado para esta cotação.")
+        return arquivos
+
+    def _exportar_cotefacil_por_loja(self, processador, repositorio, numero_cotacao: int, pasta_saida: Path) -> list:
+        # Lista as lojas e grava cada uma assim que a consulta dela termina,
+        # enquanto as outras ainda estão em andamento
+        lojas = repositorio.listar_lojas_cotefacil()
+        if not lojas:
+            raise ValueError("Nenhum dado encontrado para esta cotação.")
+
+        caminhos = {nroempresa: pasta_saida / f"Cotacao{numero_cotacao}_Loja{nroempresa}.csv" for nroempresa in lojas}
+
+        exporter = ProcessadorFactory.criar_exporter("cotefacil_csv")
+        for nroempresa, df_loja in processador.processar_por_loja(repositorio, lojas, self._obter_pool_lojas()):
+            # Toda loja volta ao banco: o CSV de uma execução interrompida só é
+            # mantido se ainda bate com o que o banco devolve agora
+            hash_loja = ManifestoExportacao.hash_dataframe(df_loja)
+            if self._ja_gravado(caminhos[nroempresa], hash_loja):
+                continue
+            exporter.exportar({"df_cotacao": df_loja}, caminhos[nroempresa])
+            self._checkpoint_arquivo(caminhos[nroempresa], hash_loja)
+            print(f"Arquivo gerado: {caminhos[nroempresa]}")
+
+        return list(caminhos.values())
+
+    def _obter_pool_lojas(self) -> PoolConexoes:
+        if self.pool_lojas:
+            return self.pool_lojas
+        if not self._pool_proprio:
+            self._pool_proprio = PoolConexoes(tamanho=TRABALHADORES_POR_LOJA)
+        return self._pool_proprio
+
+    # ============ CHECKPOINTS DO JOB ============
+    def _marcar_etapa(self, etapa: str):
+        if self.chave_job:
+            self.registro_jobs.marcar_etapa(self.chave_job, etapa)
+
+    def _ja_gravado(self, caminho: Path, hash_entradas: str = None) -> bool:
+        if self.chave_job and self.registro_jobs.arquivo_gravado(self.chave_job, caminho.name, hash_entradas):
+            print(f"Gravado antes da interrupção, mantido: {caminho}")
+            return True
+        return False
+
+    def _checkpoint_arquivo(self, caminho: Path, hash_entradas: str = None):
+        if self.chave_job:
+            self.registro_jobs.registrar_arquivo(self.chave_job, caminho.name, caminho, hash_entradas)
 
-            print(f"Arquivo gerado: {caminho_csv}")
\ No newline at end of file
+    def _pular_arquivo(self, manifesto: ManifestoExportacao, caminho: Path, hash_entradas: str) -> bool:
+        if manifesto.atualizado(caminho.name, hash_entradas):
+            print(f"Sem alterações, mantido: {caminho}")
+            return True
+        if self._ja_gravado(caminho, hash_entradas):
+            # O manifesto só é salvo no fim; o checkpoint do job cobre a interrupção
+            manifesto.registrar(caminho.name, hash_entradas)
+            return True
+        return False
@@ -1,6 +1,15 @@
 import snorte
 from pathlib import Path
+from itertools import groupby
+from operator import itemgetter
 import csv
+import sys
+from resiliencia import BANCO, conexao_driver
+
+# O Oracle aceita no máximo 1000 itens em uma lista IN
+TAMANHO_LOTE_IN = 1000
+# Linhas trazidas por fetchmany ao gerar esqueletos em lote
+TAMANHO_FETCH = 5000
 
 class ConexaoBD:
     
@@ -47,17 +56,7 @@ class CriarCSV():
 
             with open(self.caminho_esqueleto, 'w', newline='', encoding='utf-8') as arquivo:
                 writer = csv.writer(arquivo, delimiter=',')
-                #Primeira linha - vazia
-                writer.writerow(['','','','','',''])
-
-                #Segunda linha - Número da cotação
-                writer.writerow([f'Cotação: {self.numero_cotacao}','','','','',''])
-
-                #Terceira Linha - CENTRAL-COMPRAS
-                writer.writerow(['CENTRAL-COMPRAS','','','','',''])
-
-                #Quarta linha - colunas
-                writer.writerow(['Seq','EAN','Descrição','Emb.','Prazo','Vlr. Custo' ])
+                self._escrever_cabecalho(writer, self.numero_cotacao)
 
                 #Preencher com os produtos
                 for produto in produtos:
@@ -79,6 +78,88 @@ class CriarCSV():
             print(f"Erro ao criar esqueleto do CSV: {e}")
             return False
         
+    @staticmethod
+    def _escrever_cabecalho(writer, numero_cotacao):
+        #Primeira linha - vazia
+        writer.writerow(['','','','','',''])
+
+        #Segunda linha - Número da cotação
+        writer.writerow([f'Cotação: {numero_cotacao}','','','','',''])
+
+        #Terceira Linha - CENTRAL-COMPRAS
+        writer.writerow(['CENTRAL-COMPRAS','','','','',''])
+
+        #Quarta linha - colunas
+        writer.writerow(['Seq','EAN','Descrição','Emb.','Prazo','Vlr. Custo' ])
+
+    @classmethod
+    def criar_esqueletos(cls, numeros_cotacao, conexao: ConexaoBD):
+        """Gera o esqueleto de várias cotações com uma consulta por lote de até 1000 números.
+
+        As linhas vêm ordenadas por cotação e vão direto para o arquivo de
+        cada uma; cotações sem produtos ganham um esqueleto só com cabeçalho.
+        Retorna {numero_cotacao: caminho_do_arquivo}.
+        """
+        numeros = sorted({int(numero) for numero in numeros_cotacao})
+        caminhos = {}
+
+        try:
+            for inicio in range(0, len(numeros), TAMANHO_LOTE_IN):
+                lote = numeros[inicio:inicio + TAMANHO_LOTE_IN]
+                linhas = cls._iterar_produtos_cotacoes(lote, conexao)
+
+                for numero_cotacao, produtos in groupby(linhas, key=itemgetter(0)):
+                    esqueleto = cls(int(numero_cotacao), conexao)
+                    total = esqueleto._gravar_esqueleto(produtos)
+                    caminhos[esqueleto.numero_cotacao] = esqueleto.caminho_esqueleto
+                    print(f"Esqueleto da cotação {numero_cotacao}: {total} produtos")
+
+            for numero_cotacao in numeros:
+                if numero_cotacao not in caminhos:
+                    esqueleto = cls(numero_cotacao, conexao)
+                    esqueleto._gravar_esqueleto(())
+                    caminhos[numero_cotacao] = esqueleto.caminho_esqueleto
+                    print(f"Esqueleto da cotação {numero_cotacao}: nenhum produto encontrado")
+
+            print(f"{len(caminhos)} esqueletos salvos em {Path(__file__).parent}")
+        except Exception as e:
+            print(f"Erro ao criar esqueletos em lote: {e}")
+
+        return caminhos
+
+    def _gravar_esqueleto(self, produtos) -> int:
+        # produtos: tuplas (SEQCOTACAO, SEQPRODUTO, CODIGOEAN, DESCRICAO, EMBALAGEM, QTDEMBALAGEM)
+        with open(self.caminho_esqueleto, 'w', newline='', encoding='utf-8') as arquivo:
+            writer = csv.writer(arquivo, delimiter=',')
+            self._escrever_cabecalho(writer, self.numero_cotacao)
+
+            total = 0
+            for _, seq, ean, descricao, embalagem, qtd_embalagem in produtos:
+                writer.writerow([seq, ean, descricao, f"{embalagem}-{qtd_embalagem}", 30, ''])
+                total += 1
+        return total
+
+    @staticmethod
+    def _iterar_produtos_cotacoes(numeros_cotacao, conexao: ConexaoBD):
+        cursor = conexao.conexao.cursor
+
+        binds = {f"c{posicao}": numero for posicao, numero in enumerate(numeros_cotacao)}
+        consulta = f"""
+        SELECT SEQCOTACAO, SEQPRODUTO, CODIGOEAN, DESCRICAO, EMBALAGEM, QTDEMBALAGEM
+        FROM MRLV_LISTACOTACAO C
+        WHERE C.SEQCOTACAO IN ({", ".join(":" + nome for nome in binds)})
+        ORDER BY C.SEQCOTACAO
+        """
+
+        driver = conexao_driver(conexao.conexao)
+        BANCO.executar("esqueletos_cotacoes", cursor.execute, consulta, conexao=driver, **binds)
+        while True:
+            linhas = BANCO.executar("esqueletos_cotacoes", cursor.fetchmany, TAMANHO_FETCH,
+                                    conexao=driver, tentativas=1)
+            if not linhas:
+                break
+            yield from linhas
+
     def buscar_produtos_cotacao(self):
         cursor = self.conexao.conexao.cursor
 
@@ -88,9 +169,13 @@ class CriarCSV():
         WHERE C.SEQCOTACAO = {self.numero_cotacao}
         """
 
-        cursor.execute(consulta_produtos_cotacao)
-        colunas = [desc[0] for desc in cursor.description]
-        linhas = cursor.fetchall()
+        def consultar():
+            cursor.execute(consulta_produtos_cotacao)
+            return [desc[0] for desc in cursor.description], cursor.fetchall()
+
+        colunas, linhas = BANCO.executar(
+            "produtos_cotacao", consultar, conexao=conexao_driver(self.conexao.conexao)
+        )
 
         produtos =[]
         for linha in linhas:
@@ -106,8 +191,12 @@ if __name__ == "__main__":
     try:
         conexao = ConexaoBD()
         if conexao.verifica_conexao():
-            esqueleto = CriarCSV(202280, conexao)
-            esqueleto.criar_esqueleto()
+            # python cotacoes.py 202280 202281 ... gera vários esqueletos de uma vez
+            if len(sys.argv) > 1:
+                CriarCSV.criar_esqueletos(sys.argv[1:], conexao)
+            else:
+                esqueleto = CriarCSV(202280, conexao)
+                esqueleto.criar_esqueleto()
         else:
             print("Falha na conexão com banco de dados")
     except Exception as e:
@@ -1,12 +1,23 @@
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 from tkinterdnd2 import DND_FILES, TkinterDnD
-from typing import List, Tuple, Dict, Set
+from typing import List, Tuple, Dict, Set, Iterable, Iterator, Optional
 import os
+import sys
+import csv
+import json
 from datetime import datetime
 import threading
+import queue
+from concurrent.futures import ProcessPoolExecutor
 import time 
+from array import array
 import snorte  # Sua biblioteca personalizada para conexão Oracle
+from data_frame import ProcessadorFactory
+from fila_jobs import RegistroJobs, impressao_arquivo
+from resiliencia import BANCO, TempoEsgotadoBanco, conexao_driver
+from memoria import ArmazemResultados, MedidorMemoria
+from leitor_bytes import iterar_linhas_mmap, localizar_registros, para_inteiro, usar_mmap, usar_processos
 """
 
 ### Última versão com separação por fornecedores ####
@@ -15,6 +26,20 @@ import snorte  # Sua biblioteca personalizada para conexão Oracle
 # Configuração do diretório de rede para salvar os arquivos
 DIRETORIO_REDE = r"\\10.106.31.86\d$\NeoGridClient\documents\in"
 
+# Saída consolidada: todos os fornecedores do PEDIDO em um único TXT, com um
+# manifesto JSON ao lado indicando as linhas de cada fornecedor. Só ligar
+# (NEOGRID_SAIDA_CONSOLIDADA=1) onde o importador aceita esse formato.
+SAIDA_CONSOLIDADA = os.environ.get("NEOGRID_SAIDA_CONSOLIDADA", "").strip().lower() in ("1", "sim", "true")
+# Buffer de escrita do arquivo consolidado: poucas escritas grandes no compartilhamento
+BUFFER_CONSOLIDADO = 8 * 1024 * 1024
+
+# Blocos de fornecedor lidos à frente do cruzamento com o banco
+LIMITE_FILA_BLOCOS = 16
+
+# Fornecedores vistos nos últimos arquivos, pré-carregados ao abrir a aplicação
+ARQUIVO_FORNECEDORES_RECENTES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fornecedores_recentes.json")
+LIMITE_FORNECEDORES_RECENTES = 300
+
 # Classe para processar os arquivos Cotefácil com melhor performance
 class ProcessadorArquivoCotefacil:
     def __init__(self):
@@ -78,10 +103,11 @@ class ProcessadorArquivoCotefacil:
             if self.cnpj_fornecedor_atual not in self.dados_por_fornecedor:
                 self.dados_por_fornecedor[self.cnpj_fornecedor_atual] = []
             self.dados_por_fornecedor[self.cnpj_fornecedor_atual].append(registro)
+            return registro
+        return None
     
-    def processar_arquivo_completo(self, caminho_arquivo: str) -> Dict[str, List[str]]:
-        """Processa arquivo completo com reset de estado e retorna dados agrupados por fornecedor"""
-        # Reset do estado para cada arquivo
+    def _resetar_estado(self):
+        """Limpa o estado de leitura antes de um novo arquivo"""
         self.dados_coletados = []
         self.cnpj_comprador_atual = None
         self.cnpj_fornecedor_atual = None
@@ -89,6 +115,11 @@ class ProcessadorArquivoCotefacil:
         self.codigo_barras_atual = None
         self.quantidade_atual = None
         self.dados_por_fornecedor = {}
+    
+    def processar_arquivo_completo(self, caminho_arquivo: str) -> Dict[str, List[str]]:
+        """Processa arquivo completo com reset de estado e retorna dados agrupados por fornecedor"""
+        # Reset do estado para cada arquivo
+        self._resetar_estado()
         
         linhas = self.ler_arquivo_txt(caminho_arquivo)
         
@@ -101,18 +132,313 @@ class ProcessadorArquivoCotefacil:
                 self.adicionar_registro_atual()
         
         return self.dados_por_fornecedor
+    
+    def processar_arquivo_mmap(self, caminho_arquivo: str) -> Dict[str, List[Tuple]]:
+        """Versão para arquivos grandes: registros em tuplas com a quantidade já inteira"""
+        dados_por_fornecedor = {}
+        for cnpj_fornecedor, registros in self._iterar_blocos_mmap(caminho_arquivo):
+            dados_por_fornecedor.setdefault(cnpj_fornecedor, []).extend(registros)
+        return dados_por_fornecedor
+    
+    def _iterar_blocos_mmap(self, caminho_arquivo: str) -> Iterator[Tuple[str, List[Tuple]]]:
+        """Varre os bytes do arquivo mapeado em memória, decodificando só EAN, CNPJs e pedido"""
+        yield from blocos_de_linhas_bytes(iterar_linhas_mmap(caminho_arquivo))
+    
+    def processar_arquivo_paralelo(self, caminho_arquivo: str, processos: int = None) -> Dict[str, List[Tuple]]:
+        """Divide o arquivo nos limites dos blocos de fornecedor e lê cada trecho em um processo"""
+        dados_por_fornecedor = {}
+        for cnpj_fornecedor, registros in self._iterar_blocos_paralelo(caminho_arquivo, processos):
+            dados_por_fornecedor.setdefault(cnpj_fornecedor, []).extend(registros)
+        return dados_por_fornecedor
+    
+    def _iterar_blocos_paralelo(self, caminho_arquivo: str, processos: int = None) -> Iterator[Tuple[str, List[Tuple]]]:
+        """Gera os blocos na ordem do arquivo, à medida que os processos terminam cada trecho"""
+        processos = processos or os.cpu_count() or 1
+        trechos = dividir_em_trechos(caminho_arquivo, processos * 4)
+        
+        if len(trechos) <= 1 or processos == 1:
+            yield from self._iterar_blocos_mmap(caminho_arquivo)
+            return
+        
+        executor = ProcessPoolExecutor(max_workers=processos)
+        try:
+            # map devolve os resultados na ordem dos trechos
+            for blocos in executor.map(ler_trecho_mmap, [caminho_arquivo] * len(trechos), trechos):
+                yield from blocos
+        finally:
+            # Leitura interrompida (gerador fechado): descarta os trechos que nem começaram
+            executor.shutdown(wait=True, cancel_futures=True)
+    
+    def iterar_blocos_fornecedor(self, caminho_arquivo: str) -> Iterator[Tuple[str, List[str]]]:
+        """Gera (cnpj_fornecedor, registros) assim que cada bloco de fornecedor (tipo 2 até tipo 4) é lido"""
+        if usar_processos(caminho_arquivo):
+            yield from self._iterar_blocos_paralelo(caminho_arquivo)
+            return
+        
+        if usar_mmap(caminho_arquivo):
+            yield from self._iterar_blocos_mmap(caminho_arquivo)
+            return
+        
+        self._resetar_estado()
+        registros_bloco = []
+        
+        try:
+            arquivo = open(caminho_arquivo, 'r', encoding='utf-8')
+        except Exception as e:
+            raise Exception(f"Erro ao ler arquivo: {e}")
+        
+        with arquivo:
+            for linha in arquivo:
+                linha = linha.strip()
+                if not linha:
+                    continue
+                
+                # Um novo tipo 2 ou o tipo 4 fecham o bloco do fornecedor atual
+                if linha[:2] in ('2;', '4;') and registros_bloco:
+                    yield self.cnpj_fornecedor_atual, registros_bloco
+                    registros_bloco = []
+                
+                if self.processar_linha(linha):
+                    registro = self.adicionar_registro_atual()
+                    if registro:
+                        registros_bloco.append(registro)
+        
+        if registros_bloco:
+            yield self.cnpj_fornecedor_atual, registros_bloco
+
+def blocos_de_linhas_bytes(linhas: Iterable[bytes], cnpj_comprador: str = None,
+                           cnpj_fornecedor: str = None, codigo_pedido: str = None) -> Iterator[Tuple[str, List[Tuple]]]:
+    """Agrupa linhas em bytes nos blocos de fornecedor, partindo do estado informado"""
+    registros_bloco = []
+    
+    for linha in linhas:
+        linha = linha.strip()
+        
+        if linha[:2] == b'3;':
+            campos = linha.split(b';', 4)
+            if (len(campos) >= 4 and cnpj_comprador and cnpj_fornecedor and codigo_pedido
+                    and campos[1] and campos[3]):
+                registros_bloco.append((
+                    campos[1].decode('utf-8'),
+                    cnpj_fornecedor,
+                    cnpj_comprador,
+                    para_inteiro(campos[3]),
+                    codigo_pedido
+                ))
+            continue
+        
+        if b';' not in linha:
+            continue
+        
+        campos = linha.split(b';')
+        tipo_registro = campos[0]
+        
+        if tipo_registro in (b'2', b'4') and registros_bloco:
+            yield cnpj_fornecedor, registros_bloco
+            registros_bloco = []
+        
+        if tipo_registro == b'1' and len(campos) >= 2:
+            cnpj_comprador = campos[1].decode('utf-8')
+        elif tipo_registro == b'2' and len(campos) >= 5:
+            cnpj_fornecedor = campos[1].decode('utf-8')
+            codigo_pedido = campos[4].decode('utf-8')
+    
+    if registros_bloco:
+        yield cnpj_fornecedor, registros_bloco
+
+def dividir_em_trechos(caminho_arquivo: str, quantidade: int) -> List[Tuple[int, int, Tuple]]:
+    """Acha os registros tipo 1 e 2 numa varredura e devolve trechos (inicio, fim, estado inicial)"""
+    marcos = localizar_registros(caminho_arquivo, b'12')
+    if not marcos:
+        return []
+    
+    tamanho_arquivo = os.path.getsize(caminho_arquivo)
+    tamanho_alvo = max(1, tamanho_arquivo // max(1, quantidade))
+    
+    # Estado (comprador, fornecedor, pedido) vigente antes de cada marco
+    cnpj_comprador = cnpj_fornecedor = codigo_pedido = None
+    estados = []
+    for _, linha in marcos:
+        estados.append((cnpj_comprador, cnpj_fornecedor, codigo_pedido))
+        campos = linha.strip().split(b';')
+        if campos[0] == b'1' and len(campos) >= 2:
+            cnpj_comprador = campos[1].decode('utf-8')
+        elif campos[0] == b'2' and len(campos) >= 5:
+            cnpj_fornecedor = campos[1].decode('utf-8')
+            codigo_pedido = campos[4].decode('utf-8')
+    
+    # Junta marcos consecutivos até cada trecho ter aproximadamente o tamanho alvo
+    trechos = []
+    inicio, estado_inicio = marcos[0][0], estados[0]
+    for (posicao, _), estado in zip(marcos[1:], estados[1:]):
+        if posicao - inicio >= tamanho_alvo:
+            trechos.append((inicio, posicao, estado_inicio))
+            inicio, estado_inicio = posicao, estado
+    trechos.append((inicio, tamanho_arquivo, estado_inicio))
+    return trechos
+
+def ler_trecho_mmap(caminho_arquivo: str, trecho: Tuple[int, int, Tuple]) -> List[Tuple[str, List[Tuple]]]:
+    """Executado nos processos filhos: lê um trecho do arquivo e devolve seus blocos"""
+    inicio, fim, estado = trecho
+    return list(blocos_de_linhas_bytes(iterar_linhas_mmap(caminho_arquivo, inicio, fim), *estado))
+
+def ler_blocos_em_segundo_plano(blocos: Iterable[Tuple[str, List[str]]], parar: threading.Event = None,
+                                limite: int = LIMITE_FILA_BLOCOS) -> queue.Queue:
+    """Consome o gerador de blocos numa thread própria e entrega cada bloco numa fila.
+    
+    A fila guarda no máximo `limite` blocos: a leitura anda só um pouco à frente
+    do cruzamento. Quem consome deve sinalizar `parar` ao desistir (falha na
+    conexão, erro no cruzamento); a leitura então é interrompida e o gerador
+    fechado, o que encerra também os processos de leitura paralela.
+    """
+    fila = queue.Queue(maxsize=limite)
+    parar = parar or threading.Event()
+    
+    def entregar(item) -> bool:
+        while not parar.is_set():
+            try:
+                fila.put(item, timeout=0.2)
+                return True
+            except queue.Full:
+                continue
+        return False
+    
+    def produtor():
+        try:
+            for bloco in blocos:
+                if not entregar(bloco):
+                    break
+        except Exception as e:
+            entregar(e)
+        finally:
+            if hasattr(blocos, "close"):
+                blocos.close()
+            entregar(None)  # Fim da leitura
+    
+    threading.Thread(target=produtor, daemon=True).start()
+    return fila
+
+# Validação local de chaves antes das consultas ao banco
+PESOS_CNPJ_DV1 = [5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2]
+PESOS_CNPJ_DV2 = [6, 5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2]
+
+# EAN-8, UPC-A (12), EAN-13 e GTIN-14/DUN-14
+TAMANHOS_GTIN = (8, 12, 13, 14)
+
+def normalizar_ean(codigo_barras: str) -> Tuple[Optional[str], str]:
+    """Retorna (EAN normalizado, "") ou (None, motivo da rejeição)"""
+    codigo = ''.join(str(codigo_barras).split())
+    if not codigo:
+        return None, "EAN vazio"
+    if not (codigo.isascii() and codigo.isdigit()):
+        return None, "EAN com caracteres não numéricos"
+    
+    # GTIN-14 com indicador 0 é o próprio EAN-13
+    if len(codigo) == 14 and codigo[0] == '0':
+        codigo = codigo[1:]
+    
+    if len(codigo) not in TAMANHOS_GTIN:
+        return None, f"EAN com tamanho inválido ({len(codigo)} dígitos)"
+    if not codigo.strip('0'):
+        return None, "EAN zerado"
+    
+    # Dígito verificador GTIN: pesos 3 e 1 alternados a partir da direita
+    soma = sum(int(d) * (3 if i % 2 == 0 else 1) for i, d in enumerate(reversed(codigo[:-1])))
+    if (10 - soma % 10) % 10 != int(codigo[-1]):
+        return None, "EAN com dígito verificador inválido"
+    
+    return codigo, ""
+
+def normalizar_cnpj(cnpj: str) -> Tuple[Optional[str], str]:
+    """Retorna (CNPJ com 14 dígitos, "") ou (None, motivo da rejeição)"""
+    numeros = ''.join(c for c in str(cnpj) if c.isdigit())
+    if not numeros:
+        return None, "CNPJ vazio"
+    if len(numeros) > 14:
+        return None, f"CNPJ com tamanho inválido ({len(numeros)} dígitos)"
+    
+    # Zeros à esquerda perdidos na geração do arquivo
+    numeros = numeros.zfill(14)
+    if numeros == numeros[0] * 14:
+        return None, "CNPJ com dígitos repetidos"
+    
+    for pesos in (PESOS_CNPJ_DV1, PESOS_CNPJ_DV2):
+        resto = sum(int(d) * p for d, p in zip(numeros, pesos)) % 11
+        digito = 0 if resto < 2 else 11 - resto
+        if digito != int(numeros[len(pesos)]):
+            return None, "CNPJ com dígito verificador inválido"
+    
+    return numeros, ""
+
+class ValidadorChaves:
+    def __init__(self):
+        # Memória por valor original: cada chave distinta é validada uma única vez
+        self.eans: Dict[str, Tuple[Optional[str], str]] = {}
+        self.cnpjs: Dict[str, Tuple[Optional[str], str]] = {}
+        # (cnpj_fornecedor, tipo, valor, motivo) -> ocorrências
+        self.rejeitados: Dict[Tuple[str, str, str, str], int] = {}
+    
+    def ean(self, codigo_barras: str, cnpj_fornecedor: str = "") -> Optional[str]:
+        """Valida/normaliza um EAN, registrando a rejeição no relatório"""
+        return self._validar(self.eans, normalizar_ean, "EAN", codigo_barras, cnpj_fornecedor)
+    
+    def cnpj(self, cnpj: str, cnpj_fornecedor: str = "") -> Optional[str]:
+        """Valida/normaliza um CNPJ, registrando a rejeição no relatório"""
+        return self._validar(self.cnpjs, normalizar_cnpj, "CNPJ", cnpj, cnpj_fornecedor)
+    
+    def rejeitar(self, tipo: str, valor, motivo: str, cnpj_fornecedor: str = ""):
+        """Registra no relatório uma linha descartada por outro motivo que não a chave"""
+        chave = (cnpj_fornecedor, tipo, str(valor), motivo)
+        self.rejeitados[chave] = self.rejeitados.get(chave, 0) + 1
+    
+    def _validar(self, memoria, normalizar, tipo, valor, cnpj_fornecedor) -> Optional[str]:
+        if valor not in memoria:
+            memoria[valor] = normalizar(valor)
+        normalizado, motivo = memoria[valor]
+        
+        if not normalizado:
+            self.rejeitar(tipo, valor, motivo, cnpj_fornecedor)
+        return normalizado
+    
+    def total_rejeitados(self) -> int:
+        return sum(self.rejeitados.values())
+    
+    def salvar_relatorio(self, caminho_arquivo: str):
+        """Grava o relatório de chaves rejeitadas (CSV separado por ;)"""
+        with open(caminho_arquivo, 'w', newline='', encoding='utf-8-sig') as arquivo:
+            writer = csv.writer(arquivo, delimiter=';')
+            writer.writerow(['CNPJ_FORNECEDOR', 'TIPO', 'VALOR', 'MOTIVO', 'OCORRENCIAS'])
+            for (cnpj_fornecedor, tipo, valor, motivo), ocorrencias in self.rejeitados.items():
+                writer.writerow([cnpj_fornecedor, tipo, valor, motivo, ocorrencias])
+
+# Limite de itens em uma lista IN do Oracle
+TAMANHO_LOTE_IN = 1000
+
+def escolher_variante_embalagem(variantes: List[Tuple]) -> Tuple[str, int]:
+    """Entre as linhas (SEQPRODUTO, TIPCODIGO, QTDEMBALAGEM) de um código, escolhe o produto e o fator em unidades"""
+    def prioridade(variante):
+        seqproduto, tipcodigo, qtdembalagem = variante
+        qtd = qtdembalagem or 1
+        # Prefere o EAN unitário; depois o EAN de pacote; depois DUN/caixa e demais tipos
+        return (qtd != 1, tipcodigo != 'E', qtd, seqproduto)
+    
+    seqproduto, _, qtdembalagem = min(variantes, key=prioridade)
+    return seqproduto, max(1, int(qtdembalagem or 1))
 
 # Sistema de Cache Avançado
 class CacheConsulta:
     def __init__(self):
-        self.cache_produtos: Dict[str, str] = {}
-        self.cache_fornecedores: Dict[str, str] = {}
-        self.cache_empresas: Dict[str, str] = {}
+        # IDs do banco guardados como int: entram direto nas colunas de RegistrosCruzados
+        self.cache_produtos: Dict[str, int] = {}
+        self.cache_embalagens: Dict[str, int] = {}  # Unidades por código (DUN-14/caixa > 1)
+        self.cache_fornecedores: Dict[str, int] = {}
+        self.cache_empresas: Dict[str, int] = {}
         self.nao_encontrados: Set[str] = set()  # Para evitar consultas repetidas de dados não encontrados
         
     def limpar_cache(self):
         """Limpa todo o cache"""
         self.cache_produtos.clear()
+        self.cache_embalagens.clear()
         self.cache_fornecedores.clear()
         self.cache_empresas.clear()
         self.nao_encontrados.clear()
@@ -126,82 +452,196 @@ class CacheConsulta:
             'nao_encontrados': len(self.nao_encontrados)
         }
 
+def carregar_fornecedores_recentes() -> List[str]:
+    """CNPJs dos fornecedores vistos por último, do mais recente para o mais antigo"""
+    try:
+        with open(ARQUIVO_FORNECEDORES_RECENTES, encoding='utf-8') as arquivo:
+            return list(json.load(arquivo))
+    except (OSError, ValueError):
+        return []
+
+def registrar_fornecedores_recentes(cnpjs: Iterable[str]):
+    """Coloca os CNPJs no topo da lista de recentes e grava, limitada a LIMITE_FORNECEDORES_RECENTES"""
+    recentes = list(dict.fromkeys(list(cnpjs) + carregar_fornecedores_recentes()))
+    temporario = ARQUIVO_FORNECEDORES_RECENTES + ".tmp"
+    try:
+        with open(temporario, 'w', encoding='utf-8') as arquivo:
+            json.dump(recentes[:LIMITE_FORNECEDORES_RECENTES], arquivo)
+        os.replace(temporario, ARQUIVO_FORNECEDORES_RECENTES)
+    except OSError as e:
+        print(f"Não foi possível gravar os fornecedores recentes: {e}")
+
 # Classe para consultas no banco com cache
 class ConsultasBanco:
     def __init__(self, connection, cache: CacheConsulta):
         self.connection = connection
         self.cache = cache
+    
+    def _consultar(self, descricao: str, query: str, **binds) -> List[Tuple]:
+        """Executa a consulta sob a política de timeout, novas tentativas e disjuntor.
+        
+        Falhas sobem para quem chamou: só "zero linhas" vira não encontrado no cache.
+        Cada nova tentativa vai em uma sessão nova (_reconectar).
+        """
+        return BANCO.executar(
+            descricao,
+            lambda: self._cursor().execute(query, **binds).fetchall(),
+            conexao=lambda: conexao_driver(self.connection),
+            ao_repetir=self._reconectar
+        )
+    
+    def _cursor(self):
+        if self.connection is None:
+            # Transitório para a política: conta no disjuntor e é tentado de novo
+            raise ConnectionError("Sem conexão com o banco")
+        return self.connection.cursor
+    
+    def _reconectar(self, erro: Exception):
+        # Depois de ORA-03113/03135 a sessão está morta; depois de um timeout
+        # a chamada pode continuar rodando no cursor antigo. Em ambos os casos
+        # a nova tentativa vai em outra sessão; a presa por timeout só é abandonada
+        antiga, self.connection = self.connection, None
+        if antiga is not None and not isinstance(erro, TempoEsgotadoBanco):
+            try:
+                antiga.cursor.close()
+                antiga.connection.close()
+            except Exception:
+                pass
+        try:
+            self.connection = snorte.Snorte()
+        except Exception as e:
+            print(f"Falha ao reconectar ao banco: {e}")
         
     def consultar_produto_por_codigo_barras(self, codigo_barras: str) -> List[Tuple]:
         """Consulta SEQPRODUTO no banco usando código de barras com cache"""
-        # Verifica cache primeiro
+        self.resolver_produtos_em_lote([codigo_barras])
+        
         if codigo_barras in self.cache.cache_produtos:
             return [(codigo_barras, self.cache.cache_produtos[codigo_barras])]
+        return []
+    
+    def resolver_produtos_em_lote(self, codigos_barras: Iterable[str]):
+        """Resolve SEQPRODUTO e fator de embalagem de vários códigos com uma consulta por lote"""
+        pendentes = [
+            codigo for codigo in dict.fromkeys(codigos_barras)
+            if codigo not in self.cache.cache_produtos and codigo not in self.cache.nao_encontrados
+        ]
+        
+        for inicio in range(0, len(pendentes), TAMANHO_LOTE_IN):
+            lote = pendentes[inicio:inicio + TAMANHO_LOTE_IN]
+            binds = {f"c{i}": codigo for i, codigo in enumerate(lote)}
             
-        if codigo_barras in self.cache.nao_encontrados:
-            return []
-            
-        try:
-            query = """
+            # Traz todas as variantes (EAN unitário, EAN de pacote, DUN-14...) de cada código
+            query = f"""
             SELECT 
                 A.CODACESSO,
-                A.SEQPRODUTO
+                A.SEQPRODUTO,
+                A.TIPCODIGO,
+                A.QTDEMBALAGEM
             FROM MAP_PRODCODIGO A
-            WHERE A.CODACESSO = :codigo_barras
+            WHERE A.CODACESSO IN ({', '.join(':' + nome for nome in binds)})
             """
-            result = self.connection.cursor.execute(query, codigo_barras=codigo_barras)
-            resultados = result.fetchall()
+            resultados = self._consultar("produtos_em_lote", query, **binds)
             
-            # Atualiza cache
-            if resultados:
-                self.cache.cache_produtos[codigo_barras] = str(resultados[0][1])
-            else:
-                self.cache.nao_encontrados.add(codigo_barras)
+            variantes: Dict[str, List[Tuple]] = {}
+            for codacesso, seqproduto, tipcodigo, qtdembalagem in resultados:
+                variantes.setdefault(str(codacesso), []).append((seqproduto, tipcodigo, qtdembalagem))
+            
+            for codigo in lote:
+                if codigo not in variantes:
+                    self.cache.nao_encontrados.add(codigo)
+                    continue
                 
-            return resultados
-        except Exception as e:
-            print(f"Erro na consulta de produto: {e}")
-            self.cache.nao_encontrados.add(codigo_barras)
-            return []
+                seqproduto, multiplicador = escolher_variante_embalagem(variantes[codigo])
+                self.cache.cache_produtos[codigo] = int(seqproduto)
+                self.cache.cache_embalagens[codigo] = multiplicador
     
-    def consultar_fornecedor_por_cnpj(self, cnpj: str) -> List[Tuple]:
-        """Consulta SEQFORNECEDOR no banco usando CNPJ com cache"""
-        if cnpj in self.cache.cache_fornecedores:
-            return [(cnpj[:12], cnpj[12:], self.cache.cache_fornecedores[cnpj])]
-            
-        if cnpj in self.cache.nao_encontrados:
-            return []
+    def precarregar_empresas(self) -> int:
+        """Carrega todo o MAX_EMPRESA (tabela pequena) no cache de empresas"""
+        query = """
+        SELECT
+            A.NROCGC,
+            A.DIGCGC,
+            A.NROEMPRESA
+        FROM MAX_EMPRESA A
+        """
+        resultados = self._consultar("precarregar_empresas", query)
+        for nrocgc, digcgc, nroempresa in resultados:
+            if nrocgc is None or digcgc is None:
+                # Empresa sem CNPJ cadastrado: não há como casar com o arquivo
+                continue
+            cnpj = f"{int(nrocgc):012d}{int(digcgc):02d}"
+            self.cache.cache_empresas.setdefault(cnpj, int(nroempresa))
+        return len(resultados)
+    
+    def precarregar_fornecedores(self, cnpjs: Iterable[str]) -> int:
+        """Resolve SEQFORNECEDOR de vários CNPJs com uma consulta por lote"""
+        pendentes = []
+        for cnpj in dict.fromkeys(cnpjs):
+            cnpj_normalizado, _ = normalizar_cnpj(cnpj)
+            if cnpj_normalizado and cnpj_normalizado not in self.cache.cache_fornecedores:
+                pendentes.append(cnpj_normalizado)
+        
+        carregados = 0
+        for inicio in range(0, len(pendentes), TAMANHO_LOTE_IN):
+            lote = pendentes[inicio:inicio + TAMANHO_LOTE_IN]
+            binds = {}
+            pares = []
+            for i, cnpj in enumerate(lote):
+                binds[f"n{i}"] = cnpj[:12]
+                binds[f"d{i}"] = cnpj[12:]
+                pares.append(f"(:n{i}, :d{i})")
             
-        try:
-            if len(cnpj) == 14:
-                nrocgccpf = cnpj[:12]
-                digcgccpf = cnpj[12:]
-            else:
-                nrocgccpf = cnpj
-                digcgccpf = "00"
-                
-            query = """
+            query = f"""
             SELECT
                 P.NROCGCCPF,
                 P.DIGCGCCPF,
                 P.SEQPESSOA
             FROM GE_PESSOA P
-            WHERE P.NROCGCCPF = :nrocgccpf 
-            AND P.DIGCGCCPF = :digcgccpf
+            WHERE (P.NROCGCCPF, P.DIGCGCCPF) IN ({', '.join(pares)})
             """
-            result = self.connection.cursor.execute(query, nrocgccpf=nrocgccpf, digcgccpf=digcgccpf)
-            resultados = result.fetchall()
+            resultados = self._consultar("precarregar_fornecedores", query, **binds)
+            for nrocgccpf, digcgccpf, seqpessoa in resultados:
+                cnpj = f"{int(nrocgccpf):012d}{int(digcgccpf):02d}"
+                if cnpj not in self.cache.cache_fornecedores:
+                    self.cache.cache_fornecedores[cnpj] = int(seqpessoa)
+                    carregados += 1
+        return carregados
+    
+    def consultar_fornecedor_por_cnpj(self, cnpj: str) -> List[Tuple]:
+        """Consulta SEQFORNECEDOR no banco usando CNPJ com cache"""
+        if cnpj in self.cache.cache_fornecedores:
+            return [(cnpj[:12], cnpj[12:], self.cache.cache_fornecedores[cnpj])]
             
-            if resultados:
-                self.cache.cache_fornecedores[cnpj] = str(resultados[0][2])
-            else:
-                self.cache.nao_encontrados.add(cnpj)
-                
-            return resultados
-        except Exception as e:
-            print(f"Erro na consulta de fornecedor: {e}")
+        if cnpj in self.cache.nao_encontrados:
+            return []
+            
+        # Sem o antigo fallback DIGCGCCPF = "00", que podia casar com outra pessoa
+        cnpj_normalizado, _ = normalizar_cnpj(cnpj)
+        if not cnpj_normalizado:
             self.cache.nao_encontrados.add(cnpj)
             return []
+            
+        query = """
+        SELECT
+            P.NROCGCCPF,
+            P.DIGCGCCPF,
+            P.SEQPESSOA
+        FROM GE_PESSOA P
+        WHERE P.NROCGCCPF = :nrocgccpf 
+        AND P.DIGCGCCPF = :digcgccpf
+        """
+        resultados = self._consultar(
+            "fornecedor_por_cnpj", query,
+            nrocgccpf=cnpj_normalizado[:12], digcgccpf=cnpj_normalizado[12:]
+        )
+        
+        if resultados:
+            self.cache.cache_fornecedores[cnpj] = int(resultados[0][2])
+        else:
+            self.cache.nao_encontrados.add(cnpj)
+            
+        return resultados
     
     def consultar_empresa_por_cnpj(self, cnpj: str) -> List[Tuple]:
         """Consulta NROEMPRESA no banco usando CNPJ com cache"""
@@ -211,119 +651,459 @@ class ConsultasBanco:
         if cnpj in self.cache.nao_encontrados:
             return []
             
-        try:
-            if len(cnpj) == 14:
-                nrocgc = cnpj[:12]
-                digcgc = cnpj[12:]
-            else:
-                nrocgc = cnpj
-                digcgc = "00"
-              
-            query = """
-            SELECT
-                A.NROCGC,
-                A.DIGCGC,
-                A.NROEMPRESA
-            FROM MAX_EMPRESA A
-            WHERE A.NROCGC = :nrocgc 
-            AND A.DIGCGC = :digcgc
-            """
-            result = self.connection.cursor.execute(query, nrocgc=nrocgc, digcgc=digcgc)
-            resultados = result.fetchall()
-            
-            if resultados:
-                self.cache.cache_empresas[cnpj] = str(resultados[0][2])
-            else:
-                self.cache.nao_encontrados.add(cnpj)
-                
-            return resultados
-        except Exception as e:
-            print(f"Erro na consulta de empresa: {e}")
+        cnpj_normalizado, _ = normalizar_cnpj(cnpj)
+        if not cnpj_normalizado:
             self.cache.nao_encontrados.add(cnpj)
             return []
+            
+        query = """
+        SELECT
+            A.NROCGC,
+            A.DIGCGC,
+            A.NROEMPRESA
+        FROM MAX_EMPRESA A
+        WHERE A.NROCGC = :nrocgc 
+        AND A.DIGCGC = :digcgc
+        """
+        resultados = self._consultar(
+            "empresa_por_cnpj", query, nrocgc=cnpj_normalizado[:12], digcgc=cnpj_normalizado[12:]
+        )
+        
+        if resultados:
+            self.cache.cache_empresas[cnpj] = int(resultados[0][2])
+        else:
+            self.cache.nao_encontrados.add(cnpj)
+            
+        return resultados
+
+# Registros cruzados de um fornecedor, em colunas de inteiros
+class RegistrosCruzados:
+    """Linhas (SEQPRODUTO, SEQFORNECEDOR, SEQPESSOAEMP, quantidade, pedido) em colunas compactas.
+    
+    Os quatro primeiros campos ficam em arrays de inteiros de 8 bytes, em vez
+    de uma tupla com int/str por linha; o pedido, que se repete em todo o
+    bloco, é guardado uma vez e referenciado por índice. Quantidade que não é
+    inteira mantém o texto original em quantidades_texto.
+    Iterar devolve as tuplas na ordem do layout NeoGrid.
+    """
+    __slots__ = ("seqproduto", "seqfornecedor", "seqpessoaemp", "quantidade", "pedido",
+                 "pedidos", "indice_pedidos", "quantidades_texto")
+    
+    def __init__(self):
+        self.seqproduto = array('q')
+        self.seqfornecedor = array('q')
+        self.seqpessoaemp = array('q')
+        self.quantidade = array('q')
+        self.pedido = array('I')
+        self.pedidos: List[str] = []
+        self.indice_pedidos: Dict[str, int] = {}
+        self.quantidades_texto: Dict[int, str] = {}
+    
+    def adicionar(self, seqproduto: int, seqfornecedor: int, seqpessoaemp: int, quantidade, pedido: str):
+        # Quantidade já normalizada pelos leitores (para_inteiro): int ou texto original
+        if isinstance(quantidade, int):
+            quantidade_inteira = quantidade
+        else:
+            self.quantidades_texto[len(self.quantidade)] = quantidade
+            quantidade_inteira = 0
+        
+        indice = self.indice_pedidos.get(pedido)
+        if indice is None:
+            indice = self.indice_pedidos[pedido] = len(self.pedidos)
+            self.pedidos.append(pedido)
+        
+        self.seqproduto.append(seqproduto)
+        self.seqfornecedor.append(seqfornecedor)
+        self.seqpessoaemp.append(seqpessoaemp)
+        self.quantidade.append(quantidade_inteira)
+        self.pedido.append(indice)
+    
+    def extend(self, outros: "RegistrosCruzados"):
+        """Acrescenta os registros de outro bloco do mesmo fornecedor"""
+        deslocamento = len(self.quantidade)
+        mapa = []
+        for pedido in outros.pedidos:
+            indice = self.indice_pedidos.get(pedido)
+            if indice is None:
+                indice = self.indice_pedidos[pedido] = len(self.pedidos)
+                self.pedidos.append(pedido)
+            mapa.append(indice)
+        
+        self.seqproduto.extend(outros.seqproduto)
+        self.seqfornecedor.extend(outros.seqfornecedor)
+        self.seqpessoaemp.extend(outros.seqpessoaemp)
+        self.quantidade.extend(outros.quantidade)
+        self.pedido.extend(array('I', map(mapa.__getitem__, outros.pedido)))
+        for posicao, texto in outros.quantidades_texto.items():
+            self.quantidades_texto[deslocamento + posicao] = texto
+    
+    def __len__(self) -> int:
+        return len(self.quantidade)
+    
+    def __bool__(self) -> bool:
+        return len(self.quantidade) > 0
+    
+    def __iter__(self):
+        quantidades = self.quantidade
+        if self.quantidades_texto:
+            textos = self.quantidades_texto
+            quantidades = (textos.get(posicao, valor) for posicao, valor in enumerate(quantidades))
+        return zip(self.seqproduto, self.seqfornecedor, self.seqpessoaemp, quantidades,
+                   map(self.pedidos.__getitem__, self.pedido))
+    
+    def __sizeof__(self) -> int:
+        # Usado pelo orçamento de memória (sys.getsizeof)
+        colunas = (self.seqproduto, self.seqfornecedor, self.seqpessoaemp, self.quantidade, self.pedido)
+        return (object.__sizeof__(self) + sum(coluna.buffer_info()[1] * coluna.itemsize for coluna in colunas)
+                + sys.getsizeof(self.pedidos) + sum(sys.getsizeof(pedido) for pedido in self.pedidos)
+                + sys.getsizeof(self.indice_pedidos) + sys.getsizeof(self.quantidades_texto))
 
 # Classe para processar dados com consultas ao banco otimizadas
 class ProcessadorComConsultas:
-    def __init__(self, connection, cache: CacheConsulta):
-        self.connection = connection
+    def __init__(self, connection, cache: CacheConsulta, orcamento_memoria_mb: float = None):
         self.cache = cache
+        self.orcamento_memoria_mb = orcamento_memoria_mb
         self.consultas = ConsultasBanco(connection, cache)
+        self.validador = ValidadorChaves()
+        self.linhas_convertidas_embalagem = 0
+        self.linhas_rejeitadas_embalagem = 0
+    
+    @property
+    def connection(self):
+        """Sessão atual: as novas tentativas das consultas podem ter aberto outra"""
+        return self.consultas.connection
         
-    def processar_e_cruzar_dados(self, dados_por_fornecedor: Dict[str, List[str]]) -> Dict[str, List[Tuple]]:
+    def processar_e_cruzar_dados(self, dados_por_fornecedor: Dict[str, List[str]]) -> Dict[str, RegistrosCruzados]:
         """Processa os dados e faz os cruzamentos com o banco de forma otimizada, mantendo separação por fornecedor"""
-        dados_finais_por_fornecedor = {}
+        dados_finais_por_fornecedor = ArmazemResultados(self.orcamento_memoria_mb)
         fornecedores_nao_encontrados = []
         
         for cnpj_fornecedor, registros in dados_por_fornecedor.items():
-            dados_finais_fornecedor = []
-            registros_invalidos = 0
+            dados_finais_fornecedor = self.cruzar_fornecedor(cnpj_fornecedor, registros)
             
-            # Pré-processamento: extrair dados únicos para consultas em lote
-            codigos_barras_unicos = set()
-            cnpjs_empresas_unicos = set()
-            
-            for registro in registros:
-                try:
-                    campos = registro.split(';')
-                    if len(campos) != 5:
-                        registros_invalidos += 1
-                        continue
-                        
-                    codigo_barras, cnpj_fornecedor_reg, cnpj_empresa, quantidade, pedido = campos
-                    
-                    if codigo_barras and codigo_barras not in self.cache.cache_produtos and codigo_barras not in self.cache.nao_encontrados:
-                        codigos_barras_unicos.add(codigo_barras)
-                    if cnpj_empresa and cnpj_empresa not in self.cache.cache_empresas and cnpj_empresa not in self.cache.nao_encontrados:
-                        cnpjs_empresas_unicos.add(cnpj_empresa)
-                        
-                except Exception:
-                    registros_invalidos += 1
-            
-            # Consultar fornecedor atual (apenas uma vez por fornecedor)
-            resultados_fornecedor = self.consultas.consultar_fornecedor_por_cnpj(cnpj_fornecedor)
-            seqfornecedor_final = self.cache.cache_fornecedores.get(cnpj_fornecedor, "")
-            
-            if not seqfornecedor_final:
+            if dados_finais_fornecedor is None:
                 fornecedores_nao_encontrados.append(cnpj_fornecedor)
                 continue  # Pular este fornecedor se não encontrado
             
-            # Consultas em lote para produtos e empresas
-            for codigo_barras in codigos_barras_unicos:
-                self.consultas.consultar_produto_por_codigo_barras(codigo_barras)
-                
-            for cnpj in cnpjs_empresas_unicos:
-                self.consultas.consultar_empresa_por_cnpj(cnpj)
+            if dados_finais_fornecedor:
+                dados_finais_por_fornecedor[cnpj_fornecedor] = dados_finais_fornecedor
+        
+        return dados_finais_por_fornecedor, fornecedores_nao_encontrados
+    
+    def processar_fila_blocos(self, fila: queue.Queue) -> Tuple[Dict[str, RegistrosCruzados], List[str]]:
+        """Cruza cada bloco de fornecedor assim que ele chega da leitura do arquivo.
+        
+        Os registros cruzados ficam em um ArmazemResultados: acima do orçamento
+        de memória, os fornecedores seguintes são gravados em disco.
+        """
+        dados_finais_por_fornecedor = ArmazemResultados(self.orcamento_memoria_mb)
+        fornecedores_nao_encontrados = []
+        self.fornecedores_lidos = set()
+        
+        while True:
+            bloco = fila.get()
+            if bloco is None:
+                break
+            if isinstance(bloco, Exception):
+                raise bloco
             
-            # Processamento final para este fornecedor
-            for registro in registros:
-                try:
-                    campos = registro.split(';')
-                    if len(campos) != 5:
-                        continue
-                        
-                    codigo_barras, _, cnpj_empresa, quantidade, pedido = campos
-                    
-                    # Cruzamentos usando cache
-                    seqproduto_final = self.cache.cache_produtos.get(codigo_barras, "")
-                    seqpessoaemp_final = self.cache.cache_empresas.get(cnpj_empresa, "")
-                    
-                    # Só adiciona se todos os cruzamentos foram bem sucedidos
-                    if all([seqproduto_final, seqfornecedor_final, seqpessoaemp_final]):
-                        dados_finais_fornecedor.append((
-                            seqproduto_final,
-                            seqfornecedor_final,
-                            seqpessoaemp_final,
-                            quantidade,
-                            pedido
-                        ))
-                    
-                except Exception as e:
-                    registros_invalidos += 1
+            cnpj_fornecedor, registros = bloco
+            self.fornecedores_lidos.add(cnpj_fornecedor)
+            dados_finais_fornecedor = self.cruzar_fornecedor(cnpj_fornecedor, registros)
+            
+            if dados_finais_fornecedor is None:
+                if cnpj_fornecedor not in fornecedores_nao_encontrados:
+                    fornecedores_nao_encontrados.append(cnpj_fornecedor)
+                continue
             
+            # O mesmo fornecedor pode aparecer em mais de um bloco
             if dados_finais_fornecedor:
-                dados_finais_por_fornecedor[cnpj_fornecedor] = dados_finais_fornecedor
+                dados_finais_por_fornecedor.acrescentar(cnpj_fornecedor, dados_finais_fornecedor)
         
         return dados_finais_por_fornecedor, fornecedores_nao_encontrados
+    
+    def cruzar_fornecedor(self, cnpj_fornecedor: str, registros: List[str]):
+        """Cruza os registros de um fornecedor; retorna None se o fornecedor não existir no banco"""
+        dados_finais_fornecedor = RegistrosCruzados()
+        registros_invalidos = 0
+        
+        # Chaves malformadas são rejeitadas aqui, sem ida ao banco
+        cnpj_fornecedor_valido = self.validador.cnpj(cnpj_fornecedor, cnpj_fornecedor)
+        if not cnpj_fornecedor_valido:
+            return None
+        
+        # Pré-processamento: validar chaves e extrair dados únicos para consultas em lote
+        registros_validos = []
+        codigos_barras_unicos = set()
+        cnpjs_empresas_unicos = set()
+        
+        for registro in registros:
+            try:
+                # Registros do leitor mmap já chegam separados em tupla
+                campos = registro.split(';') if isinstance(registro, str) else registro
+                if len(campos) != 5:
+                    registros_invalidos += 1
+                    continue
+                    
+                codigo_barras, _, cnpj_empresa, quantidade, pedido = campos
+                if isinstance(registro, str):
+                    # O leitor de bytes já converteu; o de texto converte aqui, com a mesma regra
+                    quantidade = para_inteiro(quantidade)
+                codigo_barras = self.validador.ean(codigo_barras, cnpj_fornecedor)
+                cnpj_empresa = self.validador.cnpj(cnpj_empresa, cnpj_fornecedor)
+                if not codigo_barras or not cnpj_empresa:
+                    registros_invalidos += 1
+                    continue
+                
+                registros_validos.append((codigo_barras, cnpj_empresa, quantidade, pedido))
+                
+                if codigo_barras not in self.cache.cache_produtos and codigo_barras not in self.cache.nao_encontrados:
+                    codigos_barras_unicos.add(codigo_barras)
+                if cnpj_empresa not in self.cache.cache_empresas and cnpj_empresa not in self.cache.nao_encontrados:
+                    cnpjs_empresas_unicos.add(cnpj_empresa)
+                    
+            except Exception:
+                registros_invalidos += 1
+        
+        # Consultar fornecedor atual (apenas uma vez por fornecedor)
+        resultados_fornecedor = self.consultas.consultar_fornecedor_por_cnpj(cnpj_fornecedor_valido)
+        seqfornecedor_final = self.cache.cache_fornecedores.get(cnpj_fornecedor_valido)
+        
+        if seqfornecedor_final is None:
+            return None
+        
+        # A interface consulta o cache pelo CNPJ como veio no arquivo
+        self.cache.cache_fornecedores[cnpj_fornecedor] = seqfornecedor_final
+        
+        # Consultas em lote para produtos e empresas
+        self.consultas.resolver_produtos_em_lote(codigos_barras_unicos)
+            
+        for cnpj in cnpjs_empresas_unicos:
+            self.consultas.consultar_empresa_por_cnpj(cnpj)
+        
+        # Processamento final para este fornecedor
+        for codigo_barras, cnpj_empresa, quantidade, pedido in registros_validos:
+            # Cruzamentos usando cache
+            seqproduto_final = self.cache.cache_produtos.get(codigo_barras)
+            seqpessoaemp_final = self.cache.cache_empresas.get(cnpj_empresa)
+            
+            # Códigos de caixa (DUN-14) são convertidos para unidades
+            multiplicador = self.cache.cache_embalagens.get(codigo_barras, 1)
+            if multiplicador != 1:
+                if not isinstance(quantidade, int):
+                    # Caixas fracionadas não têm conversão exata: a linha vai para o relatório
+                    self.validador.rejeitar(
+                        "QUANTIDADE", f"{codigo_barras} x {quantidade}",
+                        f"Quantidade não inteira em código de caixa ({multiplicador} un.)", cnpj_fornecedor
+                    )
+                    self.linhas_rejeitadas_embalagem += 1
+                    registros_invalidos += 1
+                    continue
+                quantidade *= multiplicador
+                self.linhas_convertidas_embalagem += 1
+            
+            # Só adiciona se todos os cruzamentos foram bem sucedidos
+            if seqproduto_final is not None and seqpessoaemp_final is not None:
+                dados_finais_fornecedor.adicionar(
+                    seqproduto_final,
+                    seqfornecedor_final,
+                    seqpessoaemp_final,
+                    quantidade,
+                    pedido
+                )
+        
+        return dados_finais_fornecedor
+
+def gravar_arquivo_fornecedor(registros: RegistrosCruzados, seqfornecedor: int, nome_base: str,
+                              diretorio: str = DIRETORIO_REDE) -> str:
+    """Grava o TXT de importação de um fornecedor e retorna o caminho gerado"""
+    # Nome do arquivo: [nome_base]_[seqfornecedor]_[timestamp].txt
+    agora = datetime.now()
+    nome_arquivo = f"{nome_base}_F{seqfornecedor}_{agora.strftime('%Y%m%d_%H%M%S')}.txt"
+    caminho_completo = os.path.join(diretorio, nome_arquivo)
+    
+    exporter = ProcessadorFactory.criar_exporter_streaming("neogrid_txt")
+    exporter.exportar_lotes([registros], caminho_completo, data_processamento=agora.strftime('%Y%m%d'))
+    return caminho_completo
+
+def gravar_arquivo_consolidado(dados_por_fornecedor, seqfornecedores: Dict[str, int], nome_base: str,
+                               diretorio: str = DIRETORIO_REDE, cnpjs: Iterable[str] = None) -> Tuple[str, Dict]:
+    """Grava os fornecedores em um único TXT e o manifesto JSON com o índice de cada um.
+    
+    dados_por_fornecedor: registros cruzados por CNPJ (lidos um fornecedor por vez).
+    cnpjs: fornecedores a incluir, na ordem do arquivo (padrão: todos).
+    O TXT é gravado com outro nome e renomeado só depois do manifesto, para
+    o importador nunca pegar um arquivo pela metade ou sem índice.
+    Retorna o caminho do TXT e o manifesto.
+    """
+    agora = datetime.now()
+    nome_arquivo = f"{nome_base}_CONSOLIDADO_{agora.strftime('%Y%m%d_%H%M%S')}.txt"
+    caminho_completo = os.path.join(diretorio, nome_arquivo)
+    caminho_temporario = caminho_completo + ".tmp"
+    
+    manifesto = {
+        "arquivo": nome_arquivo,
+        "data_processamento": agora.strftime('%Y%m%d'),
+        "gerado_em": agora.isoformat(timespec="seconds"),
+        "fornecedores": [],
+    }
+    exporter = ProcessadorFactory.criar_exporter_streaming("neogrid_txt")
+    exporter.abrir(caminho_temporario, data_processamento=manifesto["data_processamento"], buffer=BUFFER_CONSOLIDADO)
+    try:
+        for cnpj_fornecedor in (dados_por_fornecedor.keys() if cnpjs is None else cnpjs):
+            # tell() do modo texto em UTF-8 é a posição em bytes
+            linha_inicial, byte_inicial = exporter.linhas_escritas, exporter.arquivo.tell()
+            exporter.escrever_lote(dados_por_fornecedor[cnpj_fornecedor])
+            manifesto["fornecedores"].append({
+                "cnpj_fornecedor": cnpj_fornecedor,
+                "seqfornecedor": seqfornecedores.get(cnpj_fornecedor, "DESCONHECIDO"),
+                "linha_inicial": linha_inicial + 1,
+                "linhas": exporter.linhas_escritas - linha_inicial,
+                "byte_inicial": byte_inicial,
+                "bytes": exporter.arquivo.tell() - byte_inicial,
+            })
+        manifesto["total_linhas"] = exporter.linhas_escritas
+    except Exception:
+        exporter.fechar()
+        os.remove(caminho_temporario)
+        raise
+    exporter.fechar()
+    
+    caminho_manifesto = os.path.splitext(caminho_completo)[0] + ".json"
+    with open(caminho_manifesto + ".tmp", "w", encoding="utf-8") as arquivo:
+        json.dump(manifesto, arquivo, ensure_ascii=False, indent=2)
+    os.replace(caminho_manifesto + ".tmp", caminho_manifesto)
+    os.replace(caminho_temporario, caminho_completo)
+    return caminho_completo, manifesto
+
+def gravar_pedido_consolidado(dados_por_fornecedor, cache: CacheConsulta, nome_base: str, diretorio: str,
+                              registro: RegistroJobs = None, chave: str = None) -> List[Dict]:
+    """Grava o PEDIDO no modo consolidado; numa retomada, reaproveita o arquivo já gravado"""
+    cnpjs = list(dados_por_fornecedor.keys())
+    # O arquivo é um só: ou todos os fornecedores apontam para ele, ou ele não foi gravado
+    caminhos = {registro.arquivo_gravado(chave, cnpj) for cnpj in cnpjs} if registro else {None}
+    caminho = caminhos.pop() if len(caminhos) == 1 else None
+    if caminho and os.path.exists(os.path.splitext(caminho)[0] + ".json"):
+        with open(os.path.splitext(caminho)[0] + ".json", encoding="utf-8") as arquivo:
+            indice = json.load(arquivo)["fornecedores"]
+    else:
+        caminho, manifesto = gravar_arquivo_consolidado(
+            dados_por_fornecedor, cache.cache_fornecedores, nome_base, diretorio, cnpjs
+        )
+        indice = manifesto["fornecedores"]
+        if registro:
+            for cnpj in cnpjs:
+                registro.registrar_arquivo(chave, cnpj, caminho)
+    
+    return [
+        {
+            "cnpj_fornecedor": item["cnpj_fornecedor"],
+            "seqfornecedor": item["seqfornecedor"],
+            "registros": item["linhas"],
+            "caminho": caminho,
+            "linha_inicial": item["linha_inicial"],
+        }
+        for item in indice
+    ]
+
+# Caches de consulta persistidos como checkpoint de um job NeoGrid
+CACHES_CHECKPOINT = ("cache_produtos", "cache_embalagens", "cache_fornecedores", "cache_empresas")
+
+def chave_job_pedido(caminho_arquivo: str) -> str:
+    return f"neogrid:{os.path.abspath(caminho_arquivo)}"
+
+def iniciar_job_pedido(registro: RegistroJobs, caminho_arquivo: str, cache: CacheConsulta) -> Tuple[str, bool]:
+    """Abre ou retoma o job do PEDIDO; ao retomar, devolve ao cache as consultas já resolvidas"""
+    chave = chave_job_pedido(caminho_arquivo)
+    retomado = registro.iniciar(chave, "neogrid", {"caminho_txt": caminho_arquivo},
+                                impressao_arquivo(caminho_arquivo))
+    if retomado:
+        for nome in CACHES_CHECKPOINT:
+            # Checkpoints antigos guardavam os IDs como texto
+            for valor, resultado in registro.carregar_consultas(chave, nome).items():
+                getattr(cache, nome).setdefault(valor, int(resultado))
+        cache.nao_encontrados.update(registro.carregar_consultas(chave, "nao_encontrados"))
+    return chave, retomado
+
+def salvar_consultas_pedido(registro: RegistroJobs, chave: str, cache: CacheConsulta):
+    for nome in CACHES_CHECKPOINT:
+        registro.salvar_consultas(chave, nome, getattr(cache, nome))
+    registro.salvar_consultas(chave, "nao_encontrados", dict.fromkeys(cache.nao_encontrados))
+    registro.marcar_etapa(chave, "consultas_resolvidas")
+
+def converter_pedido(caminho_arquivo: str, connection, cache: CacheConsulta,
+                     diretorio: str = DIRETORIO_REDE, registro: RegistroJobs = None,
+                     consolidado: bool = None) -> Dict:
+    """Lê, cruza e grava todos os fornecedores de um PEDIDO NeoGrid, sem interface.
+
+    Com registro, o job é retomável: consultas resolvidas e arquivos já
+    gravados por uma execução interrompida são reaproveitados.
+    consolidado: um único TXT para todos os fornecedores (padrão: SAIDA_CONSOLIDADA).
+    Retorna o manifesto da conversão: arquivos gerados por fornecedor,
+    fornecedores não encontrados e total de chaves rejeitadas.
+    """
+    consolidado = SAIDA_CONSOLIDADA if consolidado is None else consolidado
+    os.makedirs(diretorio, exist_ok=True)
+    nome_base = os.path.splitext(os.path.basename(caminho_arquivo))[0]
+    chave = None
+    if registro:
+        chave, _ = iniciar_job_pedido(registro, caminho_arquivo, cache)
+    
+    dados_por_fornecedor = None
+    parar_leitura = threading.Event()
+    medidor = MedidorMemoria().iniciar()
+    try:
+        processador = ProcessadorArquivoCotefacil()
+        fila_blocos = ler_blocos_em_segundo_plano(processador.iterar_blocos_fornecedor(caminho_arquivo), parar_leitura)
+        
+        processador_consultas = ProcessadorComConsultas(connection, cache)
+        dados_por_fornecedor, nao_encontrados = processador_consultas.processar_fila_blocos(fila_blocos)
+        registrar_fornecedores_recentes(processador_consultas.fornecedores_lidos)
+        if registro:
+            salvar_consultas_pedido(registro, chave, cache)
+        
+        if consolidado:
+            arquivos = gravar_pedido_consolidado(dados_por_fornecedor, cache, nome_base, diretorio, registro, chave)
+        else:
+            arquivos = []
+            for cnpj_fornecedor in dados_por_fornecedor.keys():
+                seqfornecedor = cache.cache_fornecedores.get(cnpj_fornecedor, "DESCONHECIDO")
+                caminho = registro.arquivo_gravado(chave, cnpj_fornecedor) if registro else None
+                if not caminho:
+                    # Um fornecedor por vez: os despejados em disco só são lidos aqui
+                    caminho = gravar_arquivo_fornecedor(dados_por_fornecedor[cnpj_fornecedor], seqfornecedor, nome_base, diretorio)
+                    if registro:
+                        registro.registrar_arquivo(chave, cnpj_fornecedor, caminho)
+                arquivos.append({
+                    "cnpj_fornecedor": cnpj_fornecedor,
+                    "seqfornecedor": seqfornecedor,
+                    "registros": dados_por_fornecedor.contagem(cnpj_fornecedor),
+                    "caminho": caminho
+                })
+        despejados = dados_por_fornecedor.despejados
+    except Exception as e:
+        if registro:
+            # Consultas já resolvidas ficam gravadas: a nova tentativa parte delas
+            salvar_consultas_pedido(registro, chave, cache)
+            registro.falhar(chave, str(e))
+        raise
+    finally:
+        parar_leitura.set()
+        medidor.parar()
+        if dados_por_fornecedor is not None:
+            dados_por_fornecedor.fechar()
+    
+    if registro:
+        registro.concluir(chave)
+    return {
+        "arquivos": arquivos,
+        "fornecedores_nao_encontrados": nao_encontrados,
+        "rejeitados": processador_consultas.validador.total_rejeitados(),
+        "linhas_convertidas_embalagem": processador_consultas.linhas_convertidas_embalagem,
+        "linhas_rejeitadas_embalagem": processador_consultas.linhas_rejeitadas_embalagem,
+        "fornecedores_em_disco": despejados,
+        "pico_memoria_mb": medidor.pico_mb
+    }
 
 # Interface principal com processamento assíncrono
 class InterfaceProcessador:
@@ -339,12 +1119,20 @@ class InterfaceProcessador:
         self.processando = False
         
         # Novas variáveis para controle de salvamento por fornecedor
-        self.dados_cruzados_por_fornecedor = {}
+        self.dados_cruzados_por_fornecedor = ArmazemResultados()
         self.fornecedores_processados = []
         self.fornecedores_nao_encontrados = []
         self.nome_arquivo_original = ""
         
+        # Checkpoints do PEDIDO em andamento (consultas resolvidas e arquivos gravados)
+        self.registro_jobs = RegistroJobs()
+        self.chave_job = None
+        
+        # Conexão e caches aquecidos em segundo plano enquanto a janela abre
+        self.aquecimento_concluido = threading.Event()
+        
         self.criar_interface()
+        threading.Thread(target=self.aquecer_em_segundo_plano, daemon=True).start()
         
     def criar_interface(self):
         # Título
@@ -499,7 +1287,8 @@ class InterfaceProcessador:
         self.adicionar_log("📁 Seleção de arquivo limpa")
         
         # Limpar dados de processamento
-        self.dados_cruzados_por_fornecedor = {}
+        self.dados_cruzados_por_fornecedor.fechar()
+        self.dados_cruzados_por_fornecedor = ArmazemResultados()
         self.fornecedores_processados = []
         self.fornecedores_nao_encontrados = []
     
@@ -545,8 +1334,37 @@ class InterfaceProcessador:
         self.btn_salvar_fornecedores.config(state="disabled")
         self.adicionar_log(f"✅ Arquivo carregado: {nome_arquivo}")
     
+    def aquecer_em_segundo_plano(self):
+        """Abre a conexão e pré-carrega empresas e fornecedores recentes no cache"""
+        try:
+            self.adicionar_log("🔗 Conectando ao banco de dados em segundo plano...")
+            self.connection = snorte.Snorte()
+            self.adicionar_log("✅ Conexão com o banco estabelecida")
+            
+            consultas = ConsultasBanco(self.connection, self.cache)
+            inicio = time.time()
+            try:
+                total_empresas = consultas.precarregar_empresas()
+                total_fornecedores = consultas.precarregar_fornecedores(carregar_fornecedores_recentes())
+            finally:
+                self.connection = consultas.connection
+            self.adicionar_log(f"🔥 Cache pré-carregado: {total_empresas} empresa(s), "
+                               f"{total_fornecedores} fornecedor(es) recente(s) em {time.time() - inicio:.1f}s")
+        except Exception as e:
+            # Sem aquecimento o processamento conecta e consulta sob demanda
+            self.adicionar_log(f"⚠️ Aquecimento do banco não concluído: {str(e)}")
+        finally:
+            self.aquecimento_concluido.set()
+    
     def conectar_banco(self) -> bool:
-        """Conecta ao banco de dados"""
+        """Conecta ao banco de dados, reaproveitando a conexão aberta no aquecimento"""
+        if not self.aquecimento_concluido.is_set():
+            self.adicionar_log("⏳ Aguardando a conexão aberta em segundo plano...")
+            self.aquecimento_concluido.wait()
+        
+        if self.connection:
+            return True
+        
         try:
             self.adicionar_log("🔗 Conectando ao banco de dados...")
             self.connection = snorte.Snorte()
@@ -590,6 +1408,10 @@ class InterfaceProcessador:
         self.atualizar_progresso(0)
         self.atualizar_status("Iniciando processamento...")
         
+        self.chave_job = None
+        # Sinalizado em qualquer saída: a leitura não continua sem ninguém consumindo
+        parar_leitura = threading.Event()
+        medidor = MedidorMemoria().iniciar()
         try:
             self.texto_log.delete(1.0, tk.END)
             self.nome_arquivo_original = os.path.basename(self.arquivo_selecionado)
@@ -597,21 +1419,24 @@ class InterfaceProcessador:
             self.adicionar_log(f"📁 Arquivo: {self.nome_arquivo_original}")
             self.adicionar_log(f"📂 Diretório de saída: {DIRETORIO_REDE}")
             
-            # Conectar ao banco
-            if not self.conectar_banco():
-                return
-            
-            # Processar arquivo
+            # A leitura do arquivo começa antes da conexão: cada bloco de
+            # fornecedor lido já pode ser cruzado enquanto o restante é lido
             self.atualizar_status("Processando arquivo...")
             self.atualizar_progresso(30)
             
-            dados_por_fornecedor = self.processador.processar_arquivo_completo(self.arquivo_selecionado)
+            blocos = self.processador.iterar_blocos_fornecedor(self.arquivo_selecionado)
+            fila_blocos = ler_blocos_em_segundo_plano(blocos, parar_leitura)
             
-            if not dados_por_fornecedor:
-                self.adicionar_log("❌ Nenhum dado válido encontrado no arquivo")
-                return
+            # Job interrompido antes: reaproveita as consultas e os arquivos já gravados
+            self.chave_job, retomado = iniciar_job_pedido(self.registro_jobs, self.arquivo_selecionado, self.cache)
+            self.fornecedores_processados = list(self.registro_jobs.arquivos(self.chave_job)) if retomado else []
+            if retomado:
+                self.adicionar_log(f"♻️ Retomando processamento interrompido "
+                                   f"({len(self.fornecedores_processados)} fornecedor(es) já salvos)")
             
-            self.adicionar_log(f"✅ Encontrados {len(dados_por_fornecedor)} fornecedor(es) no arquivo")
+            # Conectar ao banco
+            if not self.conectar_banco():
+                return
             
             # Cruzar com banco
             self.adicionar_log("\n🎯 Cruzando dados com banco (usando cache)...")
@@ -619,7 +1444,20 @@ class InterfaceProcessador:
             self.atualizar_progresso(60)
             
             processador_consultas = ProcessadorComConsultas(self.connection, self.cache)
-            self.dados_cruzados_por_fornecedor, self.fornecedores_nao_encontrados = processador_consultas.processar_e_cruzar_dados(dados_por_fornecedor)
+            self.dados_cruzados_por_fornecedor.fechar()
+            try:
+                self.dados_cruzados_por_fornecedor, self.fornecedores_nao_encontrados = processador_consultas.processar_fila_blocos(fila_blocos)
+            finally:
+                # Uma sessão reaberta nas novas tentativas passa a ser a da interface
+                self.connection = processador_consultas.connection
+            salvar_consultas_pedido(self.registro_jobs, self.chave_job, self.cache)
+            
+            if not processador_consultas.fornecedores_lidos:
+                self.adicionar_log("❌ Nenhum dado válido encontrado no arquivo")
+                return
+            
+            self.adicionar_log(f"✅ Encontrados {len(processador_consultas.fornecedores_lidos)} fornecedor(es) no arquivo")
+            registrar_fornecedores_recentes(processador_consultas.fornecedores_lidos)
             
             # Mostrar fornecedores não encontrados
             if self.fornecedores_nao_encontrados:
@@ -628,19 +1466,51 @@ class InterfaceProcessador:
                     self.adicionar_log(f"   ❌ CNPJ: {cnpj}")
             
             total_fornecedores_processados = len(self.dados_cruzados_por_fornecedor)
-            total_registros = sum(len(registros) for registros in self.dados_cruzados_por_fornecedor.values())
+            total_registros = self.dados_cruzados_por_fornecedor.total()
             
             self.adicionar_log(f"✅ {total_registros} registros cruzados com sucesso para {total_fornecedores_processados} fornecedor(es)")
             self.adicionar_log(f"📊 Estatísticas do cache: {self.cache.get_tamanho_cache()}")
-            
+            if self.dados_cruzados_por_fornecedor.despejados:
+                self.adicionar_log(f"💽 {self.dados_cruzados_por_fornecedor.despejados} fornecedor(es) acima do orçamento de memória gravados em disco")
+            self.adicionar_log(f"🧠 Pico de memória deste processamento: {medidor.pico_mb} MB")
+            metricas_banco = BANCO.resumo()
+            self.adicionar_log(f"📊 Banco: {metricas_banco['sucesso']} consulta(s), {metricas_banco['nova_tentativa']} nova(s) tentativa(s), "
+                               f"{metricas_banco['timeout']} timeout(s), p95 {metricas_banco['latencia_p95']}s")
+            if processador_consultas.linhas_convertidas_embalagem:
+                self.adicionar_log(f"📦 {processador_consultas.linhas_convertidas_embalagem} linha(s) com código de caixa convertidas para unidades")
+            if processador_consultas.linhas_rejeitadas_embalagem:
+                self.adicionar_log(f"⚠️ {processador_consultas.linhas_rejeitadas_embalagem} linha(s) com código de caixa e quantidade não inteira descartadas (ver relatório de rejeitados)")
+
+            # Relatório de chaves rejeitadas na validação local (ao lado do arquivo de origem,
+            # fora do diretório de entrada do importador)
+            validador = processador_consultas.validador
+            if validador.rejeitados:
+                nome_base = os.path.splitext(self.nome_arquivo_original)[0]
+                caminho_relatorio = os.path.join(
+                    os.path.dirname(os.path.abspath(self.arquivo_selecionado)),
+                    f"{nome_base}_rejeitados_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+                )
+                try:
+                    validador.salvar_relatorio(caminho_relatorio)
+                    self.adicionar_log(f"⚠️ {validador.total_rejeitados()} registro(s) rejeitados na validação (EAN/CNPJ/quantidade)")
+                    self.adicionar_log(f"   📄 Relatório: {caminho_relatorio}")
+                except Exception as e:
+                    self.adicionar_log(f"❌ Não foi possível gravar o relatório de rejeitados: {str(e)}")
+
             if not self.dados_cruzados_por_fornecedor:
                 self.adicionar_log("❌ Nenhum registro pôde ser cruzado com o banco")
                 return
             
             self.adicionar_log("\n📋 Fornecedores prontos para salvamento:")
-            for i, (cnpj_fornecedor, registros) in enumerate(self.dados_cruzados_por_fornecedor.items(), 1):
+            for i, cnpj_fornecedor in enumerate(self.dados_cruzados_por_fornecedor, 1):
                 seqfornecedor = self.cache.cache_fornecedores.get(cnpj_fornecedor, "DESCONHECIDO")
-                self.adicionar_log(f"   {i}. CNPJ: {cnpj_fornecedor} | SEQFORNECEDOR: {seqfornecedor} | Registros: {len(registros)}")
+                salvo = " | já salvo" if cnpj_fornecedor in self.fornecedores_processados else ""
+                self.adicionar_log(f"   {i}. CNPJ: {cnpj_fornecedor} | SEQFORNECEDOR: {seqfornecedor} | Registros: {self.dados_cruzados_por_fornecedor.contagem(cnpj_fornecedor)}{salvo}")
+            
+            if all(cnpj in self.fornecedores_processados for cnpj in self.dados_cruzados_por_fornecedor):
+                self.adicionar_log("\n🎉 Todos os fornecedores já tinham sido salvos antes da interrupção")
+                self.registro_jobs.concluir(self.chave_job)
+                return
             
             self.adicionar_log(f"\n💾 Clique em 'Salvar Fornecedores' para escolher qual salvar primeiro")
             
@@ -650,8 +1520,13 @@ class InterfaceProcessador:
         except Exception as e:
             self.adicionar_log(f"❌ Erro durante o processamento: {str(e)}")
             self.atualizar_status(f"Erro: {str(e)}")
+            if self.chave_job:
+                # O que já foi resolvido fica para a próxima tentativa
+                salvar_consultas_pedido(self.registro_jobs, self.chave_job, self.cache)
         
         finally:
+            parar_leitura.set()
+            medidor.parar()
             self.atualizar_progresso(100)
     
     def _finalizar_processamento(self):
@@ -659,8 +1534,8 @@ class InterfaceProcessador:
         self.processando = False
         self.btn_processar.config(state="normal", text="🚀 Processar Arquivo")
         
-        # Habilitar botão de salvar fornecedores se houver dados processados
-        if self.dados_cruzados_por_fornecedor:
+        # Habilitar botão de salvar fornecedores se houver dados ainda não salvos
+        if any(cnpj not in self.fornecedores_processados for cnpj in self.dados_cruzados_por_fornecedor):
             self.btn_salvar_fornecedores.config(state="normal")
         
         self.barra_progresso['value'] = 0
@@ -676,7 +1551,7 @@ class InterfaceProcessador:
         for cnpj_fornecedor in self.dados_cruzados_por_fornecedor.keys():
             if cnpj_fornecedor not in self.fornecedores_processados:
                 seqfornecedor = self.cache.cache_fornecedores.get(cnpj_fornecedor, "DESCONHECIDO")
-                num_registros = len(self.dados_cruzados_por_fornecedor[cnpj_fornecedor])
+                num_registros = self.dados_cruzados_por_fornecedor.contagem(cnpj_fornecedor)
                 fornecedores_disponiveis.append((cnpj_fornecedor, seqfornecedor, num_registros))
         
         if not fornecedores_disponiveis:
@@ -726,6 +1601,12 @@ class InterfaceProcessador:
                               font=("Arial", 10), bg="#4CAF50", fg="white")
         btn_salvar.pack(side="left", padx=5)
         
+        if SAIDA_CONSOLIDADA:
+            btn_consolidado = tk.Button(frame_botoes, text="📦 Salvar Todos em um Arquivo",
+                                       command=lambda: self.salvar_todos_consolidado(dialogo, fornecedores_disponiveis),
+                                       font=("Arial", 10), bg="#2196F3", fg="white")
+            btn_consolidado.pack(side="left", padx=5)
+        
         btn_cancelar = tk.Button(frame_botoes, text="Cancelar", 
                                 command=dialogo.destroy,
                                 font=("Arial", 10))
@@ -749,6 +1630,33 @@ class InterfaceProcessador:
         # Salvar o fornecedor selecionado
         self.salvar_arquivo_fornecedor(cnpj_fornecedor)
     
+    def salvar_todos_consolidado(self, dialogo, fornecedores_disponiveis):
+        """Grava todos os fornecedores ainda não salvos em um único arquivo (modo consolidado)"""
+        dialogo.destroy()
+        cnpjs = [cnpj for cnpj, _, _ in fornecedores_disponiveis]
+        try:
+            os.makedirs(DIRETORIO_REDE, exist_ok=True)
+            nome_base = os.path.splitext(self.nome_arquivo_original)[0]
+            self.adicionar_log(f"\n💾 Salvando {len(cnpjs)} fornecedor(es) em um arquivo consolidado...")
+            
+            caminho_completo, manifesto = gravar_arquivo_consolidado(
+                self.dados_cruzados_por_fornecedor, self.cache.cache_fornecedores, nome_base, DIRETORIO_REDE, cnpjs
+            )
+            for cnpj in cnpjs:
+                if self.chave_job:
+                    self.registro_jobs.registrar_arquivo(self.chave_job, cnpj, caminho_completo)
+                self.fornecedores_processados.append(cnpj)
+            
+            self.adicionar_log(f"✅ Arquivo salvo: {os.path.basename(caminho_completo)}")
+            self.adicionar_log(f"📁 Caminho: {caminho_completo}")
+            self.adicionar_log(f"📊 {manifesto['total_linhas']} registro(s) de {len(cnpjs)} fornecedor(es); índice no manifesto .json")
+            self.btn_salvar_fornecedores.config(state="disabled")
+            messagebox.showinfo("Sucesso", f"Arquivo consolidado salvo com sucesso!\n\n{caminho_completo}")
+        
+        except Exception as e:
+            self.adicionar_log(f"❌ Erro ao salvar arquivo consolidado: {str(e)}")
+            messagebox.showerror("Erro", f"Erro ao salvar arquivo consolidado:\n{str(e)}")
+    
     def salvar_arquivo_fornecedor(self, cnpj_fornecedor: str):
         """Gera um arquivo TXT para o fornecedor especificado"""
         if cnpj_fornecedor not in self.dados_cruzados_por_fornecedor:
@@ -771,22 +1679,14 @@ class InterfaceProcessador:
             registros = self.dados_cruzados_por_fornecedor[cnpj_fornecedor]
             seqfornecedor = self.cache.cache_fornecedores.get(cnpj_fornecedor, "DESCONHECIDO")
             
-            # Gerar nome do arquivo com timestamp
-            data_hora_atual = datetime.now().strftime('%Y%m%d_%H%M%S')
             nome_base = os.path.splitext(self.nome_arquivo_original)[0]
-            data_processamento = datetime.now().strftime('%Y%m%d')
-            
-            # Nome do arquivo: [nome_base]_[seqfornecedor]_[timestamp].txt
-            nome_arquivo = f"{nome_base}_F{seqfornecedor}_{data_hora_atual}.txt"
-            caminho_completo = os.path.join(DIRETORIO_REDE, nome_arquivo)
             
             self.adicionar_log(f"\n💾 Salvando arquivo para fornecedor {cnpj_fornecedor}...")
             
-            with open(caminho_completo, 'w', encoding='utf-8') as arquivo:
-                for seqproduto, seqfornecedor, seqpessoaemp, sugestaolote, idcontroleinterno in registros:
-                    # Formato: SEQPRODUTO;SEQFORNECEDOR;SEQPESSOAEMP;SUGESTAOLOTE;DATADEPROCESSAMENTO;1;1;DATADEPROCESSAMENTO;C;C(idcontroleinterno)
-                    linha = f"{seqproduto};{seqfornecedor};{seqpessoaemp};{sugestaolote};{data_processamento};1;1;{data_processamento};C;N{idcontroleinterno}"
-                    arquivo.write(linha + '\n')
+            caminho_completo = gravar_arquivo_fornecedor(registros, seqfornecedor, nome_base)
+            nome_arquivo = os.path.basename(caminho_completo)
+            if self.chave_job:
+                self.registro_jobs.registrar_arquivo(self.chave_job, cnpj_fornecedor, caminho_completo)
             
             # Marcar fornecedor como processado
             self.fornecedores_processados.append(cnpj_fornecedor)
@@ -814,10 +1714,12 @@ class InterfaceProcessador:
                 messagebox.showinfo("Processo Concluído", 
                                    f"Todos os fornecedores foram salvos com sucesso!\n\n"
                                    f"Total de fornecedores: {len(self.dados_cruzados_por_fornecedor)}\n"
-                                   f"Total de registros: {sum(len(r) for r in self.dados_cruzados_por_fornecedor.values())}\n\n"
+                                   f"Total de registros: {self.dados_cruzados_por_fornecedor.total()}\n\n"
                                    f"Arquivos salvos em: {DIRETORIO_REDE}")
                 self.adicionar_log(f"🎉 Todos os {len(self.dados_cruzados_por_fornecedor)} fornecedores foram salvos!")
                 self.btn_salvar_fornecedores.config(state="disabled")
+                if self.chave_job:
+                    self.registro_jobs.concluir(self.chave_job)
             
         except PermissionError as e:
             self.adicionar_log(f"❌ Erro de permissão ao salvar arquivo: {str(e)}")
@@ -837,6 +1739,9 @@ class InterfaceProcessador:
             # Aguardar um pouco para processamento parar
             time.sleep(0.5)
             
+            # Apagar os registros despejados em disco
+            self.dados_cruzados_por_fornecedor.fechar()
+            
             # Fechar conexão com o banco se existir
             if self.connection:
                 self.connection.cursor.close()
@@ -2,17 +2,71 @@
 import snorte
 from pathlib import Path
 import csv
+import re
+import shutil
+import json
+import hashlib
+import os
+import tempfile
+import time
+import threading
+import queue
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from itertools import chain, islice
+import numpy as np
 import pandas as pd
+from leitor_bytes import iterar_linhas_mmap, para_centavos, usar_mmap
+from resiliencia import BANCO, TempoEsgotadoBanco, conexao_driver
+from memoria import ArmazemResultados
 from abc import ABC, abstractmethod
+from typing import Iterable, Iterator
+
+# Incrementar quando o layout dos arquivos exportados mudar, para invalidar
+# os manifestos de exportação incremental já gravados
+VERSAO_LAYOUT_CONSINCO = 4
+
+# Linhas trazidas do banco por fetchmany nas consultas em lotes
+TAMANHO_LOTE_CONSULTA = 5000
+
+# Consultas simultâneas (e conexões) no modo Cotefácil por loja
+TRABALHADORES_POR_LOJA = 4
+
+# Linhas formatadas de uma vez ao gravar o TXT NeoGrid
+LINHAS_POR_ESCRITA = 50000
 
 class ConexaoBD:
-    def __init__(self):
+    def __init__(self, conectar: bool = True):
+        self.conexao = None
+        # Sinaliza que a tentativa de conexão terminou (com sucesso ou não)
+        self.pronta = threading.Event()
+        if conectar:
+            self.conectar()
+
+    def conectar(self):
         try:
             self.conexao = snorte.Snorte()
             print("Conexão com o banco inicializada!")
         except Exception:
             self.conexao = None
             print(f"Erro ao inicializar conexão.")
+        finally:
+            self.pronta.set()
+
+    def conectar_em_segundo_plano(self, ao_concluir=None) -> threading.Thread:
+        # Abre a conexão sem travar a interface; ao_concluir recebe a própria ConexaoBD
+        def tarefa():
+            self.conectar()
+            if ao_concluir:
+                ao_concluir(self)
+
+        thread = threading.Thread(target=tarefa, daemon=True)
+        thread.start()
+        return thread
+
+    def aguardar(self, timeout: float = None) -> bool:
+        # Espera a conexão em andamento; retorna False se ainda não terminou
+        return self.pronta.wait(timeout)
 
     def verifica_conexao(self) -> bool:
         if self.conexao and self.conexao.connection:
@@ -33,23 +87,119 @@ class ConexaoBD:
                 self.conexao.connection.close()
             print("Conexão com o banco encerrada!")
         except Exception as e:
-            print(f"Erro inesperado ao fechar a conexão: {e}", exc_info=True)
+            print(f"Erro inesperado ao fechar a conexão: {e}")
+
+class PoolConexoes:
+    """Conjunto limitado de conexões compartilhadas entre threads de trabalho.
+
+    As conexões são abertas sob demanda até `tamanho`; quem pede uma
+    conexão com todas em uso espera alguém devolver.
+    """
+
+    def __init__(self, tamanho: int = 4):
+        self.tamanho = tamanho
+        self.livres = queue.LifoQueue()
+        self.abertas = []
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def emprestar(self, timeout: float = None):
+        conexao = self._obter(timeout)
+        if conexao.conexao is None:
+            # Conexão que caiu ou nunca abriu: tenta de novo antes de entregar
+            conexao.conectar()
+        try:
+            yield conexao
+        finally:
+            self.livres.put(conexao)
+
+    def _obter(self, timeout: float = None) -> ConexaoBD:
+        try:
+            return self.livres.get_nowait()
+        except queue.Empty:
+            pass
+
+        # Só a vaga é reservada sob o lock; o login (lento) é feito por emprestar,
+        # fora dele, para as threads abrirem suas conexões ao mesmo tempo
+        with self.lock:
+            if len(self.abertas) < self.tamanho:
+                conexao = ConexaoBD(conectar=False)
+                self.abertas.append(conexao)
+                return conexao
+
+        try:
+            return self.livres.get(timeout=timeout)
+        except queue.Empty:
+            raise TimeoutError("Nenhuma conexão livre no pool") from None
+
+    def fechar(self):
+        with self.lock:
+            for conexao in self.abertas:
+                conexao.fechar_conexao()
+            self.abertas.clear()
 
 # ============ PADRÃO REPOSITORY ============
 class BaseRepository:
     def __init__(self, conexao: ConexaoBD):
         self.conexao = conexao
     
-    def _executar_consulta(self, query: str) -> pd.DataFrame:
-        cursor = self.conexao.conexao.cursor
-        cursor.execute(query)
-        colunas = [desc[0] for desc in cursor.description]
-        linhas = cursor.fetchall()
+    def _executar_consulta(self, query: str, descricao: str = None) -> pd.DataFrame:
+        def consultar():
+            cursor = self._cursor()
+            cursor.execute(query)
+            return [desc[0] for desc in cursor.description], cursor.fetchall()
+
+        colunas, linhas = BANCO.executar(
+            descricao or type(self).__name__, consultar,
+            conexao=lambda: conexao_driver(self.conexao.conexao), ao_repetir=self._reconectar
+        )
         
         df = pd.DataFrame(linhas, columns=colunas)
         df.columns = df.columns.str.lower()
         return df
 
+    def _executar_consulta_em_lotes(self, query: str, tamanho_lote: int = TAMANHO_LOTE_CONSULTA,
+                                    descricao: str = None) -> Iterator[pd.DataFrame]:
+        # Entrega o resultado em DataFrames de até tamanho_lote linhas
+        descricao = descricao or type(self).__name__
+
+        def abrir_cursor():
+            cursor = self._cursor()
+            cursor.execute(query)
+            return cursor
+
+        cursor = BANCO.executar(
+            descricao, abrir_cursor,
+            conexao=lambda: conexao_driver(self.conexao.conexao), ao_repetir=self._reconectar
+        )
+        colunas = [desc[0].lower() for desc in cursor.description]
+        while True:
+            # Um fetchmany que falhou não pode ser repetido sem reler os lotes já entregues
+            linhas = BANCO.executar(
+                descricao, cursor.fetchmany, tamanho_lote,
+                conexao=conexao_driver(self.conexao.conexao), tentativas=1
+            )
+            if not linhas:
+                break
+            yield pd.DataFrame(linhas, columns=colunas)
+
+    def _cursor(self):
+        if self.conexao.conexao is None:
+            # Transitório para a política: conta no disjuntor e é tentado de novo
+            raise ConnectionError("Sem conexão com o banco")
+        return self.conexao.conexao.cursor
+
+    def _reconectar(self, erro: Exception):
+        # A nova tentativa vai em outra sessão; uma chamada presa por timeout
+        # ainda segura a antiga, que então é só abandonada
+        if not isinstance(erro, TempoEsgotadoBanco):
+            try:
+                self.conexao.fechar_conexao()
+            except Exception:
+                pass
+        self.conexao.conexao = None
+        self.conexao.conectar()
+
 class CotacaoRepository(BaseRepository):
     def __init__(self, numero_cotacao: int, conexao: ConexaoBD):
         super().__init__(conexao)
@@ -66,7 +216,7 @@ class CotacaoRepository(BaseRepository):
         FROM MRLV_LISTACOTACAO C
         WHERE C.SEQCOTACAO = {self.numero_cotacao}
         """
-        return self._executar_consulta(query)
+        return self._executar_consulta(query, "buscar_produtos_cotacao")
     
     def buscar_atacadistas_cotacao(self) -> pd.DataFrame:
         query = f"""
@@ -83,10 +233,34 @@ class CotacaoRepository(BaseRepository):
             ON P.SEQPESSOA = M.SEQATACADISTA
         WHERE M.SEQATACCOTACAO = {self.numero_cotacao}
         """
-        return self._executar_consulta(query)
+        return self._executar_consulta(query, "buscar_atacadistas_cotacao")
     
     def buscar_cotacao_cotefacil_por_filial(self) -> pd.DataFrame:
+        return self._executar_consulta(self._query_cotefacil_por_filial(), "buscar_cotacao_cotefacil")
+
+    def buscar_cotacao_cotefacil_em_lotes(self, tamanho_lote: int = TAMANHO_LOTE_CONSULTA) -> Iterator[pd.DataFrame]:
+        # Ordenado por loja para que cada loja chegue em lotes consecutivos
+        query = self._query_cotefacil_por_filial() + "        ORDER BY A.NROEMPRESA\n"
+        return self._executar_consulta_em_lotes(query, tamanho_lote, "buscar_cotacao_cotefacil")
+
+    def listar_lojas_cotefacil(self) -> list:
         query = f"""
+        SELECT DISTINCT A.NROEMPRESA
+        FROM mac_gercompraitem a,
+            map_produto p
+        WHERE a.seqproduto = p.seqproduto
+        and a.qtdpedida <> 0
+        and a.seqgercompra = {self.numero_cotacao}
+        ORDER BY A.NROEMPRESA
+        """
+        return self._executar_consulta(query, "listar_lojas_cotefacil")["nroempresa"].tolist()
+
+    def buscar_cotacao_cotefacil_da_loja(self, nroempresa: int) -> pd.DataFrame:
+        query = self._query_cotefacil_por_filial() + f"        and a.nroempresa = {int(nroempresa)}\n"
+        return self._executar_consulta(query, "buscar_cotacao_cotefacil_da_loja")
+
+    def _query_cotefacil_por_filial(self) -> str:
+        return f"""
         SELECT
             A.NROEMPRESA,
             (Select max(c.codacesso)
@@ -114,13 +288,98 @@ class CotacaoRepository(BaseRepository):
         and a.seqgercompra = {self.numero_cotacao}
         """
 
-        return self._executar_consulta(query)
+# ============ SNAPSHOT LOCAL ============
+# Cópia local (pickle do pandas) dos dados da cotação lidos do banco
+class SnapshotCotacao:
+    def __init__(self, pasta: Path = None, validade_minutos: int = 120):
+        self.pasta = Path(pasta) if pasta else Path(__file__).parent / "snapshots"
+        self.validade_segundos = validade_minutos * 60
+
+    def _caminho(self, numero_cotacao: int, nome: str) -> Path:
+        return self.pasta / f"cotacao{numero_cotacao}_{nome}.pkl"
+
+    def carregar(self, numero_cotacao: int, nome: str, aceitar_expirado: bool = False):
+        caminho = self._caminho(numero_cotacao, nome)
+        try:
+            idade = time.time() - caminho.stat().st_mtime
+        except OSError:
+            return None
+
+        if idade > self.validade_segundos and not aceitar_expirado:
+            return None
+
+        try:
+            return pd.read_pickle(caminho)
+        except Exception as e:
+            print(f"Snapshot inválido ignorado ({caminho.name}): {e}")
+            return None
+
+    def salvar(self, numero_cotacao: int, nome: str, df: pd.DataFrame):
+        self.pasta.mkdir(parents=True, exist_ok=True)
+        caminho = self._caminho(numero_cotacao, nome)
+        # Temporário único: jobs simultâneos da mesma cotação não disputam o mesmo arquivo
+        descritor, temporario = tempfile.mkstemp(dir=self.pasta, prefix=caminho.stem, suffix=".tmp")
+        os.close(descritor)
+        try:
+            df.to_pickle(temporario)
+            os.replace(temporario, caminho)
+        except BaseException:
+            Path(temporario).unlink(missing_ok=True)
+            raise
+
+class CotacaoRepositoryComSnapshot(CotacaoRepository):
+    def __init__(
+        self,
+        numero_cotacao: int,
+        conexao: ConexaoBD,
+        snapshot: SnapshotCotacao = None,
+        forcar_atualizacao: bool = False,
+        aceitar_expirado: bool = False
+    ):
+        super().__init__(numero_cotacao, conexao)
+        self.snapshot = snapshot or SnapshotCotacao()
+        self.forcar_atualizacao = forcar_atualizacao
+        # Usado ao retomar um job interrompido: o snapshot gravado por ele vale mesmo vencido
+        self.aceitar_expirado = aceitar_expirado
+
+    def buscar_produtos_cotacao(self) -> pd.DataFrame:
+        return self._com_snapshot("produtos", super().buscar_produtos_cotacao)
+
+    def buscar_atacadistas_cotacao(self) -> pd.DataFrame:
+        return self._com_snapshot("atacadistas", super().buscar_atacadistas_cotacao)
+
+    def _com_snapshot(self, nome: str, consulta) -> pd.DataFrame:
+        if not self.forcar_atualizacao:
+            df = self.snapshot.carregar(self.numero_cotacao, nome, aceitar_expirado=self.aceitar_expirado)
+            if df is not None:
+                print(f"Usando snapshot local: {nome} da cotação {self.numero_cotacao}")
+                return df
+
+        try:
+            df = consulta()
+        except Exception as e:
+            # Banco fora do ar: reprocessa com o último snapshot, mesmo expirado
+            df = self.snapshot.carregar(self.numero_cotacao, nome, aceitar_expirado=True)
+            if df is None:
+                raise
+            print(f"Banco indisponível ({e}). Usando snapshot expirado: {nome}")
+            return df
+
+        self.snapshot.salvar(self.numero_cotacao, nome, df)
+        return df
 
 class TxtCotacaoParser:
     def __init__(self, caminho_arquivo: Path):
         self.caminho_arquivo = caminho_arquivo
 
-    def extrair_precos(self) -> dict[str, dict[str, str]]:
+    def extrair_precos(self) -> dict[str, dict[str, int]]:
+        # Preços em centavos (int); a formatação "0,00" só acontece na exportação
+        if usar_mmap(self.caminho_arquivo):
+            return self.extrair_precos_centavos()
+        return self.extrair_precos_texto()
+
+    def extrair_precos_texto(self) -> dict[str, dict[str, int]]:
+        # Modo para arquivos pequenos: leitura linha a linha do texto decodificado
         precos_por_fornecedor = {}
         cnpj_atual = None
 
@@ -143,7 +402,10 @@ class TxtCotacaoParser:
 
                 if tipo == "3" and cnpj_atual:
                     ean = campos[1]
-                    preco = campos[4]
+                    try:
+                        preco = para_centavos(campos[4])
+                    except (IndexError, ValueError):
+                        continue
                     precos_por_fornecedor[cnpj_atual][ean] = preco
 
                 if tipo == "4":
@@ -154,6 +416,37 @@ class TxtCotacaoParser:
 
         return precos_por_fornecedor
 
+    def extrair_precos_centavos(self) -> dict[str, dict[str, int]]:
+        # Modo para arquivos grandes: varre os bytes mapeados em memória e só
+        # decodifica CNPJ e EAN; o preço vira inteiro em centavos
+        precos_por_fornecedor = {}
+        precos_atual = None
+
+        for linha in iterar_linhas_mmap(self.caminho_arquivo):
+            linha = linha.strip()
+
+            if linha[:2] == b"3;":
+                if precos_atual is None:
+                    continue
+                campos = linha.split(b";", 5)
+                try:
+                    precos_atual[campos[1].decode("utf-8")] = para_centavos(campos[4])
+                except (IndexError, ValueError):
+                    pass
+                continue
+
+            tipo = linha.split(b";", 1)[0]
+
+            if tipo == b"2":
+                cnpj_atual = linha.split(b";", 2)[1].decode("utf-8")
+                precos_atual = precos_por_fornecedor[cnpj_atual] = {}
+            elif tipo == b"4":
+                precos_atual = None
+            elif tipo == b"5":
+                break
+
+        return precos_por_fornecedor
+
 # ============ PADRÃO STRATEGY ============
 class EstrategiaProcessamento(ABC):
     @abstractmethod
@@ -167,33 +460,160 @@ class EstrategiaConsinco(EstrategiaProcessamento):
         
         from data_frame import TxtCotacaoParser
         parser = TxtCotacaoParser(kwargs['caminho_txt'])
-        precos = parser.extrair_precos()
         
-        df_cotacao = repositorio.buscar_produtos_cotacao()
-        df_atacadistas = repositorio.buscar_atacadistas_cotacao()
+        # Lê o TXT em paralelo às consultas; as duas consultas continuam em
+        # sequência porque compartilham o mesmo cursor
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            futuro_precos = executor.submit(parser.extrair_precos)
+            df_cotacao = repositorio.buscar_produtos_cotacao()
+            df_atacadistas = repositorio.buscar_atacadistas_cotacao()
+            precos = futuro_precos.result()
         
-        resultados = {}
-        for _, atac in df_atacadistas.iterrows():
+        historico = kwargs.get('historico')
+        if historico is not None:
+            self._registrar_historico(historico, repositorio.numero_cotacao, precos)
+        
+        tabela_precos = precos_em_tabela(precos)
+        diferencas = self._diferencas(kwargs, repositorio.numero_cotacao, tabela_precos)
+        
+        hash_produtos = ManifestoExportacao.hash_dataframe(df_cotacao)
+        
+        cnpjs = df_atacadistas["cnpj_completo"].tolist()
+        ultimos_precos = None
+        if historico is not None:
+            ultimos_precos = self._ultimos_precos(historico, repositorio.numero_cotacao, df_cotacao["ean"], cnpjs)
+        
+        # Acima do orçamento de memória, os DataFrames dos fornecedores vão para o disco
+        resultados = ArmazemResultados(kwargs.get('orcamento_memoria_mb'))
+        fornecedores = {}
+        for posicao, (_, atac) in enumerate(df_atacadistas.iterrows()):
             cnpj = atac["cnpj_completo"]
             nome_razao = atac["nomerazao"]
+            precos_fornecedor = precos.get(cnpj, {})
             
-            df_fornecedor = self._montar_df_fornecedor(df_cotacao, precos.get(cnpj, {}))
+            df_fornecedor = self._montar_df_fornecedor(df_cotacao, precos_fornecedor)
             df_final = self._preparar_df_final(df_fornecedor)
             
-            resultados[nome_razao] = {
-                'df': df_final,
-                'cnpj': cnpj
+            info = {
+                'cnpj': cnpj,
+                'hash': ManifestoExportacao.calcular_hash(
+                    VERSAO_LAYOUT_CONSINCO,
+                    hash_produtos,
+                    sorted(precos_fornecedor.items())
+                )
             }
+            if ultimos_precos is not None:
+                df_final = df_final.assign(**{"Últ. Preço": ultimos_precos[posicao]})
+                info['hash_historico'] = ManifestoExportacao.hash_dataframe(df_final[["ean", "Últ. Preço"]])
+            info['df'] = df_final
+            
+            resultados[nome_razao] = info
+            fornecedores[nome_razao] = cnpj
+        
+        if diferencas is not None:
+            diferencas = self._descrever_diferencas(diferencas, df_cotacao, df_atacadistas)
         
         return {
             'tipo': 'consinco',
             'resultados': resultados,
-            'df_atacadistas': df_atacadistas
+            'df_atacadistas': df_atacadistas,
+            'comparativo': self._montar_comparativo(df_cotacao, precos, fornecedores),
+            'tabela_precos': tabela_precos,
+            'diferencas': diferencas
         }
     
+    @staticmethod
+    def _diferencas(kwargs: dict, numero_cotacao: int, tabela_precos: pd.DataFrame):
+        """Compara com o TXT anterior informado ou, sem ele, com a leitura salva na última execução"""
+        if not kwargs.get('diferencas'):
+            return None
+        
+        caminho_anterior = kwargs.get('caminho_txt_anterior')
+        if caminho_anterior:
+            anteriores = precos_em_tabela(TxtCotacaoParser(caminho_anterior).extrair_precos())
+        else:
+            snapshot = kwargs.get('snapshot')
+            anteriores = snapshot.carregar(numero_cotacao, "precos", aceitar_expirado=True) if snapshot else None
+            if anteriores is None:
+                raise ValueError("Sem execução anterior desta cotação para comparar; informe o TXT anterior")
+        return comparar_precos(anteriores, tabela_precos)
+
+    @staticmethod
+    def _descrever_diferencas(diferencas: pd.DataFrame, df_cotacao: pd.DataFrame, df_atacadistas: pd.DataFrame) -> pd.DataFrame:
+        # Nome do fornecedor e dados do produto, para o relatório ser lido sem abrir o TXT.
+        # EANs fora da cotação não mudam nenhum arquivo e ficam de fora
+        nomes = df_atacadistas.drop_duplicates("cnpj_completo").set_index("cnpj_completo")["nomerazao"]
+        produtos = df_cotacao.drop_duplicates("ean").set_index("ean")[["seq", "descricao"]]
+        diferencas = diferencas.join(produtos, on="ean", how="inner")
+        diferencas.insert(0, "fornecedor", diferencas["cnpj"].map(nomes).fillna(""))
+        return diferencas.sort_values(["fornecedor", "cnpj", "seq"], kind="mergesort", ignore_index=True)
+
+    @staticmethod
+    def _registrar_historico(historico, numero_cotacao: int, precos: dict):
+        # O histórico é um complemento: sem pyarrow ou sem disco, a cotação segue
+        try:
+            historico.registrar(numero_cotacao, precos)
+        except Exception as e:
+            print(f"Histórico de preços não atualizado: {e}")
+
+    @staticmethod
+    def _ultimos_precos(historico, numero_cotacao: int, eans: pd.Series, cnpjs: list):
+        """"Últ. Preço" (cotações anteriores) de cada fornecedor, alinhado aos EANs, com um único join"""
+        chaves = pd.DataFrame({
+            "ean": np.tile(eans.to_numpy(dtype=object), len(cnpjs)),
+            "cnpj": np.repeat(np.array(cnpjs, dtype=object), len(eans)),
+        })
+        try:
+            ultimos = historico.ultimo_preco(chaves, excluir_cotacao=numero_cotacao).to_numpy()
+        except Exception as e:
+            print(f"Histórico de preços indisponível: {e}")
+            return None
+        return [
+            pd.array(ultimos[posicao * len(eans):(posicao + 1) * len(eans)], dtype="Int64")
+            for posicao in range(len(cnpjs))
+        ]
+
+    def _montar_comparativo(self, df_cotacao: pd.DataFrame, precos: dict, cnpjs_fornecedores: dict) -> pd.DataFrame:
+        """Matriz EAN x fornecedor com melhor preço, segundo melhor, diferença e vencedor"""
+        fornecedores = list(cnpjs_fornecedores)
+        eans = df_cotacao["ean"]
+
+        # Uma coluna por fornecedor, alinhada aos EANs da cotação; sem cotação = NaN
+        matriz = np.column_stack([
+            pd.Series(precos.get(cnpjs_fornecedores[nome], {}), dtype="float64")
+              .reindex(eans).to_numpy()
+            for nome in fornecedores
+        ]) if fornecedores else np.empty((len(eans), 0))
+        # Preço zerado ou negativo não conta como cotação
+        matriz[~(matriz > 0)] = np.nan
+
+        cotacoes = np.count_nonzero(~np.isnan(matriz), axis=1)
+        ordenada = np.sort(matriz, axis=1)  # NaN vai para o fim
+        melhor = ordenada[:, 0] if fornecedores else np.full(len(eans), np.nan)
+        segundo = ordenada[:, 1] if len(fornecedores) > 1 else np.full(len(eans), np.nan)
+
+        vencedor = np.full(len(eans), "", dtype=object)
+        if fornecedores:
+            indice = np.argmin(np.where(np.isnan(matriz), np.inf, matriz), axis=1)
+            vencedor = np.where(cotacoes > 0, np.array(fornecedores, dtype=object)[indice], "")
+
+        comparativo = df_cotacao[["seq", "ean", "descricao"]].reset_index(drop=True)
+        valores = {nome: matriz[:, posicao] for posicao, nome in enumerate(fornecedores)}
+        valores.update({
+            "Melhor Preço": melhor,
+            "2º Melhor": segundo,
+            "Diferença": segundo - melhor,
+        })
+        # Preços continuam em centavos; Int64 mantém os itens sem cotação vazios
+        for nome, coluna in valores.items():
+            comparativo[nome] = pd.array(coluna, dtype="Float64").round().astype("Int64")
+        comparativo["Vencedor"] = vencedor
+        comparativo["Cotações"] = cotacoes
+        return comparativo
+
     def _montar_df_fornecedor(self, df_cotacao: pd.DataFrame, precos_fornecedor: dict) -> pd.DataFrame:
         df = df_cotacao.copy()
-        df["Vlr. Custo"] = df["ean"].map(precos_fornecedor).fillna("0,00")
+        df["Vlr. Custo"] = df["ean"].map(precos_fornecedor).fillna(0).astype("int64")
         return df
     
     def _preparar_df_final(self, df: pd.DataFrame) -> pd.DataFrame:
@@ -202,9 +622,6 @@ class EstrategiaConsinco(EstrategiaProcessamento):
             df_final["embalagem"].astype(str) + "-" + df_final["qtd_embalagem"].astype(str)
         )
         df_final["Prazo"] = 30
-        df_final["Vlr. Custo"] = (
-            df_final["Vlr. Custo"].astype(str).str.replace(".", ",", regex=False)
-        )
         df_final = df_final[
             ["seq", "ean", "descricao", "Emb.", "Prazo", "Vlr. Custo"]
         ]
@@ -218,92 +635,461 @@ class EstrategiaCotefacil(EstrategiaProcessamento):
         if df.empty:
             raise ValueError("Nenhum dado encontrado para esta cotação.")
 
-        resultados = {}
+        # Ordena uma única vez; cada loja vira uma faixa contínua de linhas.
+        # mergesort é estável e preserva a ordem original dos itens da loja
+        df = df.sort_values("nroempresa", kind="mergesort", ignore_index=True)
 
-        # Agrupar por filial
-        for nroempresa, df_filial in df.groupby("nroempresa"):
+        # Renomeia uma vez para o layout; os exporters escolhem as colunas
+        df = df.rename(columns={"ean2": "ean_duplicado"})
 
-            df_filial = df_filial.copy()
+        return {
+            "tipo": "cotefacil",
+            "resultados": LojasCotefacil(df),
+            "df": df
+        }
 
-            # Manter somente as colunas do layout
-            df_filial = df_filial[
-                ["ean", "quantidade", "ean2", "descricao", "marca"]
-            ]
+    def processar_em_lotes(self, repositorio: CotacaoRepository, **kwargs) -> Iterator[tuple]:
+        """Entrega (nroempresa, fatia) conforme os lotes chegam do banco.
 
-            # Garantir ordem correta
-            df_filial = df_filial.rename(columns={"ean2": "ean_duplicado"})
+        Uma loja pode aparecer em vários pares seguidos quando atravessa
+        lotes; a consulta vem ordenada por loja, então nunca volta a uma
+        loja já encerrada.
+        """
+        for lote in repositorio.buscar_cotacao_cotefacil_em_lotes():
+            lote = lote.rename(columns={"ean2": "ean_duplicado"})
+            yield from LojasCotefacil(lote).items()
 
-            resultados[nroempresa] = df_filial
+    def processar_por_loja(self, repositorio: CotacaoRepository, lojas: Iterable, pool: PoolConexoes,
+                           trabalhadores: int = TRABALHADORES_POR_LOJA) -> Iterator[tuple]:
+        """Consulta cada loja em paralelo, com uma conexão do pool por consulta,
+        e entrega (nroempresa, df) na ordem em que as consultas terminam.
+        """
+        def buscar(nroempresa):
+            with pool.emprestar() as conexao:
+                df = CotacaoRepository(repositorio.numero_cotacao, conexao).buscar_cotacao_cotefacil_da_loja(nroempresa)
+            return nroempresa, df.rename(columns={"ean2": "ean_duplicado"})
 
-        return {
-            "tipo": "cotefacil",
-            "resultados": resultados
-        }
+        executor = ThreadPoolExecutor(max_workers=trabalhadores, thread_name_prefix="loja")
+        try:
+            futuros = [executor.submit(buscar, nroempresa) for nroempresa in lojas]
+            for futuro in as_completed(futuros):
+                yield futuro.result()
+        finally:
+            # Consumidor parou (erro na gravação): não dispara as lojas que faltam
+            executor.shutdown(wait=True, cancel_futures=True)
+
+class LojasCotefacil:
+    """Lojas de uma cotação Cotefácil como faixas de um único DataFrame ordenado.
+
+    items() entrega (nroempresa, fatia) sob demanda; as fatias são visões
+    via iloc sobre o mesmo frame, sem cópia por loja.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        self.df = df
+        lojas = df["nroempresa"].to_numpy()
+        # Início de cada loja = posições onde o número da empresa muda
+        inicios = np.flatnonzero(np.r_[True, lojas[1:] != lojas[:-1]]) if len(lojas) else np.array([], dtype=int)
+        fins = np.r_[inicios[1:], len(lojas)]
+        self.faixas = [(lojas[ini].item(), int(ini), int(fim)) for ini, fim in zip(inicios, fins)]
+
+    def __len__(self):
+        return len(self.faixas)
+
+    def __iter__(self):
+        return (nroempresa for nroempresa, _, _ in self.faixas)
+
+    def items(self):
+        for nroempresa, ini, fim in self.faixas:
+            yield nroempresa, self.df.iloc[ini:fim]
+
+# ============ EXPORTAÇÃO INCREMENTAL ============
+# Guarda, na pasta de saída, o hash das entradas de cada arquivo gerado
+class ManifestoExportacao:
+    def __init__(self, pasta_saida: Path, numero_cotacao: int):
+        self.pasta_saida = Path(pasta_saida)
+        self.caminho = self.pasta_saida / f".manifesto_cotacao{numero_cotacao}.json"
+        self.entradas = self._carregar()
+
+    def _carregar(self) -> dict:
+        try:
+            with open(self.caminho, encoding="utf-8") as arquivo:
+                return json.load(arquivo)
+        except (OSError, ValueError):
+            return {}
+
+    def atualizado(self, nome_arquivo: str, hash_entrada: str) -> bool:
+        return (
+            self.entradas.get(nome_arquivo) == hash_entrada
+            and (self.pasta_saida / nome_arquivo).exists()
+        )
+
+    def registrar(self, nome_arquivo: str, hash_entrada: str):
+        self.entradas[nome_arquivo] = hash_entrada
+
+    def salvar(self):
+        descritor, temporario = tempfile.mkstemp(dir=self.pasta_saida, prefix=self.caminho.stem, suffix=".tmp")
+        try:
+            with open(descritor, "w", encoding="utf-8") as arquivo:
+                json.dump(self.entradas, arquivo, indent=2, ensure_ascii=False)
+            os.replace(temporario, self.caminho)
+        except BaseException:
+            Path(temporario).unlink(missing_ok=True)
+            raise
+
+    @staticmethod
+    def calcular_hash(*partes) -> str:
+        conteudo = json.dumps(partes, default=str, ensure_ascii=False)
+        return hashlib.sha256(conteudo.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def hash_dataframe(df: pd.DataFrame) -> str:
+        hashes = pd.util.hash_pandas_object(df, index=False).values
+        digest = hashlib.sha256(hashes.tobytes())
+        digest.update(json.dumps(list(df.columns)).encode("utf-8"))
+        return digest.hexdigest()
+
+# ============ DIFERENÇAS ENTRE EXECUÇÕES ============
+def precos_em_tabela(precos_por_fornecedor: dict) -> pd.DataFrame:
+    """{cnpj: {ean: centavos}} em formato longo (cnpj, ean, preco)"""
+    cnpjs, eans, valores = [], [], []
+    for cnpj, precos in precos_por_fornecedor.items():
+        cnpjs.extend([cnpj] * len(precos))
+        eans.extend(precos.keys())
+        valores.extend(precos.values())
+    return pd.DataFrame({
+        "cnpj": pd.Series(cnpjs, dtype=object),
+        "ean": pd.Series(eans, dtype=object),
+        "preco": pd.Series(valores, dtype="int64"),
+    })
+
+def comparar_precos(anteriores: pd.DataFrame, atuais: pd.DataFrame) -> pd.DataFrame:
+    """Preços alterados, incluídos e removidos entre duas leituras (join por hash em cnpj+ean).
+
+    Itens com o mesmo preço nas duas leituras não aparecem no resultado.
+    """
+    unido = anteriores.merge(
+        atuais, on=["cnpj", "ean"], how="outer", suffixes=("_anterior", "_atual"), indicator=True
+    )
+    origem = unido.pop("_merge")
+    unido = unido[(origem != "both") | (unido["preco_anterior"] != unido["preco_atual"])]
+    origem = origem[unido.index]
+    unido = unido.reset_index(drop=True)
+    unido["situacao"] = np.select(
+        [origem.to_numpy() == "left_only", origem.to_numpy() == "right_only"],
+        ["removido", "incluido"],
+        default="alterado"
+    )
+    for coluna in ("preco_anterior", "preco_atual"):
+        unido[coluna] = unido[coluna].astype("Int64")
+    unido["diferenca"] = unido["preco_atual"] - unido["preco_anterior"]
+    return unido[["cnpj", "ean", "situacao", "preco_anterior", "preco_atual", "diferenca"]]
 
 # ============ EXPORTERS ============
+def formatar_centavos(centavos: pd.Series) -> pd.Series:
+    # 599 -> "5,99", em uma única passada vetorizada
+    valores = centavos.astype("int64")
+    absolutos = valores.abs()
+    texto = (absolutos // 100).astype(str) + "," + (absolutos % 100).astype(str).str.zfill(2)
+    return texto.mask(valores < 0, "-" + texto)
+
 class BaseExporter(ABC):
     @abstractmethod
     def exportar(self, dados, caminho: Path, **kwargs):
         pass
 
+class BaseExporterStreaming(ABC):
+    """Exporter que grava lotes de linhas conforme chegam, sem o resultado inteiro em memória.
+
+    Um lote é um DataFrame (as colunas de `colunas` são lidas nessa ordem)
+    ou uma sequência de tuplas já na ordem do layout.
+    """
+    colunas = []
+    # newline do open: "" para o csv.writer (ele mesmo escreve \r\n); None traduz "\n"
+    # para o fim de linha do sistema, como os TXT gravados com open(..., 'w')
+    novalinha = ""
+
+    def abrir(self, caminho: Path, **kwargs):
+        # buffer (bytes): quem grava muitos lotes num arquivo só pode pedir menos escritas no disco
+        self.arquivo = open(caminho, mode="w", newline=self.novalinha, encoding=self.codificacao,
+                            buffering=kwargs.get("buffer", -1))
+        self.linhas_escritas = 0
+
+    def escrever_lote(self, lote):
+        self._escrever_linhas(self._linhas(lote))
+        self.linhas_escritas += len(lote)
+
+    def fechar(self):
+        self.arquivo.close()
+
+    def exportar_lotes(self, lotes: Iterable, caminho: Path, **kwargs) -> int:
+        self.abrir(caminho, **kwargs)
+        try:
+            for lote in lotes:
+                self.escrever_lote(lote)
+        finally:
+            self.fechar()
+        return self.linhas_escritas
+
+    def _linhas(self, lote):
+        if isinstance(lote, pd.DataFrame):
+            return zip(*(lote[coluna] for coluna in self.colunas))
+        return lote
+
+    @abstractmethod
+    def _escrever_linhas(self, linhas):
+        pass
+
+class CSVExporterConsincoStreaming(BaseExporterStreaming):
+    codificacao = "utf-8-sig"
+    colunas = ["seq", "ean", "descricao", "Emb.", "Prazo", "Vlr. Custo"]
+
+    def abrir(self, caminho: Path, **kwargs):
+        super().abrir(caminho, **kwargs)
+        self.writer = csv.writer(self.arquivo, delimiter=";")
+        self.writer.writerow([])
+        self.writer.writerow([f"Cotação: {kwargs.get('numero_cotacao')}"])
+        self.writer.writerow(["CENTRAL-COMPRAS"])
+        self.writer.writerow(["Seq", "EAN", "Descrição", "Emb.", "Prazo", "Vlr. Custo"])
+
+    def _linhas(self, lote):
+        if isinstance(lote, pd.DataFrame):
+            lote = lote.assign(**{"Vlr. Custo": formatar_centavos(lote["Vlr. Custo"])})
+        return super()._linhas(lote)
+
+    def _escrever_linhas(self, linhas):
+        self.writer.writerows(linhas)
+
+class CSVExporterCotefacilStreaming(BaseExporterStreaming):
+    codificacao = "utf-8-sig"
+    # SEM cabeçalho, apenas dados: EAN, QUANTIDADE, EAN (duplicado), DESCRICAO, MARCA
+    colunas = ["ean", "quantidade", "ean_duplicado", "descricao", "marca"]
+
+    def abrir(self, caminho: Path, **kwargs):
+        super().abrir(caminho, **kwargs)
+        self.writer = csv.writer(self.arquivo, delimiter=";")
+
+    def _escrever_linhas(self, linhas):
+        self.writer.writerows(linhas)
+
+class TXTExporterNeoGridStreaming(BaseExporterStreaming):
+    """Arquivo de pedido NeoGrid de um fornecedor, uma linha por item cruzado"""
+    codificacao = "utf-8"
+    novalinha = None
+    colunas = ["seqproduto", "seqfornecedor", "seqpessoaemp", "quantidade", "idcontroleinterno"]
+
+    def abrir(self, caminho: Path, **kwargs):
+        super().abrir(caminho, **kwargs)
+        self.data_processamento = kwargs.get("data_processamento") or time.strftime("%Y%m%d")
+
+    def _escrever_linhas(self, linhas):
+        data = self.data_processamento.replace("%", "%%")
+        # Formato: SEQPRODUTO;SEQFORNECEDOR;SEQPESSOAEMP;SUGESTAOLOTE;DATADEPROCESSAMENTO;1;1;DATADEPROCESSAMENTO;C;N(idcontroleinterno)
+        modelo = f"%s;%s;%s;%s;{data};1;1;{data};C;N%s\n"
+        linhas = iter(linhas)
+        # Um único % por bloco: a formatação de todos os campos fica no C, sem f-string por linha
+        while True:
+            valores = tuple(chain.from_iterable(islice(linhas, LINHAS_POR_ESCRITA)))
+            if not valores:
+                break
+            self.arquivo.write(modelo * (len(valores) // 5) % valores)
+
 class CSVExporterConsinco(BaseExporter):
     def exportar(self, dados, caminho: Path, **kwargs):
-        df = dados['df']
+        CSVExporterConsincoStreaming().exportar_lotes([dados['df']], caminho, **kwargs)
+
+class CSVExporterCotefacil(BaseExporter):
+    def exportar(self, dados, caminho: Path, **kwargs):
+        CSVExporterCotefacilStreaming().exportar_lotes([dados['df_cotacao']], caminho, **kwargs)
+
+class CSVExporterComparativo(BaseExporter):
+    def exportar(self, dados, caminho: Path, **kwargs):
+        df = dados['comparativo']
         numero_cotacao = kwargs.get('numero_cotacao')
+        colunas_texto = {"seq", "ean", "descricao", "Vencedor", "Cotações"}
+        
+        # Colunas de preço (centavos) viram "5,99"; item sem cotação fica vazio
+        colunas = []
+        for coluna in df.columns:
+            serie = df[coluna]
+            if coluna not in colunas_texto:
+                serie = formatar_centavos(serie.fillna(0)).mask(serie.isna(), "")
+            colunas.append(serie)
         
         with open(caminho, mode="w", newline="", encoding="utf-8-sig") as arquivo:
             writer = csv.writer(arquivo, delimiter=";")
-            writer.writerow([])
             writer.writerow([f"Cotação: {numero_cotacao}"])
-            writer.writerow(["CENTRAL-COMPRAS"])
-            writer.writerow(["Seq", "EAN", "Descrição", "Emb.", "Prazo", "Vlr. Custo"])
-            
-            for _, row in df.iterrows():
-                writer.writerow([
-                    row["seq"],
-                    row["ean"],
-                    row["descricao"],
-                    row["Emb."],
-                    row["Prazo"],
-                    row["Vlr. Custo"]
-                ])
+            writer.writerow(["Seq", "EAN", "Descrição", *df.columns[3:]])
+            writer.writerows(zip(*colunas))
+
+class CSVExporterDiferencas(BaseExporter):
+    """Relatório das mudanças de preço entre duas leituras da mesma cotação"""
+    colunas = [
+        ("fornecedor", "Fornecedor"),
+        ("cnpj", "CNPJ"),
+        ("seq", "Seq"),
+        ("ean", "EAN"),
+        ("descricao", "Descrição"),
+        ("situacao", "Situação"),
+        ("preco_anterior", "Preço Anterior"),
+        ("preco_atual", "Preço Atual"),
+        ("diferenca", "Diferença"),
+    ]
+    colunas_preco = {"preco_anterior", "preco_atual", "diferenca"}
 
-class CSVExporterCotefacil(BaseExporter):
     def exportar(self, dados, caminho: Path, **kwargs):
-        df = dados['df_cotacao']
+        df = dados['diferencas']
+        colunas = []
+        for coluna, _ in self.colunas:
+            serie = df[coluna]
+            if coluna in self.colunas_preco:
+                serie = formatar_centavos(serie.fillna(0)).mask(serie.isna(), "")
+            else:
+                serie = serie.astype(object).where(serie.notna(), "")
+            colunas.append(serie)
         
         with open(caminho, mode="w", newline="", encoding="utf-8-sig") as arquivo:
             writer = csv.writer(arquivo, delimiter=";")
-            # SEM cabeçalho, apenas dados
-            for _, row in df.iterrows():
-                writer.writerow([
-                    row["ean"],           # Primeira coluna EAN
-                    row["quantidade"],    # QUANTIDADE
-                    row["ean_duplicado"], # Segunda coluna EAN (duplicada)
-                    row["descricao"],     # DESCRICAO
-                    row["marca"]          # MARCA
-                ])
+            writer.writerow([f"Cotação: {kwargs.get('numero_cotacao')}"])
+            writer.writerow([cabecalho for _, cabecalho in self.colunas])
+            writer.writerows(zip(*colunas))
+
+# Colunas com este formato guardam centavos e são gravadas divididas por 100
+FORMATO_CENTAVOS = {"num_format": "0.00"}
 
 class XLSXExporter(BaseExporter):
+    # (coluna no DataFrame, cabeçalho, largura, formato da coluna)
+    colunas = [
+        ("seq", "Seq", 10, {"num_format": "0"}),
+        ("ean", "EAN", 16, {"num_format": "0"}),
+        ("descricao", "Descrição", 45, None),
+        ("Emb.", "Emb.", 10, None),
+        ("Prazo", "Prazo", 8, {"num_format": "0"}),
+        ("Vlr. Custo", "Vlr. Custo", 12, FORMATO_CENTAVOS),
+        ("Últ. Preço", "Últ. Preço", 12, FORMATO_CENTAVOS),
+    ]
+
     def exportar(self, dados, caminho: Path, **kwargs):
-        resultados = dados['resultados']
-        
+        import xlsxwriter
+
         print("Gerando XLSX em:", caminho)
-        with pd.ExcelWriter(caminho, engine="xlsxwriter") as writer:
-            for nome_razao, info in resultados.items():
-                df = info['df']
-                df_export = df.rename(columns={
-                    "seq": "Seq",
-                    "ean": "EAN",
-                    "descricao": "Descrição",
-                    "Emb.": "Emb.",
-                    "Prazo": "Prazo",
-                    "Vlr. Custo": "Vlr. Custo"
-                })
-                aba = nome_razao[:31]
-                df_export.to_excel(writer, sheet_name=aba, index=False)
+        # constant_memory grava cada linha no disco assim que a próxima começa,
+        # então as linhas precisam ser escritas em ordem
+        workbook = xlsxwriter.Workbook(str(caminho), {"constant_memory": True})
+        try:
+            self._formatos = {}
+            formato_cabecalho = workbook.add_format({"bold": True, "border": 1})
+            abas_usadas = set()
+
+            for nome, df, colunas in self._abas(dados):
+                aba = self._nome_aba_unico(nome, abas_usadas)
+                self._escrever_aba(workbook, aba, df, colunas, formato_cabecalho)
+        finally:
+            workbook.close()
         print("XLSX gerado com sucesso")
 
+    def _abas(self, dados):
+        comparativo = dados.get('comparativo')
+        if comparativo is not None:
+            yield "Comparativo", comparativo, self._colunas_comparativo(comparativo)
+
+        for nome_razao, info in dados['resultados'].items():
+            yield nome_razao, info['df'], self.colunas
+
+    @staticmethod
+    def _colunas_comparativo(df: pd.DataFrame) -> list:
+        fixas = {"seq", "ean", "descricao", "Melhor Preço", "2º Melhor", "Diferença", "Vencedor", "Cotações"}
+        fornecedores = [coluna for coluna in df.columns if coluna not in fixas]
+        return (
+            [
+                ("seq", "Seq", 10, {"num_format": "0"}),
+                ("ean", "EAN", 16, {"num_format": "0"}),
+                ("descricao", "Descrição", 45, None),
+            ]
+            + [(nome, nome, 14, FORMATO_CENTAVOS) for nome in fornecedores]
+            + [
+                ("Melhor Preço", "Melhor Preço", 12, FORMATO_CENTAVOS),
+                ("2º Melhor", "2º Melhor", 12, FORMATO_CENTAVOS),
+                ("Diferença", "Diferença", 12, FORMATO_CENTAVOS),
+                ("Vencedor", "Vencedor", 35, None),
+                ("Cotações", "Cotações", 10, {"num_format": "0"}),
+            ]
+        )
+
+    def _formato(self, workbook, formato):
+        if not formato:
+            return None
+        chave = tuple(sorted(formato.items()))
+        if chave not in self._formatos:
+            self._formatos[chave] = workbook.add_format(formato)
+        return self._formatos[chave]
+
+    def _escrever_aba(self, workbook, aba: str, df: pd.DataFrame, colunas: list, formato_cabecalho):
+        planilha = workbook.add_worksheet(aba)
+        colunas = [coluna for coluna in colunas if coluna[0] in df.columns]
+
+        for posicao, (_, _, largura, formato) in enumerate(colunas):
+            planilha.set_column(posicao, posicao, largura, self._formato(workbook, formato))
+
+        planilha.write_row(0, 0, [cabecalho for _, cabecalho, _, _ in colunas], formato_cabecalho)
+
+        # Extrai cada coluna uma única vez e escreve as linhas em bloco
+        valores = [self._valores_coluna(df[nome], formato) for nome, _, _, formato in colunas]
+        for linha, registro in enumerate(zip(*valores), start=1):
+            planilha.write_row(linha, 0, registro)
+
+    @staticmethod
+    def _valores_coluna(serie: pd.Series, formato) -> list:
+        # Preços chegam em centavos; na planilha ficam numéricos com duas casas
+        if formato is FORMATO_CENTAVOS:
+            serie = serie / 100
+        # NaN/NA viram None, que o xlsxwriter grava como célula vazia
+        return serie.astype(object).where(serie.notna(), None).tolist()
+
+    @staticmethod
+    def _nome_aba_unico(nome: str, usados: set) -> str:
+        # Excel: até 31 caracteres, sem []:*?/\ e sem repetição (ignorando maiúsculas)
+        base = re.sub(r"[\[\]:*?/\\]", "", str(nome)).strip().strip("'") or "Planilha"
+        aba = base[:31]
+        contador = 2
+        while aba.lower() in usados:
+            sufixo = f" ({contador})"
+            aba = base[:31 - len(sufixo)] + sufixo
+            contador += 1
+        usados.add(aba.lower())
+        return aba
+
+class XLSXExporterCotefacil(XLSXExporter):
+    colunas = [
+        ("ean", "EAN", 16, {"num_format": "0"}),
+        ("quantidade", "Quantidade", 12, {"num_format": "0"}),
+        ("ean_duplicado", "EAN", 16, {"num_format": "0"}),
+        ("descricao", "Descrição", 45, None),
+        ("marca", "Marca", 20, None),
+    ]
+
+    def _abas(self, dados):
+        for nroempresa, df_filial in dados['resultados'].items():
+            yield f"Loja {nroempresa}", df_filial, self.colunas
+
+class ParquetExporterCotefacil(BaseExporter):
+    def exportar(self, dados, caminho: Path, **kwargs):
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise RuntimeError("Exportação Parquet requer o pacote pyarrow (pip install pyarrow)")
+
+        df = dados['df']
+        caminho = Path(caminho)
+
+        # write_to_dataset só acrescenta arquivos; remove a versão anterior da cotação
+        if caminho.exists():
+            shutil.rmtree(caminho)
+
+        print("Gerando Parquet em:", caminho)
+        df.to_parquet(caminho, partition_cols=["nroempresa"], index=False)
+        print("Parquet gerado com sucesso")
+
 # ============ FACTORY ============
 class ProcessadorFactory:
     @staticmethod
@@ -321,7 +1107,26 @@ class ProcessadorFactory:
             return CSVExporterConsinco()
         elif tipo == "cotefacil_csv":
             return CSVExporterCotefacil()
+        elif tipo == "consinco_comparativo_csv":
+            return CSVExporterComparativo()
+        elif tipo == "consinco_diferencas_csv":
+            return CSVExporterDiferencas()
         elif tipo == "consinco_xlsx":
             return XLSXExporter()
+        elif tipo == "cotefacil_xlsx":
+            return XLSXExporterCotefacil()
+        elif tipo == "cotefacil_parquet":
+            return ParquetExporterCotefacil()
+        else:
+            raise ValueError(f"Tipo de exporter desconhecido: {tipo}")
+
+    @staticmethod
+    def criar_exporter_streaming(tipo: str) -> BaseExporterStreaming:
+        if tipo == "consinco_csv":
+            return CSVExporterConsincoStreaming()
+        elif tipo == "cotefacil_csv":
+            return CSVExporterCotefacilStreaming()
+        elif tipo == "neogrid_txt":
+            return TXTExporterNeoGridStreaming()
         else:
-            raise ValueError(f"Tipo de exporter desconhecido: {tipo}")
\ No newline at end of file
+            raise ValueError(f"Tipo de exporter streaming desconhecido: {tipo}")
\ No newline at end of file
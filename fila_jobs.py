@@ -0,0 +1,182 @@
+# fila_jobs.py - registro durável (SQLite) das etapas de cada job, para retomar após falhas
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+CAMINHO_PADRAO = Path(__file__).parent / "jobs.sqlite3"
+
+class RegistroJobs:
+    """Guarda, por job, a etapa atingida, os arquivos já gravados e as consultas resolvidas.
+
+    Um job é identificado por uma chave estável (ex.: "consinco:123:/saida").
+    Enquanto não for concluído, iniciar() com a mesma chave e a mesma
+    impressão das entradas retoma o job em vez de começar do zero.
+    """
+
+    def __init__(self, caminho: Path = None):
+        self.caminho = Path(caminho or CAMINHO_PADRAO)
+        self.lock = threading.Lock()
+        self.banco = sqlite3.connect(str(self.caminho), check_same_thread=False, isolation_level=None)
+        self.banco.execute("PRAGMA journal_mode=WAL")
+        self.banco.executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                chave TEXT PRIMARY KEY,
+                tipo TEXT NOT NULL,
+                estado TEXT NOT NULL,
+                etapa TEXT,
+                impressao TEXT,
+                parametros TEXT,
+                erro TEXT,
+                criado_em REAL,
+                atualizado_em REAL
+            );
+            CREATE TABLE IF NOT EXISTS arquivos (
+                chave TEXT NOT NULL,
+                nome TEXT NOT NULL,
+                caminho TEXT NOT NULL,
+                hash TEXT,
+                gravado_em REAL,
+                PRIMARY KEY (chave, nome)
+            );
+            CREATE TABLE IF NOT EXISTS consultas (
+                chave TEXT NOT NULL,
+                tipo TEXT NOT NULL,
+                valor TEXT NOT NULL,
+                resultado TEXT,
+                PRIMARY KEY (chave, tipo, valor)
+            );
+        """)
+
+    def _executar(self, sql: str, parametros=()):
+        with self.lock:
+            return self.banco.execute(sql, parametros).fetchall()
+
+    def iniciar(self, chave: str, tipo: str, parametros: dict = None, impressao: str = "",
+                validade: float = None, descartar: bool = False) -> bool:
+        """Abre ou retoma o job; retorna True quando há checkpoints a reaproveitar.
+
+        validade: segundos desde a última atividade do job em que ainda vale
+        retomar (para entradas vindas do banco, que a impressão não cobre).
+        descartar: começa do zero mesmo que o job possa ser retomado.
+        """
+        agora = time.time()
+        with self.lock:
+            linha = self.banco.execute(
+                "SELECT estado, impressao, atualizado_em FROM jobs WHERE chave = ?", (chave,)
+            ).fetchone()
+            retomado = (
+                bool(linha) and not descartar and linha[0] != "concluido" and linha[1] == impressao
+                and (validade is None or agora - (linha[2] or 0) <= validade)
+            )
+
+            self.banco.execute("BEGIN")
+            if not retomado:
+                # Entradas mudaram ou o job já terminou: descarta os checkpoints antigos
+                self.banco.execute("DELETE FROM arquivos WHERE chave = ?", (chave,))
+                self.banco.execute("DELETE FROM consultas WHERE chave = ?", (chave,))
+            self.banco.execute(
+                """
+                INSERT INTO jobs (chave, tipo, estado, etapa, impressao, parametros, erro, criado_em, atualizado_em)
+                VALUES (?, ?, 'executando', ?, ?, ?, NULL, ?, ?)
+                ON CONFLICT(chave) DO UPDATE SET
+                    estado = 'executando',
+                    etapa = CASE WHEN ? THEN jobs.etapa ELSE excluded.etapa END,
+                    impressao = excluded.impressao,
+                    parametros = excluded.parametros,
+                    erro = NULL,
+                    atualizado_em = excluded.atualizado_em
+                """,
+                (chave, tipo, "iniciado", impressao, json.dumps(parametros or {}, default=str),
+                 agora, agora, retomado)
+            )
+            self.banco.execute("COMMIT")
+        return retomado
+
+    def marcar_etapa(self, chave: str, etapa: str):
+        self._executar(
+            "UPDATE jobs SET etapa = ?, atualizado_em = ? WHERE chave = ?", (etapa, time.time(), chave)
+        )
+
+    def etapa(self, chave: str) -> str:
+        linhas = self._executar("SELECT etapa FROM jobs WHERE chave = ?", (chave,))
+        return linhas[0][0] if linhas else None
+
+    def concluir(self, chave: str):
+        self._executar(
+            "UPDATE jobs SET estado = 'concluido', etapa = 'concluido', atualizado_em = ? WHERE chave = ?",
+            (time.time(), chave)
+        )
+
+    def falhar(self, chave: str, erro: str):
+        self._executar(
+            "UPDATE jobs SET estado = 'erro', erro = ?, atualizado_em = ? WHERE chave = ?",
+            (erro, time.time(), chave)
+        )
+
+    def interrompidos(self, tipo: str = None) -> list:
+        """Jobs que pararam no meio, sem concluir nem falhar: (chave, tipo, etapa, parametros)"""
+        sql = "SELECT chave, tipo, etapa, parametros FROM jobs WHERE estado = 'executando'"
+        parametros = ()
+        if tipo:
+            sql += " AND tipo = ?"
+            parametros = (tipo,)
+        return [
+            (chave, tipo_job, etapa, json.loads(parametros_job or "{}"))
+            for chave, tipo_job, etapa, parametros_job in self._executar(sql + " ORDER BY criado_em", parametros)
+        ]
+
+    # ---- arquivos gravados ----
+    def registrar_arquivo(self, chave: str, nome: str, caminho, hash_entradas: str = None):
+        self._executar(
+            "INSERT OR REPLACE INTO arquivos (chave, nome, caminho, hash, gravado_em) VALUES (?, ?, ?, ?, ?)",
+            (chave, nome, str(caminho), hash_entradas, time.time())
+        )
+
+    def arquivo_gravado(self, chave: str, nome: str, hash_entradas: str = None) -> str:
+        """Caminho do arquivo se já foi gravado neste job (com o mesmo hash) e ainda existe"""
+        linhas = self._executar(
+            "SELECT caminho, hash FROM arquivos WHERE chave = ? AND nome = ?", (chave, nome)
+        )
+        if not linhas:
+            return None
+        caminho, hash_gravado = linhas[0]
+        if hash_entradas is not None and hash_gravado != hash_entradas:
+            return None
+        return caminho if os.path.exists(caminho) else None
+
+    def arquivos(self, chave: str) -> dict:
+        return dict(self._executar("SELECT nome, caminho FROM arquivos WHERE chave = ?", (chave,)))
+
+    # ---- consultas resolvidas ----
+    def salvar_consultas(self, chave: str, tipo: str, resultados: dict):
+        with self.lock:
+            self.banco.execute("BEGIN")
+            self.banco.executemany(
+                "INSERT OR REPLACE INTO consultas (chave, tipo, valor, resultado) VALUES (?, ?, ?, ?)",
+                ((chave, tipo, str(valor), json.dumps(resultado)) for valor, resultado in resultados.items())
+            )
+            self.banco.execute("COMMIT")
+
+    def carregar_consultas(self, chave: str, tipo: str) -> dict:
+        return {
+            valor: json.loads(resultado)
+            for valor, resultado in self._executar(
+                "SELECT valor, resultado FROM consultas WHERE chave = ? AND tipo = ?", (chave, tipo)
+            )
+        }
+
+    def fechar(self):
+        with self.lock:
+            self.banco.close()
+
+def impressao_arquivo(caminho) -> str:
+    """Identifica o conteúdo de um arquivo de entrada pelo caminho, tamanho e data de modificação"""
+    if not caminho:
+        return ""
+    info = os.stat(caminho)
+    dados = f"{os.path.abspath(caminho)}|{info.st_size}|{info.st_mtime_ns}"
+    return hashlib.sha256(dados.encode("utf-8")).hexdigest()
@@ -0,0 +1,138 @@
+# historico.py - histórico local dos preços cotados, em Parquet particionado por data
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+PASTA_PADRAO = Path(__file__).parent / "historico_precos"
+COLUNAS = ["ean", "cnpj", "preco", "numero_cotacao", "registrado_em"]
+
+class HistoricoPrecos:
+    """Preços (centavos) de cada fornecedor por EAN, acumulados a cada cotação Consinco.
+
+    Cada cotação gravada vira um arquivo em data=AAAA-MM-DD/ (só acrescenta;
+    regravar a mesma cotação no mesmo dia substitui o arquivo dela). As
+    consultas usam um índice em memória por EAN, atualizado só com os
+    arquivos novos desde a última leitura.
+    """
+
+    def __init__(self, pasta: Path = None):
+        self.pasta = Path(pasta) if pasta else PASTA_PADRAO
+        self.lock = threading.Lock()
+        self._arquivos = {}
+        self._df = pd.DataFrame(columns=COLUNAS)
+        self._faixas = {}
+
+    def registrar(self, numero_cotacao: int, precos_por_fornecedor: dict) -> int:
+        """Acrescenta os preços de uma cotação; retorna as linhas gravadas"""
+        registros = [
+            (ean, cnpj, preco)
+            for cnpj, precos in precos_por_fornecedor.items()
+            for ean, preco in precos.items()
+            if preco > 0
+        ]
+        if not registros:
+            return 0
+
+        df = pd.DataFrame(registros, columns=["ean", "cnpj", "preco"])
+        df["preco"] = df["preco"].astype("int64")
+        df["numero_cotacao"] = np.int64(numero_cotacao)
+        df["registrado_em"] = pd.Timestamp.now().floor("s")
+        # Ordenado por EAN/fornecedor: as estatísticas dos row groups servem de índice no arquivo
+        df = df.sort_values(["ean", "cnpj"], ignore_index=True)
+
+        particao = self.pasta / f"data={time.strftime('%Y-%m-%d')}"
+        particao.mkdir(parents=True, exist_ok=True)
+        caminho = particao / f"cotacao{numero_cotacao}.parquet"
+        # Temporário único: duas gravações da mesma cotação não disputam o mesmo arquivo
+        descritor, temporario = tempfile.mkstemp(dir=particao, prefix=caminho.stem, suffix=".tmp")
+        os.close(descritor)
+        try:
+            df.to_parquet(temporario, index=False)
+            os.replace(temporario, caminho)
+        except BaseException:
+            Path(temporario).unlink(missing_ok=True)
+            raise
+        return len(df)
+
+    def ultimos_precos(self, ean: str, n: int = 5, cnpj: str = None) -> pd.DataFrame:
+        """Últimos n preços do EAN (de um fornecedor, se cnpj), do mais recente ao mais antigo"""
+        with self.lock:
+            self._atualizar()
+            faixa = self._faixas.get(str(ean))
+            if faixa is None:
+                return self._df.iloc[0:0]
+            df = self._df.iloc[faixa[0]:faixa[1]]
+        if cnpj is not None:
+            df = df[df["cnpj"] == cnpj]
+        return df.iloc[::-1].head(n).reset_index(drop=True)
+
+    def tendencia(self, ean: str, n: int = 5, cnpj: str = None) -> dict:
+        """Resumo dos últimos n preços: último, média, variação e inclinação (centavos por cotação)"""
+        precos = self.ultimos_precos(ean, n, cnpj)["preco"].to_numpy()[::-1]
+        if len(precos) == 0:
+            return {"amostras": 0, "ultimo": None, "media": None, "variacao": None,
+                    "inclinacao": None, "direcao": None}
+
+        inclinacao = float(np.polyfit(np.arange(len(precos)), precos, 1)[0]) if len(precos) > 1 else 0.0
+        media = float(precos.mean())
+        # Menos de 1% da média por cotação conta como estável
+        if abs(inclinacao) < media * 0.01:
+            direcao = "estavel"
+        else:
+            direcao = "alta" if inclinacao > 0 else "queda"
+        return {
+            "amostras": len(precos),
+            "ultimo": int(precos[-1]),
+            "media": round(media),
+            "variacao": int(precos[-1] - precos[0]),
+            "inclinacao": round(inclinacao, 2),
+            "direcao": direcao,
+        }
+
+    def ultimo_preco(self, chaves: pd.DataFrame, excluir_cotacao: int = None) -> pd.Series:
+        """Preço mais recente de cada par (ean, cnpj) de `chaves`, em um único merge.
+
+        A cotação em processamento pode ser excluída para não comparar o
+        preço com ele mesmo. Sem histórico, o valor fica vazio (NA).
+        """
+        with self.lock:
+            self._atualizar()
+            df = self._df
+        if excluir_cotacao is not None:
+            df = df[df["numero_cotacao"] != excluir_cotacao]
+
+        # _df já está em ordem cronológica dentro de cada EAN: o último de cada par é o mais recente
+        ultimos = df.drop_duplicates(["ean", "cnpj"], keep="last")[["ean", "cnpj", "preco"]]
+        unido = chaves[["ean", "cnpj"]].astype(str).merge(ultimos, on=["ean", "cnpj"], how="left")
+        return pd.Series(unido["preco"].to_numpy(), index=chaves.index, name="Últ. Preço").astype("Int64")
+
+    def _atualizar(self):
+        # Lê só os arquivos novos; um arquivo regravado obriga a reler tudo
+        atuais = {
+            caminho: caminho.stat().st_mtime_ns
+            for caminho in self.pasta.glob("data=*/*.parquet")
+        } if self.pasta.exists() else {}
+        if atuais == self._arquivos:
+            return
+
+        alterados = any(atuais.get(caminho) != mtime for caminho, mtime in self._arquivos.items())
+        novos = list(atuais) if alterados else [caminho for caminho in atuais if caminho not in self._arquivos]
+        partes = [] if alterados or self._df.empty else [self._df]
+        partes += [pd.read_parquet(caminho, columns=COLUNAS) for caminho in novos]
+
+        df = pd.concat(partes, ignore_index=True) if partes else pd.DataFrame(columns=COLUNAS)
+        # A mesma cotação reprocessada em outro dia conta uma vez só (a gravação mais recente)
+        df = df.sort_values(["ean", "registrado_em", "numero_cotacao"], kind="mergesort", ignore_index=True)
+        df = df.drop_duplicates(["ean", "cnpj", "numero_cotacao"], keep="last", ignore_index=True)
+
+        eans = df["ean"].to_numpy()
+        inicios = np.flatnonzero(np.r_[True, eans[1:] != eans[:-1]]) if len(eans) else np.array([], dtype=int)
+        fins = np.r_[inicios[1:], len(eans)]
+        self._faixas = {eans[ini]: (int(ini), int(fim)) for ini, fim in zip(inicios, fins)}
+        self._df = df
+        self._arquivos = atuais
@@ -0,0 +1,89 @@
+# leitor_bytes.py - leitura de arquivos TXT grandes direto dos bytes (mmap)
+import mmap
+import os
+import re
+from typing import Iterator, List, Tuple, Union
+
+# Acima deste tamanho os leitores passam a usar o modo mmap automaticamente
+LIMIAR_MMAP_BYTES = 32 * 1024 * 1024
+# Acima deste tamanho o PEDIDO NeoGrid é dividido entre processos
+LIMIAR_PARALELO_BYTES = 256 * 1024 * 1024
+
+def usar_mmap(caminho_arquivo) -> bool:
+    """Indica se o arquivo é grande o bastante para compensar o modo mmap"""
+    try:
+        return os.path.getsize(caminho_arquivo) >= LIMIAR_MMAP_BYTES
+    except OSError:
+        return False
+
+def usar_processos(caminho_arquivo) -> bool:
+    """Indica se o arquivo é grande o bastante para compensar a leitura em vários processos"""
+    try:
+        return os.path.getsize(caminho_arquivo) >= LIMIAR_PARALELO_BYTES
+    except OSError:
+        return False
+
+def iterar_linhas_mmap(caminho_arquivo, inicio: int = 0, fim: int = None) -> Iterator[bytes]:
+    """Percorre as linhas do arquivo mapeado em memória, sem decodificar o texto"""
+    with open(caminho_arquivo, "rb") as arquivo:
+        if os.fstat(arquivo.fileno()).st_size == 0:
+            return
+        with mmap.mmap(arquivo.fileno(), 0, access=mmap.ACCESS_READ) as mapa:
+            # readline do mmap procura o b"\n" em C, sem passar pelo decodificador
+            mapa.seek(inicio)
+            if fim is None:
+                yield from iter(mapa.readline, b"")
+                return
+
+            while mapa.tell() < fim:
+                linha = mapa.readline()
+                if not linha:
+                    break
+                yield linha
+
+def localizar_registros(caminho_arquivo, tipos: bytes) -> List[Tuple[int, bytes]]:
+    """Varre o arquivo uma vez e devolve (posição, linha) dos registros dos tipos pedidos"""
+    padrao = re.compile(rb"^[" + re.escape(tipos) + rb"];[^\r\n]*", re.M)
+    with open(caminho_arquivo, "rb") as arquivo:
+        if os.fstat(arquivo.fileno()).st_size == 0:
+            return []
+        with mmap.mmap(arquivo.fileno(), 0, access=mmap.ACCESS_READ) as mapa:
+            return [(m.start(), m.group()) for m in padrao.finditer(mapa)]
+
+def para_centavos(campo: Union[bytes, str]) -> int:
+    """Converte um preço como b"5.99" ou "5,99" para inteiro em centavos (599)"""
+    if isinstance(campo, str):
+        campo = campo.encode("ascii")
+
+    # Caso comum, exatamente duas casas: b"5.99" -> int(b"599")
+    inteiro, _, fracao = campo.partition(b".")
+    if len(fracao) == 2 and fracao.isdigit() and inteiro.lstrip(b"-").isdigit():
+        return int(inteiro + fracao)
+
+    campo = campo.strip().replace(b",", b".")
+    if not campo:
+        return 0
+
+    negativo = campo.startswith(b"-")
+    inteiro, _, fracao = campo.lstrip(b"+-").partition(b".")
+    fracao = (fracao + b"000")[:3]
+    if not (inteiro or b"0").isdigit() or not fracao.isdigit():
+        raise ValueError(f"Preço inválido: {campo!r}")
+
+    # Arredonda a terceira casa decimal, se houver
+    valor = int(inteiro or b"0") * 100 + int(fracao[:2]) + (fracao[2:] >= b"5")
+    return -valor if negativo else valor
+
+def para_inteiro(campo: Union[bytes, str]) -> Union[int, str]:
+    """Converte quantidades inteiras ("007" -> 7); mantém o texto original quando não for inteiro.
+
+    Usada pelos dois leitores NeoGrid (texto e bytes), para que a quantidade
+    gravada no TXT não dependa do tamanho do arquivo de entrada.
+    """
+    if isinstance(campo, bytes):
+        campo = campo.decode("utf-8")
+    campo = campo.strip()
+    digitos = campo[1:] if campo[:1] in ("-", "+") else campo
+    if digitos.isascii() and digitos.isdigit():
+        return int(campo)
+    return campo
@@ -1,17 +1,25 @@
 # main.py
 from data_frame import ConexaoBD
 from controlador import CotacaoController
+from fila_jobs import RegistroJobs
 from app import App
 
-conexao = ConexaoBD()
+def conexao_concluida(conexao: ConexaoBD):
+    if not conexao.verifica_conexao():
+        # Sem banco, apenas cotações com snapshot local podem ser reprocessadas
+        print("Banco indisponível: seguindo em modo offline.")
+
+# A janela abre enquanto a conexão é estabelecida em segundo plano
+conexao = ConexaoBD(conectar=False)
+conexao.conectar_em_segundo_plano(conexao_concluida)
 
+controller = None
 try:
-    if not conexao.verifica_conexao():
-        raise RuntimeError("Falha na conexão com o banco.")
-    
-    controller = CotacaoController(conexao)
+    controller = CotacaoController(conexao, registro_jobs=RegistroJobs())
     app = App(controller)
     app.mainloop()
 
 finally:
+    if controller:
+        controller.fechar()
     conexao.fechar_conexao()
\ No newline at end of file
@@ -0,0 +1,315 @@
+# memoria.py - orçamento de memória para resultados intermediários, com despejo em disco
+import os
+import pickle
+import shutil
+import sys
+import tempfile
+import threading
+from pathlib import Path
+
+import pandas as pd
+
+# Orçamento padrão (MB) dos resultados mantidos em memória; COTACAO_MEMORIA_MB sobrescreve
+ORCAMENTO_PADRAO_MB = int(os.environ.get("COTACAO_MEMORIA_MB", "1024"))
+
+def tamanho_estimado(valor) -> int:
+    """Bytes ocupados por um resultado (DataFrame, dict com DataFrames ou lista)"""
+    if isinstance(valor, pd.DataFrame):
+        return int(valor.memory_usage(deep=True).sum())
+    if isinstance(valor, dict):
+        return sum(tamanho_estimado(item) for item in valor.values())
+    if isinstance(valor, list) and valor:
+        # Lista de tuplas: amostra o primeiro item em vez de percorrer tudo
+        primeiro = valor[0]
+        por_item = sys.getsizeof(primeiro) + sum(sys.getsizeof(campo) for campo in primeiro) \
+            if isinstance(primeiro, tuple) else sys.getsizeof(primeiro)
+        return sys.getsizeof(valor) + por_item * len(valor)
+    return sys.getsizeof(valor)
+
+def pico_memoria_mb():
+    """Pico de memória (RSS) do processo desde que ele começou, em MB, ou None se não der para medir.
+
+    Num processo que fica aberto (serviço, interface) é o maior job já
+    executado, não o atual: para uma execução, use MedidorMemoria.
+    Só em Unix (ru_maxrss); no Windows devolve None.
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa em KB; macOS em bytes
+    return round(pico / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+def memoria_atual_mb():
+    """RSS atual do processo em MB, ou None se não der para medir.
+
+    No Linux lê /proc/self/statm; nos demais sistemas precisa do psutil,
+    que é opcional (não é dependência do projeto).
+    """
+    try:
+        with open("/proc/self/statm") as arquivo:
+            paginas = int(arquivo.read().split()[1])
+        return paginas * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+
+    try:
+        import psutil
+    except ImportError:
+        return None
+    return psutil.Process().memory_info().rss / (1024 * 1024)
+
+class MedidorMemoria:
+    """Pico de memória (RSS) do processo durante uma execução, por amostragem.
+
+    Lê o RSS a cada `intervalo` segundos numa thread enquanto a execução
+    roda. Num processo com vários jobs simultâneos (serviço), o valor inclui
+    a memória dos outros jobs. Sem como ler o RSS, pico_mb fica None.
+    """
+
+    def __init__(self, intervalo: float = 0.05):
+        self.intervalo = intervalo
+        self.inicial_mb = None
+        self._pico = None
+        self._parar = threading.Event()
+        self._thread = None
+
+    def iniciar(self) -> "MedidorMemoria":
+        self.inicial_mb = memoria_atual_mb()
+        if self.inicial_mb is None:
+            return self
+        self._pico = self.inicial_mb
+        self._thread = threading.Thread(target=self._amostrar, daemon=True, name="medidor-memoria")
+        self._thread.start()
+        return self
+
+    def parar(self):
+        if self._thread:
+            self._parar.set()
+            self._thread.join()
+            self._thread = None
+            self._registrar()
+
+    @property
+    def pico_mb(self):
+        if self.inicial_mb is None:
+            return None
+        if self._thread:
+            self._registrar()
+        return round(self._pico, 1)
+
+    def __enter__(self):
+        return self.iniciar()
+
+    def __exit__(self, *exc):
+        self.parar()
+
+    def _amostrar(self):
+        while not self._parar.wait(self.intervalo):
+            self._registrar()
+
+    def _registrar(self):
+        atual = memoria_atual_mb()
+        if atual is not None and atual > self._pico:
+            self._pico = atual
+
+class _Despejado:
+    """Referência a um valor gravado em disco"""
+    __slots__ = ("caminho", "formato", "quantidade")
+
+    def __init__(self, caminho: Path, formato: str, quantidade: int):
+        self.caminho = caminho
+        self.formato = formato
+        self.quantidade = quantidade
+
+class ArmazemResultados:
+    """Dicionário de resultados por fornecedor/loja que respeita um orçamento de memória.
+
+    Enquanto a soma dos valores cabe no orçamento, tudo fica em memória.
+    O que passar dele vai para arquivos temporários: DataFrames em Parquet
+    (pickle se não houver pyarrow), listas e demais valores em pickle. A
+    leitura devolve o valor carregado do disco, um de cada vez.
+    """
+
+    def __init__(self, orcamento_mb: float = None):
+        orcamento_mb = ORCAMENTO_PADRAO_MB if orcamento_mb is None else orcamento_mb
+        self.orcamento = int(orcamento_mb * 1024 * 1024)
+        self.em_memoria = 0
+        self.despejados = 0
+        self._valores = {}
+        self._tamanhos = {}
+        self._pasta = None
+        self._sequencia = 0
+
+    # ---- interface de dicionário ----
+    def __setitem__(self, chave, valor):
+        self._descartar(chave)
+        tamanho = tamanho_estimado(valor)
+        if self.em_memoria + tamanho > self.orcamento:
+            self._valores[chave] = self._despejar(valor)
+            self.despejados += 1
+        else:
+            self._valores[chave] = valor
+            self._tamanhos[chave] = tamanho
+            self.em_memoria += tamanho
+
+    def __getitem__(self, chave):
+        return self._carregar(self._valores[chave])
+
+    def get(self, chave, padrao=None):
+        return self[chave] if chave in self._valores else padrao
+
+    def __contains__(self, chave) -> bool:
+        return chave in self._valores
+
+    def __len__(self) -> int:
+        return len(self._valores)
+
+    def __iter__(self):
+        return iter(list(self._valores))
+
+    def __bool__(self) -> bool:
+        return bool(self._valores)
+
+    def keys(self):
+        return list(self._valores)
+
+    def items(self):
+        for chave in list(self._valores):
+            yield chave, self[chave]
+
+    def values(self):
+        for _, valor in self.items():
+            yield valor
+
+    def acrescentar(self, chave, itens):
+        """Estende o valor guardado em chave (lista ou outro tipo com extend);
+        se ele já está em disco, só grava o trecho novo"""
+        atual = self._valores.get(chave)
+        if isinstance(atual, _Despejado):
+            with open(atual.caminho, "ab") as arquivo:
+                pickle.dump(itens, arquivo, protocol=pickle.HIGHEST_PROTOCOL)
+            atual.quantidade += len(itens)
+        elif atual is None:
+            self[chave] = itens
+        else:
+            tamanho = tamanho_estimado(itens)
+            atual.extend(itens)
+            if self.em_memoria + tamanho > self.orcamento:
+                # O valor inteiro vai para o disco; os próximos trechos só são anexados
+                self._descartar(chave)
+                self._valores[chave] = self._despejar(atual)
+                self.despejados += 1
+            else:
+                self._tamanhos[chave] += tamanho
+                self.em_memoria += tamanho
+
+    def contagem(self, chave) -> int:
+        """Quantidade de itens do valor sem trazê-lo do disco"""
+        valor = self._valores[chave]
+        return valor.quantidade if isinstance(valor, _Despejado) else len(valor)
+
+    def total(self) -> int:
+        return sum(self.contagem(chave) for chave in self._valores)
+
+    def visao(self, chaves) -> "VisaoArmazem":
+        return VisaoArmazem(self, chaves)
+
+    def fechar(self):
+        self._valores.clear()
+        self._tamanhos.clear()
+        self.em_memoria = 0
+        if self._pasta:
+            shutil.rmtree(self._pasta, ignore_errors=True)
+            self._pasta = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
+
+    def resumo(self) -> dict:
+        return {
+            "itens": len(self._valores),
+            "despejados": self.despejados,
+            "em_memoria_mb": round(self.em_memoria / (1024 * 1024), 1),
+            "orcamento_mb": round(self.orcamento / (1024 * 1024), 1),
+        }
+
+    # ---- disco ----
+    def _descartar(self, chave):
+        self.em_memoria -= self._tamanhos.pop(chave, 0)
+        antigo = self._valores.pop(chave, None)
+        if isinstance(antigo, _Despejado):
+            antigo.caminho.unlink(missing_ok=True)
+        elif isinstance(antigo, dict):
+            for item in antigo.values():
+                if isinstance(item, _Despejado):
+                    item.caminho.unlink(missing_ok=True)
+
+    def _novo_caminho(self, extensao: str) -> Path:
+        if self._pasta is None:
+            self._pasta = Path(tempfile.mkdtemp(prefix="resultados_"))
+        self._sequencia += 1
+        return self._pasta / f"{self._sequencia:06d}.{extensao}"
+
+    def _despejar(self, valor):
+        if isinstance(valor, pd.DataFrame):
+            try:
+                caminho = self._novo_caminho("parquet")
+                valor.to_parquet(caminho, index=False)
+                return _Despejado(caminho, "parquet", len(valor))
+            except ImportError:
+                caminho = self._novo_caminho("pkl")
+                valor.to_pickle(caminho)
+                return _Despejado(caminho, "pickle_df", len(valor))
+        if isinstance(valor, dict):
+            # Dados do fornecedor: só os DataFrames vão para o disco, o resto é pequeno
+            return {
+                nome: self._despejar(item) if isinstance(item, pd.DataFrame) else item
+                for nome, item in valor.items()
+            }
+
+        caminho = self._novo_caminho("pkl")
+        with open(caminho, "wb") as arquivo:
+            pickle.dump(valor, arquivo, protocol=pickle.HIGHEST_PROTOCOL)
+        return _Despejado(caminho, "pickle", len(valor) if hasattr(valor, "__len__") else 1)
+
+    def _carregar(self, valor):
+        if isinstance(valor, dict):
+            return {nome: self._carregar(item) for nome, item in valor.items()}
+        if not isinstance(valor, _Despejado):
+            return valor
+        if valor.formato == "parquet":
+            return pd.read_parquet(valor.caminho)
+        if valor.formato == "pickle_df":
+            return pd.read_pickle(valor.caminho)
+
+        # Valor gravado em trechos (acrescentar): junta todos na ordem
+        with open(valor.caminho, "rb") as arquivo:
+            carregado = pickle.load(arquivo)
+            while True:
+                try:
+                    carregado.extend(pickle.load(arquivo))
+                except EOFError:
+                    break
+        return carregado
+
+class VisaoArmazem:
+    """Subconjunto ordenado de um ArmazemResultados, lido sob demanda (ex.: abas do XLSX)"""
+
+    def __init__(self, armazem: ArmazemResultados, chaves):
+        self.armazem = armazem
+        self.chaves = list(chaves)
+
+    def __len__(self) -> int:
+        return len(self.chaves)
+
+    def __iter__(self):
+        return iter(self.chaves)
+
+    def items(self):
+        for chave in self.chaves:
+            yield chave, self.armazem[chave]
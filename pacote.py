@@ -0,0 +1,152 @@
+# pacote.py - entrega dos arquivos gerados em um único pacote compactado com manifesto
+import hashlib
+import io
+import json
+import os
+import shutil
+import tarfile
+import tempfile
+import time
+import zipfile
+from pathlib import Path
+
+NOME_MANIFESTO = "manifest.json"
+FORMATOS_PACOTE = ("zip", "tar.zst")
+TAMANHO_BLOCO = 1024 * 1024
+
+def _arquivos_do_pacote(arquivos) -> list:
+    """(caminho local, nome dentro do pacote); pastas (ex.: Parquet) entram com todo o conteúdo"""
+    itens = []
+    for caminho in map(Path, arquivos):
+        if caminho.is_dir():
+            for interno in sorted(p for p in caminho.rglob("*") if p.is_file()):
+                itens.append((interno, f"{caminho.name}/{interno.relative_to(caminho).as_posix()}"))
+        elif caminho.exists():
+            itens.append((caminho, caminho.name))
+    return itens
+
+def _copiar_com_hash(origem: Path, destino=None) -> tuple:
+    # Lê o arquivo uma vez: calcula o sha256 e, se houver destino, copia junto
+    sha256 = hashlib.sha256()
+    tamanho = 0
+    with open(origem, "rb") as arquivo:
+        for bloco in iter(lambda: arquivo.read(TAMANHO_BLOCO), b""):
+            sha256.update(bloco)
+            if destino is not None:
+                destino.write(bloco)
+            tamanho += len(bloco)
+    return sha256.hexdigest(), tamanho
+
+def empacotar(arquivos, caminho_pacote: Path, formato: str = "zip", metadados: dict = None) -> Path:
+    """Junta os arquivos em um pacote com manifest.json (sha256 de cada arquivo).
+
+    O pacote é montado em uma pasta temporária local e só então copiado
+    para o destino em uma única escrita sequencial, trocado atomicamente.
+    """
+    if formato not in FORMATOS_PACOTE:
+        raise ValueError(f"Formato de pacote desconhecido: {formato}")
+
+    caminho_pacote = Path(caminho_pacote)
+    itens = _arquivos_do_pacote(arquivos)
+    manifesto = {
+        "criado_em": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "metadados": metadados or {},
+        "arquivos": [],
+    }
+
+    with tempfile.TemporaryDirectory(prefix="pacote_") as pasta_temporaria:
+        local = Path(pasta_temporaria) / caminho_pacote.name
+
+        if formato == "zip":
+            with zipfile.ZipFile(local, "w", compression=zipfile.ZIP_DEFLATED) as pacote:
+                for origem, nome in itens:
+                    with pacote.open(nome, "w", force_zip64=True) as destino:
+                        sha256, tamanho = _copiar_com_hash(origem, destino)
+                    manifesto["arquivos"].append({"nome": nome, "tamanho": tamanho, "sha256": sha256})
+                pacote.writestr(NOME_MANIFESTO, json.dumps(manifesto, ensure_ascii=False, indent=2))
+        else:
+            zstd = _importar_zstandard()
+            with open(local, "wb") as bruto, zstd.ZstdCompressor().stream_writer(bruto) as comprimido:
+                with tarfile.open(fileobj=comprimido, mode="w|") as pacote:
+                    for origem, nome in itens:
+                        sha256, tamanho = _copiar_com_hash(origem)
+                        manifesto["arquivos"].append({"nome": nome, "tamanho": tamanho, "sha256": sha256})
+                        pacote.add(str(origem), arcname=nome)
+                    dados = json.dumps(manifesto, ensure_ascii=False, indent=2).encode("utf-8")
+                    info = tarfile.TarInfo(NOME_MANIFESTO)
+                    info.size = len(dados)
+                    info.mtime = int(time.time())
+                    pacote.addfile(info, io.BytesIO(dados))
+
+        # Uma única transferência para a pasta de rede
+        caminho_pacote.parent.mkdir(parents=True, exist_ok=True)
+        temporario = caminho_pacote.with_name(caminho_pacote.name + ".tmp")
+        shutil.copyfile(local, temporario)
+        os.replace(temporario, caminho_pacote)
+
+    print(f"Pacote gerado: {caminho_pacote} ({len(itens)} arquivos)")
+    return caminho_pacote
+
+def desempacotar(caminho_pacote: Path, pasta_destino: Path) -> list:
+    """Extrai o pacote e confere o sha256 de cada arquivo contra o manifest.json"""
+    caminho_pacote = Path(caminho_pacote)
+    pasta_destino = Path(pasta_destino).resolve()
+    pasta_destino.mkdir(parents=True, exist_ok=True)
+
+    if caminho_pacote.name.endswith(".tar.zst"):
+        zstd = _importar_zstandard()
+        with open(caminho_pacote, "rb") as bruto, zstd.ZstdDecompressor().stream_reader(bruto) as leitor:
+            with tarfile.open(fileobj=leitor, mode="r|") as pacote:
+                manifesto = None
+                for membro in pacote:
+                    if membro.name == NOME_MANIFESTO:
+                        manifesto = json.load(pacote.extractfile(membro))
+                    elif membro.isfile():
+                        _extrair(pacote.extractfile(membro), membro.name, pasta_destino)
+    else:
+        with zipfile.ZipFile(caminho_pacote) as pacote:
+            manifesto = json.loads(pacote.read(NOME_MANIFESTO))
+            for nome in pacote.namelist():
+                if nome != NOME_MANIFESTO:
+                    with pacote.open(nome) as origem:
+                        _extrair(origem, nome, pasta_destino)
+
+    if manifesto is None:
+        raise ValueError(f"Pacote sem {NOME_MANIFESTO}: {caminho_pacote}")
+
+    extraidos = []
+    for item in manifesto["arquivos"]:
+        caminho = _caminho_seguro(pasta_destino, item["nome"])
+        sha256, _ = _copiar_com_hash(caminho)
+        if sha256 != item["sha256"]:
+            raise ValueError(f"Checksum divergente em {item['nome']}")
+        extraidos.append(caminho)
+
+    print(f"Pacote conferido: {len(extraidos)} arquivos em {pasta_destino}")
+    return extraidos
+
+def _extrair(origem, nome: str, pasta_destino: Path):
+    caminho = _caminho_seguro(pasta_destino, nome)
+    caminho.parent.mkdir(parents=True, exist_ok=True)
+    with open(caminho, "wb") as destino:
+        shutil.copyfileobj(origem, destino, TAMANHO_BLOCO)
+
+def _caminho_seguro(pasta_destino: Path, nome: str) -> Path:
+    # Recusa nomes que sairiam da pasta de destino (../, caminhos absolutos)
+    caminho = (pasta_destino / nome).resolve()
+    if pasta_destino not in caminho.parents:
+        raise ValueError(f"Caminho inválido no pacote: {nome}")
+    return caminho
+
+def _importar_zstandard():
+    try:
+        import zstandard
+    except ImportError:
+        raise RuntimeError("Pacotes .tar.zst requerem o pacote zstandard (pip install zstandard)")
+    return zstandard
+
+if __name__ == "__main__":
+    import sys
+
+    # Uso no destino: python pacote.py <pacote> <pasta_destino>
+    desempacotar(sys.argv[1], sys.argv[2])
@@ -0,0 +1,240 @@
+# resiliencia.py - timeout, novas tentativas e disjuntor para as chamadas ao banco
+import random
+import re
+import threading
+import time
+from collections import deque
+
+# Erros do Oracle/driver que costumam passar sozinhos: sessão derrubada,
+# rede, listener, deadlock, recurso ocupado
+CODIGOS_TRANSITORIOS = {
+    "ORA-00051", "ORA-00054", "ORA-00060", "ORA-01033", "ORA-01034", "ORA-01089",
+    "ORA-03113", "ORA-03114", "ORA-03135", "ORA-03156", "ORA-12170", "ORA-12514",
+    "ORA-12516", "ORA-12519", "ORA-12520", "ORA-12528", "ORA-12537", "ORA-12541",
+    "ORA-12547", "ORA-12571", "ORA-25408",
+    "DPI-1010", "DPI-1067", "DPI-1080",
+}
+# Chamadas que estouraram o call_timeout do driver
+CODIGOS_TIMEOUT = {"ORA-03156", "DPI-1067"}
+
+PADRAO_CODIGO = re.compile(r"\b(?:ORA|DPI)-\d{4,5}\b")
+
+class TempoEsgotadoBanco(TimeoutError):
+    """A consulta passou do tempo limite da política"""
+
+class CircuitoAberto(ConnectionError):
+    """O banco falhou seguidamente e as chamadas estão sendo recusadas sem tentar"""
+
+def codigo_erro(erro: BaseException) -> str:
+    encontrado = PADRAO_CODIGO.search(str(erro))
+    return encontrado.group(0) if encontrado else ""
+
+def erro_transitorio(erro: BaseException) -> bool:
+    if isinstance(erro, CircuitoAberto):
+        return False
+    if isinstance(erro, (TimeoutError, ConnectionError)):
+        return True
+    return codigo_erro(erro) in CODIGOS_TRANSITORIOS
+
+def erro_timeout(erro: BaseException) -> bool:
+    return isinstance(erro, TimeoutError) or codigo_erro(erro) in CODIGOS_TIMEOUT
+
+class PoliticaBanco:
+    """Limites aplicados a cada chamada ao banco"""
+
+    def __init__(self, timeout: float = 120.0, tentativas: int = 3, espera_base: float = 0.5,
+                 espera_maxima: float = 8.0, limite_falhas: int = 5, tempo_aberto: float = 30.0):
+        self.timeout = timeout
+        self.tentativas = tentativas
+        self.espera_base = espera_base
+        self.espera_maxima = espera_maxima
+        self.limite_falhas = limite_falhas
+        self.tempo_aberto = tempo_aberto
+
+    def espera(self, tentativa: int) -> float:
+        # Backoff exponencial com jitter completo: evita que várias threads
+        # voltem a bater no banco no mesmo instante
+        return random.uniform(0, min(self.espera_maxima, self.espera_base * 2 ** (tentativa - 1)))
+
+class Disjuntor:
+    """Abre após limite_falhas falhas transitórias seguidas; depois de tempo_aberto
+    deixa passar uma chamada de teste, que fecha (sucesso) ou reabre (falha) o circuito.
+    """
+
+    def __init__(self, limite_falhas: int, tempo_aberto: float):
+        self.limite_falhas = limite_falhas
+        self.tempo_aberto = tempo_aberto
+        self.falhas_seguidas = 0
+        self.aberto_em = None
+        self.testando = False
+        self.lock = threading.Lock()
+
+    @property
+    def estado(self) -> str:
+        with self.lock:
+            if self.aberto_em is None:
+                return "fechado"
+            if time.monotonic() - self.aberto_em < self.tempo_aberto:
+                return "aberto"
+            return "meio-aberto"
+
+    def permitir(self) -> bool:
+        with self.lock:
+            if self.aberto_em is None:
+                return True
+            if time.monotonic() - self.aberto_em < self.tempo_aberto or self.testando:
+                return False
+            self.testando = True
+            return True
+
+    def sucesso(self):
+        with self.lock:
+            self.falhas_seguidas = 0
+            self.aberto_em = None
+            self.testando = False
+
+    def falha(self) -> bool:
+        """Conta a falha; retorna True se ela abriu o circuito"""
+        with self.lock:
+            self.falhas_seguidas += 1
+            abriu = self.testando or (self.aberto_em is None and self.falhas_seguidas >= self.limite_falhas)
+            if abriu:
+                self.aberto_em = time.monotonic()
+            self.testando = False
+            return abriu
+
+class MetricasBanco:
+    """Contadores por resultado e latência das últimas chamadas"""
+
+    RESULTADOS = ("sucesso", "erro", "timeout", "nova_tentativa", "recusada", "circuito_aberto")
+
+    def __init__(self, amostras: int = 1000):
+        self.contadores = dict.fromkeys(self.RESULTADOS, 0)
+        self.por_consulta = {}
+        self.latencias = deque(maxlen=amostras)
+        self.lock = threading.Lock()
+
+    def registrar(self, resultado: str, descricao: str = "", duracao: float = None):
+        with self.lock:
+            self.contadores[resultado] += 1
+            if descricao:
+                contadores = self.por_consulta.setdefault(descricao, dict.fromkeys(self.RESULTADOS, 0))
+                contadores[resultado] += 1
+            if duracao is not None:
+                self.latencias.append(duracao)
+
+    def resumo(self) -> dict:
+        with self.lock:
+            latencias = sorted(self.latencias)
+            contadores = dict(self.contadores)
+            por_consulta = {descricao: dict(valores) for descricao, valores in self.por_consulta.items()}
+
+        def percentil(p: float):
+            if not latencias:
+                return None
+            return round(latencias[min(len(latencias) - 1, int(p * len(latencias)))], 3)
+
+        return {
+            **contadores,
+            "latencia_p50": percentil(0.50),
+            "latencia_p95": percentil(0.95),
+            "latencia_max": round(latencias[-1], 3) if latencias else None,
+            "por_consulta": por_consulta,
+        }
+
+class ResilienciaBanco:
+    """Executa chamadas ao banco sob a política: timeout, novas tentativas e disjuntor.
+
+    Um único disjuntor por processo representa o banco; se ele está fora,
+    todas as threads passam a falhar rápido em vez de esperar cada uma o seu timeout.
+    """
+
+    def __init__(self, politica: PoliticaBanco = None):
+        self.politica = politica or PoliticaBanco()
+        self.disjuntor = Disjuntor(self.politica.limite_falhas, self.politica.tempo_aberto)
+        self.metricas = MetricasBanco()
+
+    def resumo(self) -> dict:
+        return {"disjuntor": self.disjuntor.estado, **self.metricas.resumo()}
+
+    def executar(self, descricao: str, funcao, *args, conexao=None, tentativas: int = None,
+                 ao_repetir=None, **kwargs):
+        """Chama funcao(*args, **kwargs) aplicando a política.
+
+        conexao: conexão do driver, usada para configurar o call_timeout; pode ser
+            uma função que devolve a conexão atual, resolvida a cada tentativa
+            (ao_repetir pode ter trocado a sessão).
+        ao_repetir: chamado com o erro antes de cada nova tentativa (ex.: reconectar).
+        """
+        tentativas = tentativas or self.politica.tentativas
+        for tentativa in range(1, tentativas + 1):
+            if not self.disjuntor.permitir():
+                self.metricas.registrar("recusada", descricao)
+                raise CircuitoAberto(f"Banco indisponível, chamada recusada: {descricao}")
+
+            inicio = time.monotonic()
+            try:
+                resultado = self._com_timeout(funcao, args, kwargs, conexao() if callable(conexao) else conexao)
+            except Exception as erro:
+                duracao = time.monotonic() - inicio
+                if not erro_transitorio(erro):
+                    # Erro da própria consulta (SQL, dados): não diz nada sobre a saúde do banco
+                    self.disjuntor.sucesso()
+                    self.metricas.registrar("erro", descricao, duracao)
+                    raise
+
+                self.metricas.registrar("timeout" if erro_timeout(erro) else "erro", descricao, duracao)
+                if self.disjuntor.falha():
+                    self.metricas.registrar("circuito_aberto", descricao)
+                    print(f"Disjuntor do banco aberto por {self.politica.tempo_aberto}s após: {erro}")
+                    raise
+                if tentativa == tentativas:
+                    raise
+
+                espera = self.politica.espera(tentativa)
+                self.metricas.registrar("nova_tentativa", descricao)
+                print(f"Falha transitória em {descricao} ({erro}); nova tentativa em {espera:.1f}s")
+                time.sleep(espera)
+                if ao_repetir:
+                    ao_repetir(erro)
+                continue
+
+            self.disjuntor.sucesso()
+            self.metricas.registrar("sucesso", descricao, time.monotonic() - inicio)
+            return resultado
+
+    def _com_timeout(self, funcao, args, kwargs, conexao):
+        timeout = self.politica.timeout
+        if not timeout:
+            return funcao(*args, **kwargs)
+
+        # Driver com call_timeout (python-oracledb/cx_Oracle): o próprio banco interrompe a chamada
+        if conexao is not None and hasattr(conexao, "call_timeout"):
+            conexao.call_timeout = int(timeout * 1000)
+            return funcao(*args, **kwargs)
+
+        # Sem suporte no driver: espera em outra thread e desiste após o timeout.
+        # A thread presa fica para trás, mas quem chamou não trava junto.
+        resultado = {}
+
+        def alvo():
+            try:
+                resultado["valor"] = funcao(*args, **kwargs)
+            except BaseException as erro:
+                resultado["erro"] = erro
+
+        thread = threading.Thread(target=alvo, daemon=True, name="chamada-banco")
+        thread.start()
+        thread.join(timeout)
+        if thread.is_alive():
+            raise TempoEsgotadoBanco(f"Chamada ao banco passou de {timeout}s")
+        if "erro" in resultado:
+            raise resultado["erro"]
+        return resultado.get("valor")
+
+# Instância compartilhada pelo processo (interfaces, serviço e scripts)
+BANCO = ResilienciaBanco()
+
+def conexao_driver(conexao_snorte):
+    """Conexão do driver por trás do objeto snorte, se houver"""
+    return getattr(conexao_snorte, "connection", None)
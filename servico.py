@@ -0,0 +1,261 @@
+# servico.py - serviço HTTP/JSON local que processa cotações e PEDIDOs NeoGrid
+# Uso: python servico.py [porta] [trabalhadores]
+#
+#   POST /jobs        {"tipo": "consinco", "numero_cotacao": 123, "caminho_txt": "...", "pasta_saida": "..."}
+#                     {"tipo": "consinco", ..., "diferencas": true, "caminho_txt_anterior": "..." (opcional)}
+#                     {"tipo": "cotefacil", "numero_cotacao": 123, "pasta_saida": "...", "formatos_extras": ["xlsx"]}
+#                     {"tipo": "cotefacil", "numero_cotacao": 123, "pasta_saida": "...", "por_loja": true}
+#                     {"tipo": "neogrid", "caminho_txt": "...", "pasta_saida": "..."}
+#                     {"tipo": "neogrid", ..., "consolidado": true}  um TXT para todos os fornecedores + manifesto .json
+#   GET  /jobs        lista os jobs
+#   GET  /jobs/<id>   estado do job e, ao concluir, o manifesto dos arquivos gerados
+#   GET  /saude       estado do pool de trabalho e do cache compartilhado
+import json
+import sys
+import threading
+import time
+import traceback
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from controlador import CotacaoController
+from data_frame import TRABALHADORES_POR_LOJA, PoolConexoes, SnapshotCotacao
+from fila_jobs import RegistroJobs
+from historico import HistoricoPrecos
+from memoria import MedidorMemoria, pico_memoria_mb
+from resiliencia import BANCO
+
+PORTA_PADRAO = 8765
+TRABALHADORES_PADRAO = 4
+# Jobs aguardando além deste limite são recusados com 503
+LIMITE_FILA = 100
+
+class ServicoProcessamento:
+    """Executa jobs em um pool limitado que compartilha conexões, snapshots e cache de consultas"""
+
+    def __init__(self, trabalhadores: int = TRABALHADORES_PADRAO, registro: RegistroJobs = None):
+        self.executor = ThreadPoolExecutor(max_workers=trabalhadores, thread_name_prefix="job")
+        self.pool = PoolConexoes(tamanho=trabalhadores)
+        # Separado do pool dos jobs: um job que já segura uma conexão não
+        # disputa com os outros jobs as conexões das consultas por loja
+        self.pool_lojas = PoolConexoes(tamanho=TRABALHADORES_POR_LOJA)
+        self.snapshot = SnapshotCotacao()
+        self.registro = registro or RegistroJobs()
+        self.historico = HistoricoPrecos()
+        self.cache_neogrid = None
+        self.jobs = {}
+        self.lock = threading.Lock()
+
+    def retomar_interrompidos(self) -> int:
+        """Reenvia os jobs que o serviço aceitou mas não concluiu antes de parar"""
+        interrompidos = self.registro.interrompidos(tipo="servico")
+        for chave, _, _, parametros in interrompidos:
+            print(f"Retomando job {chave}")
+            self.enviar(parametros, id_job=chave.split(":", 1)[1])
+        return len(interrompidos)
+
+    def enviar(self, parametros: dict, id_job: str = None) -> dict:
+        tipo = parametros.get("tipo")
+        if tipo not in ("consinco", "cotefacil", "neogrid"):
+            raise ValueError(f"Tipo de job desconhecido: {tipo}")
+
+        with self.lock:
+            pendentes = sum(1 for job in self.jobs.values() if job["estado"] == "aguardando")
+            if pendentes >= LIMITE_FILA:
+                raise OverflowError("Fila de jobs cheia, tente novamente mais tarde")
+
+            job = {
+                "id": id_job or uuid.uuid4().hex,
+                "tipo": tipo,
+                "estado": "aguardando",
+                "parametros": parametros,
+                "criado_em": time.time(),
+                "iniciado_em": None,
+                "concluido_em": None,
+                "resultado": None,
+                "erro": None,
+            }
+            self.jobs[job["id"]] = job
+
+        # Aceito = gravado: se o serviço cair, o job volta na próxima partida
+        self.registro.iniciar(f"servico:{job['id']}", "servico", parametros)
+        self.executor.submit(self._executar, job)
+        return dict(job)
+
+    def consultar(self, id_job: str) -> dict:
+        with self.lock:
+            job = self.jobs.get(id_job)
+            return dict(job) if job else None
+
+    def listar(self) -> list:
+        with self.lock:
+            return [dict(job) for job in self.jobs.values()]
+
+    def saude(self) -> dict:
+        with self.lock:
+            estados = {}
+            for job in self.jobs.values():
+                estados[job["estado"]] = estados.get(job["estado"], 0) + 1
+        return {
+            "jobs": estados,
+            "conexoes_abertas": len(self.pool.abertas),
+            "banco": BANCO.resumo(),
+            "pico_memoria_processo_mb": pico_memoria_mb(),
+            "cache_neogrid": self.cache_neogrid.get_tamanho_cache() if self.cache_neogrid else {},
+        }
+
+    def fechar(self):
+        self.executor.shutdown(wait=True)
+        self.pool.fechar()
+        self.pool_lojas.fechar()
+        self.registro.fechar()
+
+    def _executar(self, job: dict):
+        self._atualizar(job, estado="executando", iniciado_em=time.time())
+        try:
+            with self.pool.emprestar() as conexao:
+                if job["tipo"] == "neogrid":
+                    resultado = self._converter_neogrid(conexao, job["parametros"])
+                else:
+                    resultado = self._processar_cotacao(conexao, job["parametros"])
+            self._atualizar(job, estado="concluido", resultado=resultado, concluido_em=time.time())
+            self.registro.concluir(f"servico:{job['id']}")
+        except Exception as e:
+            print(f"Erro no job {job['id']}:\n{traceback.format_exc()}")
+            self._atualizar(job, estado="erro", erro=str(e), concluido_em=time.time())
+            self.registro.falhar(f"servico:{job['id']}", str(e))
+
+    def _atualizar(self, job: dict, **campos):
+        with self.lock:
+            job.update(campos)
+
+    def _processar_cotacao(self, conexao, parametros: dict) -> dict:
+        controller = CotacaoController(conexao, self.snapshot, self.registro, self.pool_lojas, self.historico)
+        with MedidorMemoria() as medidor:
+            arquivos = controller.processar_cotacao(
+                int(parametros["numero_cotacao"]),
+                parametros["tipo"],
+                caminho_txt=parametros.get("caminho_txt"),
+                pasta_saida=parametros.get("pasta_saida"),
+                formatos_extras=tuple(parametros.get("formatos_extras", ())),
+                incremental=parametros.get("incremental", True),
+                forcar_atualizacao=parametros.get("forcar_atualizacao", False),
+                streaming=parametros.get("streaming", False),
+                pacote=parametros.get("pacote"),
+                por_loja=parametros.get("por_loja", False),
+                diferencas=parametros.get("diferencas", False),
+                caminho_txt_anterior=parametros.get("caminho_txt_anterior"),
+            )
+        # Inclui a memória dos jobs que rodaram ao mesmo tempo
+        return {"arquivos": [str(caminho) for caminho in arquivos], "pico_memoria_mb": medidor.pico_mb}
+
+    def _converter_neogrid(self, conexao, parametros: dict) -> dict:
+        # Importado só aqui: o módulo NeoGrid carrega a interface Tk
+        from cotefacil_v_0_5 import DIRETORIO_REDE, CacheConsulta, converter_pedido
+
+        with self.lock:
+            if self.cache_neogrid is None:
+                self.cache_neogrid = CacheConsulta()
+
+        return converter_pedido(
+            parametros["caminho_txt"],
+            conexao.conexao,
+            self.cache_neogrid,
+            parametros.get("pasta_saida") or DIRETORIO_REDE,
+            self.registro,
+            parametros.get("consolidado"),
+        )
+
+class ManipuladorHTTP(BaseHTTPRequestHandler):
+    servico: ServicoProcessamento = None
+
+    def do_GET(self):
+        partes = self.path.strip("/").split("/")
+        if partes == ["saude"]:
+            self._responder(200, self.servico.saude())
+        elif partes == ["jobs"]:
+            self._responder(200, self.servico.listar())
+        elif len(partes) == 2 and partes[0] == "jobs":
+            job = self.servico.consultar(partes[1])
+            if job:
+                self._responder(200, job)
+            else:
+                self._responder(404, {"erro": "Job não encontrado"})
+        else:
+            self._responder(404, {"erro": "Rota não encontrada"})
+
+    def do_POST(self):
+        if self.path.rstrip("/") != "/jobs":
+            self._responder(404, {"erro": "Rota não encontrada"})
+            return
+
+        try:
+            tamanho = int(self.headers.get("Content-Length", 0))
+            parametros = json.loads(self.rfile.read(tamanho) or b"{}")
+            self._responder(202, self.servico.enviar(parametros))
+        except OverflowError as e:
+            self._responder(503, {"erro": str(e)})
+        except (ValueError, AttributeError) as e:
+            self._responder(400, {"erro": str(e)})
+
+    def _responder(self, status: int, corpo):
+        dados = json.dumps(corpo, ensure_ascii=False, default=str).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(dados)))
+        self.end_headers()
+        self.wfile.write(dados)
+
+    def log_message(self, formato, *args):
+        print(f"[{self.address_string()}] {formato % args}")
+
+def iniciar_servidor(host: str = "127.0.0.1", porta: int = PORTA_PADRAO,
+                     trabalhadores: int = TRABALHADORES_PADRAO) -> ThreadingHTTPServer:
+    ManipuladorHTTP.servico = ServicoProcessamento(trabalhadores)
+    ManipuladorHTTP.servico.retomar_interrompidos()
+    servidor = ThreadingHTTPServer((host, porta), ManipuladorHTTP)
+    print(f"Serviço de processamento em http://{host}:{porta} com {trabalhadores} trabalhadores")
+    return servidor
+
+class ClienteServico:
+    """Cliente mínimo para as interfaces enviarem jobs ao serviço"""
+
+    def __init__(self, url: str = f"http://127.0.0.1:{PORTA_PADRAO}"):
+        self.url = url.rstrip("/")
+
+    def enviar(self, tipo: str, **parametros) -> dict:
+        corpo = json.dumps({"tipo": tipo, **parametros}, default=str).encode("utf-8")
+        requisicao = urllib.request.Request(
+            f"{self.url}/jobs", data=corpo, headers={"Content-Type": "application/json"}
+        )
+        with urllib.request.urlopen(requisicao) as resposta:
+            return json.load(resposta)
+
+    def consultar(self, id_job: str) -> dict:
+        with urllib.request.urlopen(f"{self.url}/jobs/{id_job}") as resposta:
+            return json.load(resposta)
+
+    def aguardar(self, id_job: str, intervalo: float = 1.0, timeout: float = None) -> dict:
+        limite = time.time() + timeout if timeout else None
+        while True:
+            job = self.consultar(id_job)
+            if job["estado"] in ("concluido", "erro"):
+                return job
+            if limite and time.time() > limite:
+                raise TimeoutError(f"Job {id_job} não terminou em {timeout}s")
+            time.sleep(intervalo)
+
+if __name__ == "__main__":
+    porta = int(sys.argv[1]) if len(sys.argv) > 1 else PORTA_PADRAO
+    trabalhadores = int(sys.argv[2]) if len(sys.argv) > 2 else TRABALHADORES_PADRAO
+
+    servidor = iniciar_servidor(porta=porta, trabalhadores=trabalhadores)
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        print("Encerrando serviço...")
+    finally:
+        servidor.server_close()
+        ManipuladorHTTP.servico.fechar()
@@ -0,0 +1,5 @@
+# Os módulos do projeto ficam na raiz do repositório, sem pacote
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,33 @@
+import pytest
+
+pytest.importorskip("snorte")
+
+from data_frame import comparar_precos, precos_em_tabela
+
+def test_precos_em_tabela():
+    df = precos_em_tabela({"A": {"789": 100, "790": 250}, "B": {"789": 99}, "C": {}})
+    assert list(df.columns) == ["cnpj", "ean", "preco"]
+    assert df.values.tolist() == [["A", "789", 100], ["A", "790", 250], ["B", "789", 99]]
+    assert str(df["preco"].dtype) == "int64"
+    assert precos_em_tabela({}).empty
+
+def test_comparar_precos():
+    anteriores = precos_em_tabela({"A": {"789": 100, "790": 250, "791": 10}, "B": {"789": 99}})
+    atuais = precos_em_tabela({"A": {"789": 120, "790": 250}, "B": {"789": 99, "792": 5}})
+
+    diferencas = comparar_precos(anteriores, atuais).sort_values(["cnpj", "ean"], ignore_index=True)
+    assert diferencas[["cnpj", "ean", "situacao"]].values.tolist() == [
+        ["A", "789", "alterado"],
+        ["A", "791", "removido"],
+        ["B", "792", "incluido"],
+    ]
+    for coluna in ("preco_anterior", "preco_atual", "diferenca"):
+        assert str(diferencas[coluna].dtype) == "Int64"
+    assert diferencas["diferenca"].iloc[0] == 20
+    assert diferencas["preco_atual"].isna().iloc[1]
+    assert diferencas["preco_anterior"].isna().iloc[2]
+    assert diferencas["diferenca"].iloc[1:].isna().all()
+
+def test_comparar_precos_sem_mudancas():
+    precos = precos_em_tabela({"A": {"789": 100}})
+    assert comparar_precos(precos, precos.copy()).empty
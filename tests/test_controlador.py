@@ -0,0 +1,89 @@
+import threading
+
+import pandas as pd
+import pytest
+
+pytest.importorskip("snorte")
+
+import controlador
+from controlador import CotacaoController
+from data_frame import SnapshotCotacao
+from fila_jobs import RegistroJobs
+from historico import HistoricoPrecos
+
+class ProcessadorComFalha:
+    def processar(self, repositorio, **kwargs):
+        raise ConnectionError("ORA-12541: TNS:no listener")
+
+def test_medidor_para_quando_o_processamento_falha(tmp_path, monkeypatch):
+    monkeypatch.setattr(controlador.ProcessadorFactory, "criar_processador",
+                        staticmethod(lambda tipo: ProcessadorComFalha()))
+    caminho_txt = tmp_path / "cotacao.txt"
+    caminho_txt.write_text("", encoding="utf-8")
+    controle = CotacaoController(None, SnapshotCotacao(tmp_path / "snapshots"),
+                                 historico=HistoricoPrecos(tmp_path / "historico"))
+
+    with pytest.raises(ConnectionError):
+        controle.processar_cotacao(1, "consinco", caminho_txt, tmp_path / "saida")
+    assert not any(thread.name == "medidor-memoria" for thread in threading.enumerate())
+
+class LojasNoBanco:
+    """Repositório e processador por loja sobre dados em memória"""
+
+    def __init__(self, quantidades):
+        self.quantidades = quantidades
+        self.falhar_apos = None
+        self.consultadas = []
+
+    def listar_lojas_cotefacil(self):
+        return sorted(self.quantidades)
+
+    def processar_por_loja(self, repositorio, lojas, pool):
+        for entregues, nroempresa in enumerate(lojas):
+            if entregues == self.falhar_apos:
+                raise ConnectionError("ORA-03113: end-of-file on communication channel")
+            self.consultadas.append(nroempresa)
+            yield nroempresa, pd.DataFrame({
+                "ean": ["7891000315507"], "quantidade": [self.quantidades[nroempresa]],
+                "ean_duplicado": ["7891000315507"], "descricao": ["x"], "marca": ["m"],
+            })
+
+@pytest.fixture
+def por_loja(tmp_path, monkeypatch):
+    banco = LojasNoBanco({1: 10, 2: 20})
+    monkeypatch.setattr(controlador, "CotacaoRepositoryComSnapshot", lambda *args, **kwargs: banco)
+    monkeypatch.setattr(controlador.ProcessadorFactory, "criar_processador", staticmethod(lambda tipo: banco))
+    registro = RegistroJobs(tmp_path / "jobs.sqlite3")
+    controle = CotacaoController(None, SnapshotCotacao(tmp_path / "snapshots"), registro, pool_lojas=object(),
+                                 historico=HistoricoPrecos(tmp_path / "historico"))
+    yield banco, controle, tmp_path / "saida"
+    registro.fechar()
+
+def interromper_na_segunda_loja(banco, controle, pasta):
+    banco.falhar_apos = 1
+    with pytest.raises(ConnectionError):
+        controle.processar_cotacao(7, "cotefacil", pasta_saida=pasta, por_loja=True)
+    banco.falhar_apos = None
+
+def test_por_loja_grava_um_csv_por_loja(por_loja):
+    banco, controle, pasta = por_loja
+    arquivos = controle.processar_cotacao(7, "cotefacil", pasta_saida=pasta, por_loja=True)
+    assert [arquivo.name for arquivo in arquivos] == ["Cotacao7_Loja1.csv", "Cotacao7_Loja2.csv"]
+    assert (pasta / "Cotacao7_Loja2.csv").read_text(encoding="utf-8-sig").startswith("7891000315507;20;")
+
+def test_por_loja_retomado_mantem_csv_que_bate_com_o_banco(por_loja, capsys):
+    banco, controle, pasta = por_loja
+    interromper_na_segunda_loja(banco, controle, pasta)
+
+    controle.processar_cotacao(7, "cotefacil", pasta_saida=pasta, por_loja=True)
+    assert "mantido: " + str(pasta / "Cotacao7_Loja1.csv") in capsys.readouterr().out
+    assert banco.consultadas == [1, 1, 2]
+
+def test_por_loja_retomado_regrava_csv_que_mudou_no_banco(por_loja, capsys):
+    banco, controle, pasta = por_loja
+    interromper_na_segunda_loja(banco, controle, pasta)
+
+    banco.quantidades[1] = 15
+    controle.processar_cotacao(7, "cotefacil", pasta_saida=pasta, por_loja=True)
+    assert "mantido" not in capsys.readouterr().out
+    assert (pasta / "Cotacao7_Loja1.csv").read_text(encoding="utf-8-sig").startswith("7891000315507;15;")
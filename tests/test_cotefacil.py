@@ -0,0 +1,277 @@
+import json
+import pickle
+import sys
+
+import pytest
+
+# O módulo NeoGrid carrega a interface Tk e a conexão Oracle
+pytest.importorskip("tkinterdnd2")
+pytest.importorskip("snorte")
+
+import cotefacil_v_0_5
+from cotefacil_v_0_5 import (
+    CacheConsulta, ProcessadorComConsultas, RegistrosCruzados, ValidadorChaves, blocos_de_linhas_bytes, dividir_em_trechos,
+    gravar_arquivo_consolidado, gravar_arquivo_fornecedor, gravar_pedido_consolidado, ler_trecho_mmap,
+    normalizar_cnpj, normalizar_ean,
+)
+from fila_jobs import RegistroJobs
+from leitor_bytes import iterar_linhas_mmap
+from memoria import ArmazemResultados
+
+def escrever_pedido(caminho, fornecedores=6, itens=40):
+    linhas = ["1;05327241001054;05327241001054;13808028"]
+    for f in range(fornecedores):
+        linhas.append(f"2;1122233300{f:04d};FORNECEDOR {f};18294;6000000{f};30")
+        linhas += [f"3;78900010{f:02d}{i:03d};x;{i + 1};1.00;0.00;0.00" for i in range(itens)]
+        linhas.append("4;fim")
+    caminho.write_text("\n".join(linhas) + "\n", encoding="utf-8")
+    return caminho
+
+@pytest.mark.parametrize("quantidade", [1, 2, 3, 7, 50])
+def test_trechos_reproduzem_a_leitura_sequencial(tmp_path, quantidade):
+    caminho = escrever_pedido(tmp_path / "pedido.txt")
+    sequencial = list(blocos_de_linhas_bytes(iterar_linhas_mmap(caminho)))
+
+    trechos = dividir_em_trechos(caminho, quantidade)
+    em_trechos = [bloco for trecho in trechos for bloco in ler_trecho_mmap(caminho, trecho)]
+
+    assert em_trechos == sequencial
+    # Trechos contíguos até o fim do arquivo
+    assert all(fim == proximo for (_, fim, _), (proximo, _, _) in zip(trechos, trechos[1:]))
+    assert trechos[-1][1] == caminho.stat().st_size
+
+def test_trecho_carrega_o_estado_do_fornecedor(tmp_path):
+    caminho = escrever_pedido(tmp_path / "pedido.txt", fornecedores=3)
+    _, _, estado = dividir_em_trechos(caminho, 3)[-1]
+    assert estado[0] == "05327241001054"
+    assert estado[1].startswith("1122233300")
+
+def test_arquivo_sem_registros(tmp_path):
+    caminho = tmp_path / "vazio.txt"
+    caminho.write_text("", encoding="utf-8")
+    assert dividir_em_trechos(caminho, 4) == []
+
+@pytest.mark.parametrize("codigo, esperado", [
+    ("7891000315507", "7891000315507"),
+    ("96385074", "96385074"),
+    ("036000291452", "036000291452"),
+    ("17891000315504", "17891000315504"),
+    ("07891000315507", "7891000315507"),
+    (" 7891000 315507 ", "7891000315507"),
+])
+def test_normalizar_ean_validos(codigo, esperado):
+    assert normalizar_ean(codigo) == (esperado, "")
+
+@pytest.mark.parametrize("codigo, motivo", [
+    ("", "EAN vazio"),
+    ("78910A0315507", "EAN com caracteres não numéricos"),
+    ("²891000315507", "EAN com caracteres não numéricos"),
+    ("123456789", "EAN com tamanho inválido (9 dígitos)"),
+    ("1234567895", "EAN com tamanho inválido (10 dígitos)"),
+    ("12345678903", "EAN com tamanho inválido (11 dígitos)"),
+    ("00000000", "EAN zerado"),
+    ("7891000315508", "EAN com dígito verificador inválido"),
+])
+def test_normalizar_ean_rejeitados(codigo, motivo):
+    assert normalizar_ean(codigo) == (None, motivo)
+
+@pytest.mark.parametrize("cnpj, esperado", [
+    ("11222333000181", "11222333000181"),
+    ("11.222.333/0001-81", "11222333000181"),
+    ("5327241001054", "05327241001054"),
+])
+def test_normalizar_cnpj_validos(cnpj, esperado):
+    assert normalizar_cnpj(cnpj) == (esperado, "")
+
+@pytest.mark.parametrize("cnpj, motivo", [
+    ("", "CNPJ vazio"),
+    ("112223330001811", "CNPJ com tamanho inválido (15 dígitos)"),
+    ("11111111111111", "CNPJ com dígitos repetidos"),
+    ("11222333000182", "CNPJ com dígito verificador inválido"),
+])
+def test_normalizar_cnpj_rejeitados(cnpj, motivo):
+    assert normalizar_cnpj(cnpj) == (None, motivo)
+
+def test_validador_conta_rejeicoes_por_fornecedor():
+    validador = ValidadorChaves()
+    assert validador.ean("7891000315507", "F1") == "7891000315507"
+    assert validador.ean("123", "F1") is None
+    assert validador.ean("123", "F1") is None
+    assert validador.total_rejeitados() == 2
+    assert validador.rejeitados == {("F1", "EAN", "123", "EAN com tamanho inválido (3 dígitos)"): 2}
+
+def registros(*linhas):
+    resultado = RegistrosCruzados()
+    for linha in linhas:
+        resultado.adicionar(*linha)
+    return resultado
+
+def test_registros_cruzados_devolvem_as_tuplas():
+    linhas = [(10, 5, 1, 3, "P1"), (11, 5, 2, "1,5", "P2"), (12, 5, 1, 7, "P1")]
+    cruzados = registros(*linhas)
+    assert len(cruzados) == 3
+    assert list(cruzados) == linhas
+    assert cruzados.pedidos == ["P1", "P2"]
+    assert not RegistrosCruzados()
+
+def test_registros_cruzados_extend_remapeia_pedidos():
+    cruzados = registros((10, 5, 1, 3, "P1"))
+    outros = registros((11, 5, 2, 4, "P2"), (12, 5, 2, "x", "P1"))
+    cruzados.extend(outros)
+    assert list(cruzados) == [(10, 5, 1, 3, "P1"), (11, 5, 2, 4, "P2"), (12, 5, 2, "x", "P1")]
+    assert cruzados.pedidos == ["P1", "P2"]
+
+def test_registros_cruzados_pickle_e_armazem():
+    cruzados = registros(*[(i, 5, 1, i % 9, f"P{i % 3}") for i in range(100)])
+    assert list(pickle.loads(pickle.dumps(cruzados))) == list(cruzados)
+
+    with ArmazemResultados(0) as armazem:
+        armazem.acrescentar("F", cruzados)
+        armazem.acrescentar("F", registros((500, 5, 1, "2,5", "P9")))
+        lido = armazem["F"]
+        assert isinstance(lido, RegistrosCruzados)
+        assert armazem.contagem("F") == 101
+        assert list(lido) == list(cruzados) + [(500, 5, 1, "2,5", "P9")]
+
+def test_registros_cruzados_ocupam_menos_que_tuplas():
+    linhas = [(1000000 + i, 5000, 100 + i % 50, i % 30 + 1, f"PED{i % 4}") for i in range(10000)]
+    cruzados = registros(*linhas)
+    em_tuplas = sys.getsizeof(linhas) + sum(
+        sys.getsizeof(linha) + sum(sys.getsizeof(campo) for campo in linha) for linha in linhas
+    )
+    assert sys.getsizeof(cruzados) * 3 < em_tuplas
+
+def test_arquivo_fornecedor_no_layout_neogrid(tmp_path):
+    linhas = [(10, 5, 1, 3, "P1"), (11, 5, 2, "1,5", "P2")]
+    caminho = gravar_arquivo_fornecedor(registros(*linhas), 5, "PEDIDO", str(tmp_path))
+    data = caminho.rsplit("_", 2)[1]
+
+    esperado = "".join(f"{a};{b};{c};{q};{data};1;1;{data};C;N{p}\n" for a, b, c, q, p in linhas)
+    with open(caminho, encoding="utf-8") as arquivo:
+        assert arquivo.read() == esperado
+
+def dados_consolidados():
+    return {
+        "11222333000181": registros((10, 5, 1, 3, "P1"), (11, 5, 2, "1,5", "P1")),
+        "05327241001054": registros((12, 6, 1, 1, "P2")),
+        "44555666000199": registros(*[(20 + i, 7, 1, i + 1, "P3") for i in range(5)]),
+    }
+
+def test_arquivo_consolidado_com_indice(tmp_path):
+    dados = dados_consolidados()
+    seqfornecedores = {"11222333000181": 5, "05327241001054": 6}
+    caminho, manifesto = gravar_arquivo_consolidado(dados, seqfornecedores, "PEDIDO", str(tmp_path))
+
+    assert sorted(p.name for p in tmp_path.iterdir()) == sorted(
+        [manifesto["arquivo"], manifesto["arquivo"].replace(".txt", ".json")]
+    )
+    with open(caminho.replace(".txt", ".json"), encoding="utf-8") as arquivo:
+        assert json.load(arquivo) == manifesto
+
+    with open(caminho, "rb") as arquivo:
+        conteudo = arquivo.read()
+    linhas = conteudo.splitlines(keepends=True)
+    assert manifesto["total_linhas"] == len(linhas) == 8
+    assert [item["seqfornecedor"] for item in manifesto["fornecedores"]] == [5, 6, "DESCONHECIDO"]
+    for item in manifesto["fornecedores"]:
+        trecho = conteudo[item["byte_inicial"]:item["byte_inicial"] + item["bytes"]]
+        inicio = item["linha_inicial"] - 1
+        assert trecho == b"".join(linhas[inicio:inicio + item["linhas"]])
+        assert item["linhas"] == len(dados[item["cnpj_fornecedor"]])
+
+def test_arquivo_consolidado_respeita_ordem_de_cnpjs(tmp_path):
+    dados = dados_consolidados()
+    _, manifesto = gravar_arquivo_consolidado(dados, {}, "PEDIDO", str(tmp_path), ["05327241001054"])
+    assert [item["cnpj_fornecedor"] for item in manifesto["fornecedores"]] == ["05327241001054"]
+    assert manifesto["total_linhas"] == 1
+
+def test_pedido_consolidado_reaproveitado_na_retomada(tmp_path, monkeypatch):
+    dados = dados_consolidados()
+    cache = CacheConsulta()
+    saida = tmp_path / "saida"
+    saida.mkdir()
+    registro = RegistroJobs(tmp_path / "jobs.sqlite3")
+    try:
+        registro.iniciar("neogrid:pedido", "neogrid")
+        primeiro = gravar_pedido_consolidado(dados, cache, "PEDIDO", str(saida), registro, "neogrid:pedido")
+        monkeypatch.setattr(cotefacil_v_0_5, "gravar_arquivo_consolidado",
+                            lambda *args: pytest.fail("arquivo consolidado regravado"))
+        segundo = gravar_pedido_consolidado(dados, cache, "PEDIDO", str(saida), registro, "neogrid:pedido")
+    finally:
+        registro.fechar()
+
+    assert segundo == primeiro
+    assert len({item["caminho"] for item in primeiro}) == 1
+    assert [item["registros"] for item in primeiro] == [2, 1, 5]
+    assert len(list(saida.glob("*.txt"))) == 1
+
+class SessaoBanco:
+    """Conexão snorte que responde às consultas pelo nome da tabela"""
+
+    def __init__(self, respostas):
+        self.respostas = respostas
+        self.cursor = self
+        self.connection = None
+
+    def execute(self, query, **binds):
+        tabela = next(nome for nome in self.respostas if nome in query)
+        linhas = self.respostas[tabela]
+        if tabela == "MAP_PRODCODIGO":
+            linhas = [linha for linha in linhas if linha[0] in binds.values()]
+        self.resultado = linhas
+        return self
+
+    def fetchall(self):
+        return self.resultado
+
+FORNECEDOR = "11222333000181"
+LOJA = "05327241001054"
+EAN_UNIDADE = "7891000315507"
+DUN_CAIXA = "17891000315504"
+
+def processador_com_embalagens():
+    cache = CacheConsulta()
+    cache.cache_fornecedores[FORNECEDOR] = 5
+    cache.cache_empresas[LOJA] = 1
+    sessao = SessaoBanco({"MAP_PRODCODIGO": [
+        (EAN_UNIDADE, 100, "E", 1),
+        (EAN_UNIDADE, 100, "D", 6),
+        (DUN_CAIXA, 100, "D", 12),
+    ]})
+    return ProcessadorComConsultas(sessao, cache)
+
+def test_codigo_de_caixa_convertido_para_unidades():
+    processador = processador_com_embalagens()
+    cruzados = processador.cruzar_fornecedor(FORNECEDOR, [
+        f"{EAN_UNIDADE};x;{LOJA};3;P1",
+        f"{DUN_CAIXA};x;{LOJA};2;P1",
+    ])
+    assert list(cruzados) == [(100, 5, 1, 3, "P1"), (100, 5, 1, 24, "P1")]
+    assert processador.linhas_convertidas_embalagem == 1
+
+def test_escolhe_variante_de_embalagem_no_banco():
+    processador = processador_com_embalagens()
+    processador.consultas.resolver_produtos_em_lote([EAN_UNIDADE, DUN_CAIXA, "7891000100103"])
+    assert processador.cache.cache_produtos == {EAN_UNIDADE: 100, DUN_CAIXA: 100}
+    # Com variante unitária o código vale uma unidade; o DUN-14 só de caixa vale a caixa
+    assert processador.cache.cache_embalagens == {EAN_UNIDADE: 1, DUN_CAIXA: 12}
+    assert "7891000100103" in processador.cache.nao_encontrados
+
+def test_caixa_com_quantidade_fracionada_vai_para_o_relatorio():
+    processador = processador_com_embalagens()
+    cruzados = processador.cruzar_fornecedor(FORNECEDOR, [
+        f"{DUN_CAIXA};x;{LOJA};1,5;P1",
+        f"{EAN_UNIDADE};x;{LOJA};1,5;P1",
+    ])
+    # Sem conversão, o texto original segue como antes
+    assert list(cruzados) == [(100, 5, 1, "1,5", "P1")]
+    assert processador.linhas_rejeitadas_embalagem == 1
+    assert processador.validador.rejeitados == {
+        (FORNECEDOR, "QUANTIDADE", f"{DUN_CAIXA} x 1,5", "Quantidade não inteira em código de caixa (12 un.)"): 1
+    }
+
+def test_precarregar_empresas_ignora_cnpj_nulo():
+    cache = CacheConsulta()
+    sessao = SessaoBanco({"MAX_EMPRESA": [(53272410010, 54, 1), (None, None, 2), (112223330001, None, 3), (112223330001, 81, 4)]})
+    ProcessadorComConsultas(sessao, cache).consultas.precarregar_empresas()
+    assert cache.cache_empresas == {"05327241001054": 1, "11222333000181": 4}
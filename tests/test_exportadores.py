@@ -0,0 +1,36 @@
+import pytest
+
+pytest.importorskip("snorte")
+
+import data_frame
+from data_frame import ProcessadorFactory
+
+REGISTROS = [(10, 5, 1, 3, "P1"), (11, 5, 2, "1,5", "P2"), (123456, 5, 3, 40, "P1")]
+
+def gravar_como_antes(caminho, registros, data_processamento):
+    # Gravação do TXT antes do exporter em streaming
+    with open(caminho, 'w', encoding='utf-8') as arquivo:
+        for seqproduto, seqfornecedor, seqpessoaemp, sugestaolote, idcontroleinterno in registros:
+            linha = f"{seqproduto};{seqfornecedor};{seqpessoaemp};{sugestaolote};{data_processamento};1;1;{data_processamento};C;N{idcontroleinterno}"
+            arquivo.write(linha + '\n')
+
+def test_txt_neogrid_igual_ao_gravador_antigo(tmp_path):
+    gravar_como_antes(tmp_path / "antigo.txt", REGISTROS, "20261019")
+    exporter = ProcessadorFactory.criar_exporter_streaming("neogrid_txt")
+    exporter.exportar_lotes([REGISTROS[:2], REGISTROS[2:]], tmp_path / "novo.txt", data_processamento="20261019")
+
+    assert (tmp_path / "novo.txt").read_bytes() == (tmp_path / "antigo.txt").read_bytes()
+
+@pytest.mark.parametrize("tipo, novalinha", [("neogrid_txt", None), ("cotefacil_csv", "")])
+def test_fim_de_linha_de_cada_exporter(tmp_path, monkeypatch, tipo, novalinha):
+    # No Windows, newline=None grava "\r\n" como o open(..., 'w') de antes;
+    # o csv.writer escreve o próprio "\r\n" e precisa de newline=""
+    recebidos = []
+
+    def abrir(*args, **kwargs):
+        recebidos.append(kwargs.get("newline"))
+        return open(*args, **kwargs)
+
+    monkeypatch.setattr(data_frame, "open", abrir, raising=False)
+    ProcessadorFactory.criar_exporter_streaming(tipo).exportar_lotes([], tmp_path / "saida")
+    assert recebidos == [novalinha]
@@ -0,0 +1,64 @@
+import time
+
+import pytest
+
+from fila_jobs import RegistroJobs
+
+@pytest.fixture
+def registro(tmp_path):
+    registro = RegistroJobs(tmp_path / "jobs.sqlite3")
+    yield registro
+    registro.fechar()
+
+def falhar_com_arquivo(registro, caminho):
+    registro.registrar_arquivo("k", "a.csv", caminho)
+    registro.falhar("k", "erro")
+
+def test_retoma_job_que_falhou_com_a_mesma_impressao(registro, tmp_path):
+    caminho = tmp_path / "a.csv"
+    caminho.write_text("x")
+    assert registro.iniciar("k", "consinco", impressao="v1") is False
+    falhar_com_arquivo(registro, caminho)
+
+    assert registro.iniciar("k", "consinco", impressao="v1") is True
+    assert registro.arquivo_gravado("k", "a.csv") == str(caminho)
+
+def test_impressao_diferente_descarta_checkpoints(registro, tmp_path):
+    registro.iniciar("k", "consinco", impressao="v1")
+    falhar_com_arquivo(registro, tmp_path / "a.csv")
+
+    assert registro.iniciar("k", "consinco", impressao="v2") is False
+    assert registro.arquivo_gravado("k", "a.csv") is None
+
+def test_job_concluido_nao_e_retomado(registro):
+    registro.iniciar("k", "consinco")
+    registro.concluir("k")
+    assert registro.iniciar("k", "consinco") is False
+
+def test_validade_expira_job_parado(registro, tmp_path):
+    registro.iniciar("k", "cotefacil", validade=3600)
+    falhar_com_arquivo(registro, tmp_path / "a.csv")
+    assert registro.iniciar("k", "cotefacil", validade=3600) is True
+
+    registro.falhar("k", "erro")
+    registro._executar("UPDATE jobs SET atualizado_em = ?", (time.time() - 7200,))
+    assert registro.iniciar("k", "cotefacil", validade=3600) is False
+    assert registro.arquivo_gravado("k", "a.csv") is None
+
+def test_descartar_ignora_checkpoints(registro, tmp_path):
+    caminho = tmp_path / "a.csv"
+    caminho.write_text("x")
+    registro.iniciar("k", "cotefacil")
+    falhar_com_arquivo(registro, caminho)
+
+    assert registro.iniciar("k", "cotefacil", descartar=True) is False
+    assert registro.arquivo_gravado("k", "a.csv") is None
+
+def test_arquivo_gravado_confere_hash(registro, tmp_path):
+    caminho = tmp_path / "a.csv"
+    caminho.write_text("x")
+    registro.iniciar("k", "cotefacil")
+    registro.registrar_arquivo("k", "a.csv", caminho, "h1")
+
+    assert registro.arquivo_gravado("k", "a.csv", "h1") == str(caminho)
+    assert registro.arquivo_gravado("k", "a.csv", "h2") is None
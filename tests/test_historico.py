@@ -0,0 +1,72 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import pytest
+
+pytest.importorskip("pyarrow")
+
+from historico import HistoricoPrecos
+
+EAN = "7891000100103"
+
+@pytest.fixture
+def historico(tmp_path):
+    historico = HistoricoPrecos(tmp_path / "historico")
+    # Cotações em ordem crescente: 1000 -> 1100 -> 1200 para o fornecedor A
+    for numero, preco_a, preco_b in [(1, 1000, 500), (2, 1100, 500), (3, 1200, 498)]:
+        historico.registrar(numero, {"A": {EAN: preco_a}, "B": {EAN: preco_b, "789": 0}})
+    return historico
+
+def test_registrar_ignora_precos_zerados(tmp_path):
+    historico = HistoricoPrecos(tmp_path)
+    assert historico.registrar(1, {"A": {EAN: 0}}) == 0
+    assert historico.registrar(1, {"A": {EAN: 100, "789": 0}}) == 1
+    assert len(list(tmp_path.glob("data=*/cotacao1.parquet"))) == 1
+
+def test_ultimos_precos_do_mais_recente(historico):
+    df = historico.ultimos_precos(EAN, n=2, cnpj="A")
+    assert df["preco"].tolist() == [1200, 1100]
+    assert df["numero_cotacao"].tolist() == [3, 2]
+    assert len(historico.ultimos_precos(EAN)) == 5
+    assert historico.ultimos_precos("000").empty
+
+def test_tendencia(historico):
+    alta = historico.tendencia(EAN, cnpj="A")
+    assert alta["direcao"] == "alta"
+    assert (alta["amostras"], alta["ultimo"], alta["variacao"]) == (3, 1200, 200)
+    assert historico.tendencia(EAN, cnpj="B")["direcao"] == "estavel"
+    assert historico.tendencia("000")["direcao"] is None
+
+def test_ultimo_preco_por_par(historico):
+    chaves = pd.DataFrame({"ean": [EAN, EAN, EAN], "cnpj": ["A", "B", "C"]}, index=[10, 11, 12])
+    precos = historico.ultimo_preco(chaves)
+    assert str(precos.dtype) == "Int64"
+    assert precos.index.tolist() == [10, 11, 12]
+    assert precos.iloc[:2].tolist() == [1200, 498]
+    assert precos.isna().iloc[2]
+
+    anteriores = historico.ultimo_preco(chaves, excluir_cotacao=3)
+    assert anteriores.iloc[:2].tolist() == [1100, 500]
+
+def test_le_arquivos_novos_e_regravados(historico):
+    assert historico.ultimos_precos(EAN, n=1, cnpj="A")["preco"].tolist() == [1200]
+
+    historico.registrar(4, {"A": {EAN: 1300}})
+    assert historico.ultimos_precos(EAN, n=1, cnpj="A")["preco"].tolist() == [1300]
+
+    # Regravar a mesma cotação substitui os preços dela
+    historico.registrar(4, {"A": {EAN: 1250}})
+    df = historico.ultimos_precos(EAN, cnpj="A")
+    assert df["preco"].tolist() == [1250, 1200, 1100, 1000]
+
+def test_gravacoes_simultaneas_da_mesma_cotacao(tmp_path):
+    historico = HistoricoPrecos(tmp_path)
+
+    def registrar(preco):
+        for _ in range(10):
+            historico.registrar(1, {"A": {EAN: preco}})
+
+    with ThreadPoolExecutor(4) as executor:
+        list(executor.map(registrar, [100, 200, 300, 400]))
+    assert [p.name for p in tmp_path.glob("data=*/*")] == ["cotacao1.parquet"]
+    assert historico.ultimos_precos(EAN)["preco"].iloc[0] in (100, 200, 300, 400)
@@ -0,0 +1,53 @@
+import pytest
+
+from leitor_bytes import iterar_linhas_mmap, localizar_registros, para_centavos, para_inteiro
+
+@pytest.mark.parametrize("campo, esperado", [
+    (b"5.99", 599),
+    ("5,99", 599),
+    (b"10", 1000),
+    (b"0.5", 50),
+    (b"1.005", 101),
+    (b"1.004", 100),
+    (b"-2.50", -250),
+    (b" 3.10 ", 310),
+    (b"", 0),
+])
+def test_para_centavos(campo, esperado):
+    assert para_centavos(campo) == esperado
+
+def test_para_centavos_rejeita_texto():
+    with pytest.raises(ValueError):
+        para_centavos(b"abc")
+
+@pytest.mark.parametrize("campo, esperado", [
+    (b"12", 12),
+    ("007", 7),
+    (b" 12 ", 12),
+    ("+3", 3),
+    (b"-1", -1),
+    (b"1,5", "1,5"),
+    ("1_0", "1_0"),
+    ("²", "²"),
+    (b"", ""),
+])
+def test_para_inteiro_mesma_regra_para_bytes_e_texto(campo, esperado):
+    assert para_inteiro(campo) == esperado
+    outro = campo.decode("utf-8") if isinstance(campo, bytes) else campo.encode("utf-8")
+    assert para_inteiro(outro) == esperado
+
+def test_iterar_linhas_mmap_respeita_trecho(tmp_path):
+    caminho = tmp_path / "a.txt"
+    caminho.write_bytes(b"1;a\n2;b\n3;c\n")
+    assert list(iterar_linhas_mmap(caminho)) == [b"1;a\n", b"2;b\n", b"3;c\n"]
+    assert list(iterar_linhas_mmap(caminho, 4, 8)) == [b"2;b\n"]
+
+def test_iterar_linhas_mmap_arquivo_vazio(tmp_path):
+    caminho = tmp_path / "vazio.txt"
+    caminho.write_bytes(b"")
+    assert list(iterar_linhas_mmap(caminho)) == []
+
+def test_localizar_registros(tmp_path):
+    caminho = tmp_path / "a.txt"
+    caminho.write_bytes(b"1;x\r\n3;y\n2;z\n")
+    assert localizar_registros(caminho, b"12") == [(0, b"1;x"), (9, b"2;z")]
@@ -0,0 +1,83 @@
+import pandas as pd
+import pytest
+
+from memoria import ArmazemResultados, MedidorMemoria, _Despejado, memoria_atual_mb, tamanho_estimado
+
+@pytest.fixture
+def armazem():
+    armazem = ArmazemResultados(0)
+    yield armazem
+    armazem.fechar()
+
+def test_cabe_no_orcamento_fica_em_memoria():
+    with ArmazemResultados(1) as armazem:
+        armazem["a"] = [(1, "x")]
+        assert armazem.despejados == 0
+        assert armazem.em_memoria == tamanho_estimado([(1, "x")])
+        assert armazem["a"] == [(1, "x")]
+
+def test_despeja_e_le_de_volta(armazem):
+    df = pd.DataFrame({"ean": ["789", "790"], "preco": [100, 250]})
+    armazem["df"] = df
+    armazem["lista"] = [(1, "a"), (2, "b")]
+    armazem["dados"] = {"itens": df, "cnpj": "123"}
+
+    assert armazem.despejados == 3
+    assert armazem.em_memoria == 0
+    assert isinstance(armazem._valores["df"], _Despejado)
+    pd.testing.assert_frame_equal(armazem["df"], df)
+    assert armazem["lista"] == [(1, "a"), (2, "b")]
+    dados = armazem["dados"]
+    assert dados["cnpj"] == "123"
+    pd.testing.assert_frame_equal(dados["itens"], df)
+    assert armazem.keys() == ["df", "lista", "dados"]
+
+def test_acrescentar_em_valor_despejado(armazem):
+    armazem.acrescentar("a", [1, 2])
+    armazem.acrescentar("a", [3])
+    armazem.acrescentar("b", [4])
+
+    assert armazem.contagem("a") == 3
+    assert armazem.total() == 4
+    assert armazem["a"] == [1, 2, 3]
+
+def test_acrescentar_despeja_ao_passar_do_orcamento():
+    with ArmazemResultados(tamanho_estimado(list(range(10))) / (1024 * 1024)) as armazem:
+        armazem.acrescentar("a", list(range(10)))
+        assert armazem.despejados == 0
+        armazem.acrescentar("a", list(range(10, 20)))
+        assert armazem.despejados == 1
+        assert armazem.em_memoria == 0
+        armazem.acrescentar("a", [20])
+        assert armazem["a"] == list(range(21))
+
+def test_substituir_apaga_arquivo_antigo(armazem):
+    armazem["a"] = [1]
+    antigo = armazem._valores["a"].caminho
+    armazem["a"] = [2]
+    assert not antigo.exists()
+    assert armazem["a"] == [2]
+
+def test_fechar_remove_pasta_temporaria(armazem):
+    armazem["a"] = [1]
+    pasta = armazem._pasta
+    assert pasta.exists()
+    armazem.fechar()
+    assert not pasta.exists()
+    assert len(armazem) == 0
+
+def test_visao(armazem):
+    for chave in "abc":
+        armazem[chave] = [chave]
+    visao = armazem.visao(["c", "a"])
+    assert len(visao) == 2
+    assert list(visao.items()) == [("c", ["c"]), ("a", ["a"])]
+
+def test_medidor_memoria():
+    with MedidorMemoria(intervalo=0.01) as medidor:
+        bloco = bytearray(8 * 1024 * 1024)
+    del bloco
+    if memoria_atual_mb() is None:
+        assert medidor.pico_mb is None
+    else:
+        assert medidor.pico_mb >= medidor.inicial_mb > 0
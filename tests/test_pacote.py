@@ -0,0 +1,61 @@
+import json
+import zipfile
+
+import pytest
+
+from pacote import NOME_MANIFESTO, desempacotar, empacotar
+
+@pytest.fixture
+def arquivos(tmp_path):
+    origem = tmp_path / "origem"
+    origem.mkdir()
+    (origem / "Cotacao1_Loja1.csv").write_text("a;b\n1;2\n", encoding="utf-8")
+    (origem / "Cotacao1.xlsx").write_bytes(bytes(range(256)) * 10)
+    parquet = origem / "Cotacao1_parquet"
+    (parquet / "nroempresa=1").mkdir(parents=True)
+    (parquet / "nroempresa=1" / "parte.parquet").write_bytes(b"PAR1")
+    return [origem / "Cotacao1_Loja1.csv", origem / "Cotacao1.xlsx", parquet]
+
+@pytest.mark.parametrize("formato", ["zip", "tar.zst"])
+def test_ida_e_volta_confere_conteudo(tmp_path, arquivos, formato):
+    if formato == "tar.zst":
+        pytest.importorskip("zstandard")
+    pacote = empacotar(arquivos, tmp_path / "saida" / f"Cotacao1.{formato}", formato, {"numero_cotacao": 1})
+    assert not pacote.with_name(pacote.name + ".tmp").exists()
+
+    extraidos = desempacotar(pacote, tmp_path / "destino")
+    nomes = sorted(p.relative_to(tmp_path / "destino").as_posix() for p in extraidos)
+    assert nomes == ["Cotacao1.xlsx", "Cotacao1_Loja1.csv", "Cotacao1_parquet/nroempresa=1/parte.parquet"]
+    assert (tmp_path / "destino" / "Cotacao1.xlsx").read_bytes() == arquivos[1].read_bytes()
+
+def test_manifesto_traz_metadados_e_hashes(tmp_path, arquivos):
+    pacote = empacotar(arquivos, tmp_path / "Cotacao1.zip", "zip", {"numero_cotacao": 1})
+    with zipfile.ZipFile(pacote) as zip_:
+        manifesto = json.loads(zip_.read(NOME_MANIFESTO))
+    assert manifesto["metadados"] == {"numero_cotacao": 1}
+    assert all(len(item["sha256"]) == 64 for item in manifesto["arquivos"])
+
+def test_checksum_divergente(tmp_path, arquivos):
+    pacote = empacotar(arquivos, tmp_path / "Cotacao1.zip", "zip")
+    adulterado = tmp_path / "adulterado.zip"
+    with zipfile.ZipFile(pacote) as origem, zipfile.ZipFile(adulterado, "w") as destino:
+        for nome in origem.namelist():
+            dados = origem.read(nome)
+            destino.writestr(nome, b"outro" if nome == "Cotacao1_Loja1.csv" else dados)
+
+    with pytest.raises(ValueError, match="Checksum divergente"):
+        desempacotar(adulterado, tmp_path / "destino")
+
+def test_recusa_caminho_fora_do_destino(tmp_path):
+    pacote = tmp_path / "malicioso.zip"
+    with zipfile.ZipFile(pacote, "w") as zip_:
+        zip_.writestr("../fora.txt", b"x")
+        zip_.writestr(NOME_MANIFESTO, json.dumps({"arquivos": []}))
+
+    with pytest.raises(ValueError, match="Caminho inválido"):
+        desempacotar(pacote, tmp_path / "destino")
+    assert not (tmp_path / "fora.txt").exists()
+
+def test_formato_desconhecido(tmp_path, arquivos):
+    with pytest.raises(ValueError):
+        empacotar(arquivos, tmp_path / "x.rar", "rar")
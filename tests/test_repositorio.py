@@ -0,0 +1,90 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import pytest
+
+pytest.importorskip("snorte")
+
+import data_frame
+import resiliencia
+from data_frame import BaseRepository, ConexaoBD
+
+class Cursor:
+    def __init__(self, sessao):
+        self.sessao = sessao
+        self.description = [("SEQ",), ("EAN",)]
+
+    def execute(self, query):
+        if self.sessao.caiu:
+            raise Exception("ORA-03113: end-of-file on communication channel")
+
+    def fetchall(self):
+        return [(1, "789")]
+
+    def close(self):
+        if self.sessao.caiu:
+            raise Exception("DPI-1010: not connected")
+
+class Sessao:
+    """Sessão do snorte em que a primeira conexão cai na consulta"""
+    abertas = 0
+
+    def __init__(self):
+        Sessao.abertas += 1
+        self.caiu = Sessao.abertas == 1
+        self.cursor = Cursor(self)
+        self.connection = None
+
+@pytest.fixture(autouse=True)
+def banco(monkeypatch):
+    Sessao.abertas = 0
+    monkeypatch.setattr(data_frame.snorte, "Snorte", Sessao, raising=False)
+    monkeypatch.setattr(resiliencia.time, "sleep", lambda segundos: None)
+    monkeypatch.setattr(data_frame, "BANCO", resiliencia.ResilienciaBanco(
+        resiliencia.PoliticaBanco(timeout=0, espera_base=0)
+    ))
+
+def test_sessao_derrubada_reconecta_mesmo_sem_conseguir_fechar():
+    conexao = ConexaoBD()
+
+    df = BaseRepository(conexao)._executar_consulta("SELECT 1 FROM DUAL", "teste")
+    assert df.values.tolist() == [[1, "789"]]
+    assert Sessao.abertas == 2
+
+def test_fechar_conexao_derrubada_nao_propaga():
+    conexao = ConexaoBD()
+    conexao.fechar_conexao()
+
+def test_snapshot_salvo_por_varias_threads(tmp_path):
+    snapshot = data_frame.SnapshotCotacao(tmp_path)
+    df = pd.DataFrame({"seq": range(1000), "ean": ["789"] * 1000})
+
+    def salvar(_):
+        for _ in range(30):
+            snapshot.salvar(1, "produtos", df)
+
+    with ThreadPoolExecutor(4) as executor:
+        list(executor.map(salvar, range(4)))
+    pd.testing.assert_frame_equal(snapshot.carregar(1, "produtos"), df)
+    assert [p.name for p in tmp_path.iterdir()] == ["cotacao1_produtos.pkl"]
+
+def test_pool_abre_conexoes_em_paralelo(monkeypatch):
+    simultaneas = threading.Barrier(3, timeout=2)
+
+    class SessaoLenta(Sessao):
+        def __init__(self):
+            # Só passa se as três threads estiverem conectando ao mesmo tempo
+            simultaneas.wait()
+            super().__init__()
+
+    monkeypatch.setattr(data_frame.snorte, "Snorte", SessaoLenta, raising=False)
+    pool = data_frame.PoolConexoes(tamanho=3)
+
+    def usar(_):
+        with pool.emprestar(timeout=2) as conexao:
+            return conexao.conexao is not None
+
+    with ThreadPoolExecutor(3) as executor:
+        assert all(executor.map(usar, range(3)))
+    assert len(pool.abertas) == 3
@@ -0,0 +1,164 @@
+import threading
+
+import pytest
+
+import resiliencia
+from resiliencia import (CircuitoAberto, Disjuntor, PoliticaBanco, ResilienciaBanco, TempoEsgotadoBanco,
+                         codigo_erro, erro_timeout, erro_transitorio)
+
+class Relogio:
+    def __init__(self):
+        self.agora = 1000.0
+
+    def __call__(self):
+        return self.agora
+
+@pytest.fixture
+def relogio(monkeypatch):
+    relogio = Relogio()
+    monkeypatch.setattr(resiliencia.time, "monotonic", relogio)
+    return relogio
+
+@pytest.fixture(autouse=True)
+def sem_espera(monkeypatch):
+    monkeypatch.setattr(resiliencia.time, "sleep", lambda segundos: None)
+
+def falhar_rede():
+    raise ConnectionError("rede")
+
+def politica(**kwargs):
+    valores = {"timeout": 0, "tentativas": 3, "espera_base": 0, "limite_falhas": 5, "tempo_aberto": 30}
+    valores.update(kwargs)
+    return PoliticaBanco(**valores)
+
+@pytest.mark.parametrize("erro, esperado", [
+    (Exception("ORA-03113: end-of-file on communication channel"), "ORA-03113"),
+    (Exception("DPI-1067: call timeout of 1000 ms exceeded"), "DPI-1067"),
+    (Exception("erro qualquer"), ""),
+])
+def test_codigo_erro(erro, esperado):
+    assert codigo_erro(erro) == esperado
+
+def test_classificacao_dos_erros():
+    assert erro_transitorio(Exception("ORA-12541: TNS:no listener"))
+    assert erro_transitorio(ConnectionError())
+    assert erro_transitorio(TempoEsgotadoBanco())
+    assert not erro_transitorio(Exception("ORA-00942: table or view does not exist"))
+    assert not erro_transitorio(CircuitoAberto())
+    assert erro_timeout(Exception("ORA-03156"))
+    assert not erro_timeout(Exception("ORA-03113"))
+
+def test_disjuntor_abre_testa_e_fecha(relogio):
+    disjuntor = Disjuntor(limite_falhas=2, tempo_aberto=30)
+    assert disjuntor.estado == "fechado"
+    assert disjuntor.falha() is False
+    assert disjuntor.falha() is True
+    assert disjuntor.estado == "aberto"
+    assert disjuntor.permitir() is False
+
+    relogio.agora += 30
+    assert disjuntor.estado == "meio-aberto"
+    assert disjuntor.permitir() is True
+    # Só uma chamada de teste por vez
+    assert disjuntor.permitir() is False
+
+    disjuntor.sucesso()
+    assert disjuntor.estado == "fechado"
+    assert disjuntor.permitir() is True
+
+def test_disjuntor_reabre_se_chamada_de_teste_falha(relogio):
+    disjuntor = Disjuntor(limite_falhas=1, tempo_aberto=30)
+    disjuntor.falha()
+    relogio.agora += 31
+    assert disjuntor.permitir() is True
+
+    assert disjuntor.falha() is True
+    assert disjuntor.estado == "aberto"
+    relogio.agora += 29
+    assert disjuntor.permitir() is False
+
+def test_repete_erro_transitorio_e_chama_ao_repetir():
+    banco = ResilienciaBanco(politica())
+    chamadas, repeticoes = [], []
+
+    def consulta(valor):
+        chamadas.append(valor)
+        if len(chamadas) < 3:
+            raise Exception("ORA-03113: end-of-file on communication channel")
+        return valor * 2
+
+    assert banco.executar("teste", consulta, 21, ao_repetir=repeticoes.append) == 42
+    assert len(chamadas) == 3
+    assert [codigo_erro(erro) for erro in repeticoes] == ["ORA-03113", "ORA-03113"]
+    resumo = banco.resumo()
+    assert resumo["sucesso"] == 1 and resumo["nova_tentativa"] == 2
+    assert resumo["disjuntor"] == "fechado"
+
+def test_desiste_apos_esgotar_tentativas():
+    banco = ResilienciaBanco(politica(tentativas=2))
+    chamadas = []
+
+    def consulta():
+        chamadas.append(1)
+        falhar_rede()
+
+    with pytest.raises(ConnectionError):
+        banco.executar("teste", consulta)
+    assert len(chamadas) == 2
+
+def test_erro_da_consulta_nao_e_repetido():
+    banco = ResilienciaBanco(politica())
+    chamadas = []
+
+    def consulta():
+        chamadas.append(1)
+        raise ValueError("ORA-00942: table or view does not exist")
+
+    with pytest.raises(ValueError):
+        banco.executar("teste", consulta)
+    assert len(chamadas) == 1
+    assert banco.disjuntor.falhas_seguidas == 0
+
+def test_circuito_aberto_recusa_sem_chamar(relogio):
+    banco = ResilienciaBanco(politica(tentativas=1, limite_falhas=2))
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            banco.executar("teste", falhar_rede)
+
+    chamadas = []
+    with pytest.raises(CircuitoAberto):
+        banco.executar("teste", lambda: chamadas.append(1))
+    assert chamadas == []
+    assert banco.resumo()["recusada"] == 1
+
+def test_timeout_sem_suporte_no_driver():
+    banco = ResilienciaBanco(politica(timeout=0.05, tentativas=1))
+    liberar = threading.Event()
+    try:
+        with pytest.raises(TempoEsgotadoBanco):
+            banco.executar("lenta", liberar.wait, 5)
+    finally:
+        liberar.set()
+    assert banco.resumo()["timeout"] == 1
+
+def test_conexao_resolvida_a_cada_tentativa():
+    class Conexao:
+        call_timeout = 0
+
+    banco = ResilienciaBanco(politica(timeout=2))
+    conexoes = [Conexao(), Conexao()]
+    atual = iter(conexoes)
+    usadas = []
+
+    def consulta():
+        if len(usadas) == 1:
+            raise Exception("ORA-03113")
+        return "ok"
+
+    def resolver():
+        usadas.append(next(atual))
+        return usadas[-1]
+
+    assert banco.executar("teste", consulta, conexao=resolver) == "ok"
+    assert usadas == conexoes
+    assert all(conexao.call_timeout == 2000 for conexao in conexoes)
@@ -0,0 +1,31 @@
+import pytest
+
+pytest.importorskip("snorte")
+
+from data_frame import TxtCotacaoParser
+
+def test_texto_e_mmap_extraem_os_mesmos_precos(tmp_path):
+    caminho = tmp_path / "cotacao.txt"
+    caminho.write_text(
+        "1;05327241001054;05327241001054;13808028\n"
+        "2;11222333000181;FORNECEDOR A;18294;60000001;30\n"
+        "3;7891000315507;x;1;5.99;0.00;0.00\n"
+        "3;7891000100103;x;1;12,5;0.00;0.00\n"
+        "3;7891000100104;x;1;sem preço;0.00;0.00\n"
+        "4;3\n"
+        "3;7891000100105;x;1;1.00;0.00;0.00\n"
+        "2;05327241001054;FORNECEDOR B;18294;60000002;30\n"
+        "3;7891000315507;x;1;6.10;0.00;0.00\n"
+        "4;1\n"
+        "5;fim\n"
+        "2;44555666000199;DEPOIS DO FIM;18294;60000003;30\n",
+        encoding="utf-8",
+    )
+    parser = TxtCotacaoParser(caminho)
+    esperado = {
+        "11222333000181": {"7891000315507": 599, "7891000100103": 1250},
+        "05327241001054": {"7891000315507": 610},
+    }
+    assert parser.extrair_precos_texto() == esperado
+    assert parser.extrair_precos_centavos() == esperado
+    assert parser.extrair_precos() == esperado